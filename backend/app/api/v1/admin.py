@@ -1,34 +1,45 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import select, and_, or_
+import importlib.util
+from typing import Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
 
-from ...services.auth import get_current_user, get_current_admin      # ← fixed
-from ...db.models import SessionLocal, UnansweredQuery, Message, ChatSession, User
-from datetime import datetime
+from ...services.auth import get_current_user, get_current_admin, password_stats, user_cache      # ← fixed
+from ...db.models import SessionLocal, User, get_db
+from ...db import queries
+from ...services.rag import cache_stats, classifier_stats
+from ...services.analytics import (
+    EXPORT_MEDIA_TYPES,
+    MAX_ANALYTICS_PAGE,
+    ROLLUP_DIMENSIONS,
+    answered_query,
+    paginate,
+    refresh_rollups,
+    rollup_summary,
+    rows_to_dicts,
+    stream_export,
+    unanswered_query,
+    user_filters,
+)
 
 
 router = APIRouter()
 
 @router.get("/unanswered")
-async def list_unanswered(limit: int = 20, user=Depends(get_current_user)):
-    async with SessionLocal() as db:
-        rows = (await db.execute(
-            select(UnansweredQuery)
-            .order_by(UnansweredQuery.created_at.desc())
-            .limit(limit)
-        )).scalars().all()
-        return [
-            {
-                "text": r.text,
-                "location": r.location,
-                "score": r.score,
-                "reason": r.reason,
-                "created_at": r.created_at,
-            }
-            for r in rows
+async def list_unanswered(limit: int = 20, db=Depends(get_db), user=Depends(get_current_user)):
+    rows = (await db.execute(queries.latest_unanswered(limit))).scalars().all()
+    return [
+        {
+            "text": r.text,
+            "location": r.location,
+            "score": r.score,
+            "reason": r.reason,
+            "created_at": r.created_at,
+        }
+        for r in rows
 ]
 
-@router.get("/analytics")
-async def analytics(
+def analytics_selection(
     answered: bool = True,
     ethnic_group: str = None,
     min_age: int = None,
@@ -43,125 +54,142 @@ async def analytics(
     user_id: int = None,
     session_id: int = None,
     category: str = None,
+) -> Tuple[bool, Select]:
+    """Shared analytics filters: (answered, filtered statement)."""
+    filters = user_filters(
+        ethnic_group=ethnic_group,
+        min_age=min_age,
+        max_age=max_age,
+        gender=gender,
+        country=country,
+        long_term_conditions=long_term_conditions,
+        medications=medications,
+        user_id=user_id,
+    )
+    if answered:
+        return True, answered_query(filters, category, rag_score_min, rag_score_max, session_id)
+    return False, unanswered_query(filters, category, reason, rag_score_min, rag_score_max, session_id)
+
+@router.get("/analytics")
+async def analytics(
+    response: Response,
+    selection: Tuple[bool, Select] = Depends(analytics_selection),
+    sort: str = Query("created_at", pattern="^(created_at|rag_score)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    limit: int = Query(1000, ge=1, le=MAX_ANALYTICS_PAGE),
+    after_id: int = None,
+    db=Depends(get_db),
+    user=Depends(get_current_admin)
+):
+    """
+    Answered (assistant messages) or unanswered queries with user
+    demographics. Filtering, sorting and pagination all run in SQL; when more
+    rows exist the ``X-Next-Cursor`` header holds the ``after_id`` for the
+    next page.
+    """
+    answered, query = selection
+    # One extra row tells us whether another page exists
+    query = paginate(query, answered, sort=sort, descending=order == "desc", after_id=after_id, limit=limit + 1)
+    rows = (await db.execute(query)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return rows_to_dicts(rows)
+
+@router.get("/analytics/export")
+async def export_analytics(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow|parquet)$"),
+    selection: Tuple[bool, Select] = Depends(analytics_selection),
+    sort: str = Query("created_at", pattern="^(created_at|rag_score)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    user=Depends(get_current_admin)
+):
+    """
+    Stream every matching analytics row as NDJSON, CSV, an Arrow IPC stream
+    or Parquet. Rows are read through a server-side cursor in chunks, so the
+    export runs in constant memory.
+    """
+    if format in ("arrow", "parquet") and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=400, detail=f"{format} export requires pyarrow")
+    answered, query = selection
+    query = paginate(query, answered, sort=sort, descending=order == "desc", limit=None)
+
+    async def body():
+        async with SessionLocal() as db:
+            async for chunk in stream_export(db, query, format):
+                if chunk:
+                    yield chunk
+
+    filename = f"analytics_{'answered' if answered else 'unanswered'}.{format}"
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.get("/analytics/summary")
+async def analytics_summary(
+    answered: bool = True,
+    group_by: str = "category",
+    start_day: str = None,
+    end_day: str = None,
+    category: str = None,
+    country: str = None,
+    gender: str = None,
+    age_band: str = None,
+    reason: str = None,
+    refresh: bool = True,
+    db=Depends(get_db),
     user=Depends(get_current_admin)
 ):
-    async with SessionLocal() as db:
-        filters = []
-        user_filters = []
-        if ethnic_group:
-            user_filters.append(User.ethnic_group == ethnic_group)
-        if gender:
-            user_filters.append(User.gender == gender)
-        if country:
-            user_filters.append(User.country == country)
-        if long_term_conditions:
-            user_filters.append(User.long_term_conditions.like(f"%{long_term_conditions}%"))
-        if medications:
-            user_filters.append(User.medications.like(f"%{medications}%"))
-        if min_age or max_age:
-            from datetime import datetime
-            today = datetime.today()
-            if min_age:
-                max_birth = today.replace(year=today.year - min_age)
-                user_filters.append(User.date_of_birth <= max_birth.strftime("%Y-%m-%d"))
-            if max_age:
-                min_birth = today.replace(year=today.year - max_age)
-                user_filters.append(User.date_of_birth >= min_birth.strftime("%Y-%m-%d"))
-        if user_id:
-            user_filters.append(User.id == user_id)
-        if session_id:
-            filters.append(ChatSession.id == session_id)
-        if answered:
-            # Answered: filter on Message (assistant role)
-            query = select(Message, ChatSession, User).join(ChatSession, Message.session_id == ChatSession.id).join(User, ChatSession.user_id == User.id).where(Message.role == "assistant")
-            if rag_score_min is not None:
-                filters.append(Message.confidence_score >= rag_score_min)
-            if rag_score_max is not None:
-                filters.append(Message.confidence_score <= rag_score_max)
-            if user_filters:
-                query = query.where(and_(*user_filters))
-            if filters:
-                query = query.where(and_(*filters))
-            
-            # Apply category filter after getting the data
-            rows = (await db.execute(query)).all()
-            results = []
-            for msg, session, user in rows:
-                # Use the stored user_question if available, otherwise fall back to lookup
-                if msg.user_question:
-                    question_text = msg.user_question
-                    question_category = None  # We'll get category from the user message if needed
-                else:
-                    # Get the corresponding user question for this assistant response (fallback)
-                    user_question_query = select(Message).where(
-                        Message.session_id == session.id,
-                        Message.role == "user",
-                        Message.created_at < msg.created_at
-                    ).order_by(Message.created_at.desc()).limit(1)
-                    
-                    user_question_result = await db.execute(user_question_query)
-                    user_question = user_question_result.scalar_one_or_none()
-                    question_text = user_question.content if user_question else "Unknown question"
-                    question_category = user_question.category if user_question else None
-                
-                # Apply category filter
-                if category and question_category and question_category != category:
-                    continue
-                
-                results.append({
-                    "question": question_text,
-                    "answer": msg.content,
-                    "session_id": session.id,
-                    "user_id": user.id,
-                    "ethnic_group": user.ethnic_group,
-                    "gender": user.gender,
-                    "date_of_birth": user.date_of_birth,
-                    "country": user.country,
-                    "long_term_conditions": user.long_term_conditions,
-                    "medications": user.medications,
-                    "created_at": msg.created_at,
-                    "rag_score": msg.confidence_score,
-                    "reason": None,
-                    "sources": msg.sources,
-                    "category": question_category,
-                })
-            return results
-        else:
-            # Unanswered: filter on UnansweredQuery
-            from sqlalchemy.orm import outerjoin
-            query = select(UnansweredQuery, ChatSession, User)\
-                .outerjoin(ChatSession, UnansweredQuery.session_id == ChatSession.id)\
-                .outerjoin(User, ChatSession.user_id == User.id)
-            if reason:
-                filters.append(UnansweredQuery.reason == reason)
-            if rag_score_min is not None:
-                filters.append(UnansweredQuery.score >= rag_score_min)
-            if rag_score_max is not None:
-                filters.append(UnansweredQuery.score <= rag_score_max)
-            if user_filters:
-                query = query.where(and_(*user_filters))
-            if filters:
-                query = query.where(and_(*filters))
-            rows = (await db.execute(query)).all()
-            results = []
-            for uq, session, user in rows:
-                # Apply category filter for unanswered queries
-                if category and uq.category != category:
-                    continue
-                results.append({
-                    "question": uq.text,
-                    "session_id": session.id if session else None,
-                    "user_id": user.id if user else None,
-                    "ethnic_group": user.ethnic_group if user else None,
-                    "gender": user.gender if user else None,
-                    "date_of_birth": user.date_of_birth if user else None,
-                    "country": user.country if user else None,
-                    "long_term_conditions": user.long_term_conditions if user else None,
-                    "medications": user.medications if user else None,
-                    "created_at": uq.created_at,
-                    "rag_score": uq.score,
-                    "reason": uq.reason,
-                    "sources": uq.sources,
-                    "category": uq.category,
-                })
-            return results
+    """
+    Aggregated analytics from the rollup tables: counts, average RAG score
+    and RAG-score histogram grouped by ``group_by`` (comma-separated subset of
+    day, category, country, gender, age_band, reason). New rows are folded
+    into the rollups first unless ``refresh=false``.
+    """
+    dimensions = [d.strip() for d in group_by.split(",") if d.strip()]
+    unknown = [d for d in dimensions if d not in ROLLUP_DIMENSIONS]
+    if not dimensions or unknown:
+        raise HTTPException(status_code=400, detail=f"group_by must be a subset of {', '.join(ROLLUP_DIMENSIONS)}")
+    if refresh:
+        await refresh_rollups(db)
+    return await rollup_summary(
+        db,
+        answered,
+        dimensions,
+        start_day=start_day,
+        end_day=end_day,
+        category=category,
+        country=country,
+        gender=gender,
+        age_band=age_band,
+        reason=reason,
+    )
+
+@router.post("/users/{user_id}/admin")
+async def promote_user(user_id: int, db=Depends(get_db), user=Depends(get_current_admin)):
+    """Grant admin rights to a user."""
+    target = await db.get(User, user_id)
+    if target is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    target.is_admin = True
+    await db.commit()
+    # The cached principal must not keep the old is_admin flag
+    user_cache.invalidate(user_id)
+    return {"id": target.id, "email": target.email, "is_admin": True}
+
+@router.get("/cache/stats")
+async def get_cache_stats(user=Depends(get_current_admin)):
+    """Hit/miss metrics for the query-embedding, semantic answer and user caches."""
+    return {**cache_stats(), "user_cache": user_cache.stats()}
+
+@router.get("/auth/stats")
+async def get_auth_stats(user=Depends(get_current_admin)):
+    """Login throughput and bcrypt timing for this worker."""
+    return password_stats.stats()
+
+@router.get("/classifier/stats")
+async def get_classifier_stats(user=Depends(get_current_admin)):
+    """Local-hit rate of the medical/general classifier (vs LLM fallbacks)."""
+    return classifier_stats()
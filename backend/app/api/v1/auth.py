@@ -2,8 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 
-from ...services.auth import authenticate, _hash_pw, get_user_by_email, get_current_user
-from ...db.models import SessionLocal, User
+from ...services.auth import authenticate, hash_password, get_user_by_email, get_current_user, user_cache
+from ...db.models import SessionLocal, User, get_db
 
 router = APIRouter()
 
@@ -44,7 +44,7 @@ async def register(body: RegisterIn):
         return {"detail": "User exists"}
 
     async with SessionLocal() as db:
-        user_kwargs = dict(email=body.email, hashed_pw=_hash_pw(body.password))
+        user_kwargs = dict(email=body.email, hashed_pw=await hash_password(body.password))
         if body.consent_to_data_storage:
             user_kwargs.update(
                 full_name=body.full_name,
@@ -98,30 +98,30 @@ class UserUpdateIn(BaseModel):
     password: Optional[str] = None
 
 @router.put("/me")
-async def update_me(body: UserUpdateIn, user=Depends(get_current_user)):
-    async with SessionLocal() as db:
-        db_user = await db.get(User, user.id)
-        if db_user is None:
-            raise HTTPException(status_code=404, detail="User not found")
-        update_fields = body.dict(exclude_unset=True)
-        if "password" in update_fields:
-            db_user.hashed_pw = _hash_pw(update_fields.pop("password"))
-        for k, v in update_fields.items():
-            setattr(db_user, k, v)
-        await db.commit()
-        await db.refresh(db_user)
-        return {
-            "email": db_user.email,
-            "is_admin": db_user.is_admin,
-            "full_name": db_user.full_name,
-            "date_of_birth": db_user.date_of_birth,
-            "gender": db_user.gender,
-            "sex": db_user.sex,
-            "country": db_user.country,
-            "address": db_user.address,
-            "ethnic_group": db_user.ethnic_group,
-            "long_term_conditions": db_user.long_term_conditions,
-            "medications": db_user.medications,
-            "consent_to_data_storage": db_user.consent_to_data_storage,
-            "id": db_user.id,
-        }
+async def update_me(body: UserUpdateIn, db=Depends(get_db), user=Depends(get_current_user)):
+    db_user = await db.get(User, user.id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    update_fields = body.dict(exclude_unset=True)
+    if "password" in update_fields:
+        db_user.hashed_pw = await hash_password(update_fields.pop("password"))
+    for k, v in update_fields.items():
+        setattr(db_user, k, v)
+    await db.commit()
+    await db.refresh(db_user)
+    user_cache.invalidate(db_user.id)
+    return {
+        "email": db_user.email,
+        "is_admin": db_user.is_admin,
+        "full_name": db_user.full_name,
+        "date_of_birth": db_user.date_of_birth,
+        "gender": db_user.gender,
+        "sex": db_user.sex,
+        "country": db_user.country,
+        "address": db_user.address,
+        "ethnic_group": db_user.ethnic_group,
+        "long_term_conditions": db_user.long_term_conditions,
+        "medications": db_user.medications,
+        "consent_to_data_storage": db_user.consent_to_data_storage,
+        "id": db_user.id,
+    }
@@ -4,22 +4,31 @@ from ...db.models import (
     Message,
     UnansweredQuery,
     User,  # Add User import for type hints
+    get_db,
 )
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Optional, List, Tuple
+import asyncio
+import json
 import re
 from ...services.auth import get_current_user
-from ...services.rag import answer
-from ...services.categorization import categorize_question, get_available_categories
+from ...services.rag import GENERATION_ERROR_MESSAGE, aanswer, astream_answer
+from ...services.categorization import aclassify_question, get_available_categories
+from ...services.history import load_history_window
+from ...db import queries
 from sqlalchemy import select, desc
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 200  # upper bound for paginated reads
+
 class ChatIn(BaseModel):
     message: str
     location: str | None = None
     session_id: int | None = None  # Optional session ID for continuing conversation
+    last_message_id: int | None = None  # Delta mode: only return messages newer than this id
 
 class MessageOut(BaseModel):
     id: int
@@ -66,336 +75,445 @@ def build_user_context(user: 'User') -> str:
         + " | ".join(info)
     )
 
-@router.post("/chat", response_model=ChatOut)
-async def chat(body: ChatIn, user=Depends(get_current_user)):
-    async with SessionLocal() as db:
-        # ---------- Get or create chat session ---------------------------
-        session = None
-        print(f"[DEBUG] Request session_id: {body.session_id}")
-        
-        if body.session_id:
-            # Try to get existing session
-            result = await db.execute(
-                select(ChatSession).where(
-                    ChatSession.id == body.session_id,
-                    ChatSession.user_id == user.id
-                )
-            )
-            session = result.scalar_one_or_none()
-            print(f"[DEBUG] Found existing session: {session.id if session else 'None'}")
-        
-        if not session:
-            # Create new session
-            print(f"[DEBUG] Creating new session")
-            session = ChatSession(
-                user_id=user.id,
-                location=body.location
-            )
-            db.add(session)
-            await db.commit()
-            await db.refresh(session)
-            print(f"[DEBUG] Created new session with ID: {session.id}")
-        
-        # ---------- Get conversation history for context ------------------
-        # Get history BEFORE adding current message to build proper context
-        history_result = await db.execute(
-            select(Message)
-            .where(Message.session_id == session.id)
-            .order_by(Message.created_at)
-            .limit(20)  # Limit to last 20 messages for context
+def message_out(msg: Message) -> MessageOut:
+    return MessageOut(
+        id=msg.id,
+        role=msg.role,
+        content=msg.content,
+        created_at=msg.created_at.isoformat(),
+        category=msg.category,
+        # sources=msg.sources,
+        # response_metadata=msg.response_metadata
+    )
+
+async def _get_or_create_session(db, body: ChatIn, user) -> ChatSession:
+    session = None
+    print(f"[DEBUG] Request session_id: {body.session_id}")
+    
+    if body.session_id:
+        # Try to get existing session
+        result = await db.execute(
+            queries.owned_session(body.session_id, user.id)
         )
-        history_messages = history_result.scalars().all()
-        
-        print(f"[DEBUG] Found {len(history_messages)} existing messages in session {session.id}")
-        
-        # Build conversation history for GPT-4o (existing messages only)
-        conversation_history = []
-        for msg in history_messages[-10:]:  # Use last 10 for context
-            role = "assistant" if msg.role == "assistant" else msg.role
-            conversation_history.append({
-                "role": role, 
-                "content": msg.content
-            })
-        # Build user context string (do not prepend to conversation_history)
-        user_context = build_user_context(user)
-        
-        print(f"[DEBUG] Built conversation history with {len(conversation_history)} messages")
-        if conversation_history:
-            print(f"[DEBUG] Conversation history details:")
-            for i, msg in enumerate(conversation_history):
-                print(f"  {i+1}. {msg['role']}: {msg['content'][:100]}...")
-        else:
-            print(f"[DEBUG] No conversation history found - history_messages length was {len(history_messages)}")
-            
-        # Additional debugging - print raw database messages
-        print(f"[DEBUG] Raw database messages:")
-        for i, msg in enumerate(history_messages):
-            print(f"  DB {i+1}. ID:{msg.id} Role:{msg.role} Content:{msg.content[:50]}...")
-        
-        # ---------- Categorize ALL questions BEFORE saving user message ---------------
-        category = None
-        try:
-            category = categorize_question(body.message)
-            print(f"[DEBUG] Question categorized as: {category}")
-            print(f"[DEBUG] Category type: {type(category)}")
-            print(f"[DEBUG] Category length: {len(category) if category else 0}")
-        except Exception as e:
-            print(f"[DEBUG] Categorization error: {e}")
-            category = None
-        
-        # ---------- Save user message AFTER getting history ---------------
-        print(f"[DEBUG] Creating user message with category: '{category}'")
-        user_message = Message(
-            session_id=session.id,
-            role="user",
-            content=body.message,
-            category=category  # Now properly categorized for all questions
+        session = result.scalar_one_or_none()
+        print(f"[DEBUG] Found existing session: {session.id if session else 'None'}")
+    
+    if not session:
+        # Create new session
+        print(f"[DEBUG] Creating new session")
+        session = ChatSession(
+            user_id=user.id,
+            location=body.location
         )
-        db.add(user_message)
-        # Don't commit yet - we'll commit both messages together
-        
-        # ---------- Generate response with hybrid system -----------------
-        try:
-            # Build contextual query for RAG (if medical)
-            contextual_query = body.message  # Default to just the current message
-            
-            if conversation_history:
-                print(f"[DEBUG] Building contextual query with {len(conversation_history)} previous messages")
-                
-                # Create context-aware query for RAG classification and retrieval
-                context_messages = []
-                for msg in conversation_history[-5:]:  # Last 5 for context
-                    context_messages.append(f"{msg['role']}: {msg['content']}")
-                
-                # Add current message to context
-                context_messages.append(f"user: {body.message}")
-                
-                contextual_query = f"Previous conversation:\n" + "\n".join(context_messages[:-1]) + f"\n\nCurrent question: {body.message}"
-                print(f"[DEBUG] Contextual query: {contextual_query[:300]}...")
-            else:
-                print(f"[DEBUG] No conversation history, using direct query: {body.message}")
-            
-            print(f"[DEBUG] Calling answer() with:")
-            print(f"  - Query: {contextual_query[:100]}...")
-            print(f"  - Original query: {body.message}")
-            print(f"  - Conversation history items: {len(conversation_history)}")
-            
-            # Call the hybrid RAG + GPT-4o system
-            response, sources, metadata = answer(
-                query=contextual_query,
-                conversation_history=conversation_history,
-                original_query=body.message,
-                user_context=user_context
-            )
-            
-            # Determine which sources to save
-            if metadata.get("used_rag"):
-                sources_to_save = sources if sources else None
-            else:
-                sources_to_save = re.findall(r'\((https?://[^\s)]+)\)', response)  # fallback, could extract from response if needed
+        db.add(session)
+        await db.commit()
+        await db.refresh(session)
+        print(f"[DEBUG] Created new session with ID: {session.id}")
+    return session
 
-            # ---------- Save unanswered if needed ----------------------------
-            if metadata.get("is_medical", False) and not metadata.get("used_rag", False):
-                print(f"[DEBUG] Saving unanswered query with category: '{category}'")
-                unanswered_query = UnansweredQuery(
-                    text=body.message,
-                    location=body.location,
-                    reason=f"medical_question_no_rag",
-                    score=metadata.get('rag_score', 0.0),
-                    category=category,  # Already categorized above
-                    session_id=session.id,
-                    sources=sources_to_save,
-                )
-                db.add(unanswered_query)
-                await db.commit()
-                await db.refresh(unanswered_query)
-                print(f"[DEBUG] Unanswered query saved with ID: {unanswered_query.id}, category: '{unanswered_query.category}'")
-            
-        except Exception as e:
-            # Log the error
-            db.add(
-                UnansweredQuery(
-                    text=body.message,
-                    location=body.location,
-                    reason=f"system_error: {str(e)}",
-                    category=category,  # Will be None if categorization failed
-                    session_id=session.id,
-                    sources=sources if sources else None,
-                )
-            )
-            
-            # Save error message
-            error_message = Message(
-                session_id=session.id,
-                role="assistant",
-                content="I'm having trouble responding right now. Please try again in a moment."
-            )
-            db.add(error_message)
-            await db.commit()
-            
-            # Get all messages for response
-            all_messages_result = await db.execute(
-                select(Message)
-                .where(Message.session_id == session.id)
-                .order_by(Message.created_at)
-            )
-            all_messages = all_messages_result.scalars().all()
-            
-            return {
-                "response": "I'm having trouble responding right now. Please try again in a moment.",
-                "sources": [],
-                "session_id": session.id,
-                "messages": [
-                    MessageOut(
-                        id=msg.id,
-                        role=msg.role,
-                        content=msg.content,
-                        created_at=msg.created_at.isoformat(),
-                        category=msg.category
-                    ) for msg in all_messages
-                ],
-                "metadata": {"error": True}
-            }
-        
-        # ---------- Success - save both messages together ---------------------
-        print(f"[DEBUG] Creating assistant message with category: '{category}'")
-        assistant_message = Message(
+async def _load_conversation_history(db, session_id: int) -> List[dict]:
+    """Conversation history for GPT-4o (existing messages only, most recent window)."""
+    # Get history BEFORE adding current message to build proper context
+    conversation_history = await load_history_window(db, session_id)
+    
+    print(f"[DEBUG] Built conversation history with {len(conversation_history)} messages")
+    if conversation_history:
+        print(f"[DEBUG] Conversation history details:")
+        for i, msg in enumerate(conversation_history):
+            print(f"  {i+1}. {msg['role']}: {msg['content'][:100]}...")
+    else:
+        print(f"[DEBUG] No conversation history found for session {session_id}")
+    return conversation_history
+
+def build_contextual_query(message: str, conversation_history: List[dict]) -> str:
+    """Context-aware query for RAG classification and retrieval."""
+    if not conversation_history:
+        print(f"[DEBUG] No conversation history, using direct query: {message}")
+        return message
+    
+    print(f"[DEBUG] Building contextual query with {len(conversation_history)} previous messages")
+    context_messages = []
+    for msg in conversation_history[-5:]:  # Last 5 for context
+        context_messages.append(f"{msg['role']}: {msg['content']}")
+    
+    contextual_query = f"Previous conversation:\n" + "\n".join(context_messages) + f"\n\nCurrent question: {message}"
+    print(f"[DEBUG] Contextual query: {contextual_query[:300]}...")
+    return contextual_query
+
+async def _classify(message: str):
+    """Unified classification; failures leave the category empty."""
+    try:
+        classification = await aclassify_question(message)
+        print(f"[DEBUG] Question categorized as: {classification.label if classification else None}")
+        return classification
+    except Exception as e:
+        print(f"[DEBUG] Categorization error: {e}")
+        return None
+
+async def _joined_category(classify_task: "asyncio.Task") -> Optional[str]:
+    """Join the background classification before rows are committed."""
+    classification = await classify_task
+    return classification.label if classification else None
+
+async def _save_turn(
+    db,
+    session: ChatSession,
+    body: ChatIn,
+    category: Optional[str],
+    response: str,
+    sources: List[str],
+    metadata: dict,
+) -> Tuple[Message, Message]:
+    """Persist the user and assistant messages (and the unanswered query, if any) together."""
+    # Determine which sources to save
+    if metadata.get("used_rag"):
+        sources_to_save = sources if sources else None
+    else:
+        sources_to_save = re.findall(r'\((https?://[^\s)]+)\)', response)  # fallback, could extract from response if needed
+    
+    user_message = Message(
+        session_id=session.id,
+        role="user",
+        content=body.message,
+        category=category
+    )
+    db.add(user_message)
+    
+    # ---------- Save unanswered if needed ----------------------------
+    if metadata.get("is_medical", False) and not metadata.get("used_rag", False):
+        print(f"[DEBUG] Saving unanswered query with category: '{category}'")
+        db.add(UnansweredQuery(
+            text=body.message,
+            location=body.location,
+            reason=f"medical_question_no_rag",
+            score=metadata.get('rag_score', 0.0),
+            category=category,
             session_id=session.id,
-            role="assistant",
-            content=response,
-            confidence_score=metadata.get("rag_score") if metadata else None,
             sources=sources_to_save,
-            user_question=body.message,  # Store the original user question
-            category=category,  # Include the category for the assistant response
-            # sources=sources,  # Store sources with the message
-            # response_metadata=metadata  # Store metadata with the message (renamed from metadata)
+        ))
+    
+    assistant_message = Message(
+        session_id=session.id,
+        role="assistant",
+        content=response,
+        confidence_score=metadata.get("rag_score") if metadata else None,
+        sources=sources_to_save,
+        user_question=body.message,  # Store the original user question
+        category=category,  # Include the category for the assistant response
+    )
+    db.add(assistant_message)
+    
+    # Commit both messages together
+    await db.commit()
+    await db.refresh(user_message)
+    await db.refresh(assistant_message)
+    print(f"[DEBUG] User message saved with ID: {user_message.id}, category: '{user_message.category}'")
+    print(f"[DEBUG] Assistant message saved with ID: {assistant_message.id}, category: '{assistant_message.category}'")
+    return user_message, assistant_message
+
+async def _save_error_turn(
+    db,
+    session: ChatSession,
+    body: ChatIn,
+    category: Optional[str],
+    reason: str,
+    reply: str = GENERATION_ERROR_MESSAGE,
+) -> None:
+    """Persist the user message, the error (or partial) reply and an unanswered query with ``reason``."""
+    db.add(Message(
+        session_id=session.id,
+        role="user",
+        content=body.message,
+        category=category
+    ))
+    db.add(
+        UnansweredQuery(
+            text=body.message,
+            location=body.location,
+            reason=reason,
+            category=category,  # Will be None if categorization failed
+            session_id=session.id,
         )
-        db.add(assistant_message)
-        
-        # Commit both messages together
-        await db.commit()
-        await db.refresh(user_message)
-        await db.refresh(assistant_message)
-        print(f"[DEBUG] User message saved with ID: {user_message.id}, category: '{user_message.category}'")
-        print(f"[DEBUG] Assistant message saved with ID: {assistant_message.id}, category: '{assistant_message.category}'")
-        
-        # Get all messages for response
-        all_messages_result = await db.execute(
+    )
+    db.add(Message(
+        session_id=session.id,
+        role="assistant",
+        content=reply
+    ))
+    await db.commit()
+
+async def _session_messages(db, session_id: int, last_message_id: Optional[int] = None) -> List[Message]:
+    """
+    Messages to send back after a turn. With ``last_message_id`` (delta mode)
+    only rows newer than the client's last seen message are loaded, so the
+    cost per turn no longer grows with the session length.
+    """
+    if last_message_id is not None:
+        query = (
             select(Message)
-            .where(Message.session_id == session.id)
-            .order_by(Message.created_at)
+            .where(Message.session_id == session_id, Message.id > last_message_id)
+            .order_by(Message.id)
         )
-        all_messages = all_messages_result.scalars().all()
+    else:
+        query = queries.session_messages(session_id)
+    all_messages_result = await db.execute(query)
+    return all_messages_result.scalars().all()
+
+@router.post("/chat", response_model=ChatOut)
+async def chat(body: ChatIn, db=Depends(get_db), user=Depends(get_current_user)):
+    # ---------- Get or create chat session ---------------------------
+    session = await _get_or_create_session(db, body, user)
+    
+    # ---------- Get conversation history for context ------------------
+    conversation_history = await _load_conversation_history(db, session.id)
+    # Build user context string (do not prepend to conversation_history)
+    user_context = build_user_context(user)
+    
+    # ---------- Classify ALL questions alongside the pipeline ---------------
+    # The category is only needed when rows are saved, so it runs concurrently
+    # with aanswer(); the medical gate awaits it only if the local classifier
+    # is unsure. Started after the session and history queries, which may
+    # raise, so every path below joins the task.
+    classify_task = asyncio.create_task(_classify(body.message))
+    
+    # ---------- Generate response with hybrid system -----------------
+    try:
+        contextual_query = build_contextual_query(body.message, conversation_history)
         
+        print(f"[DEBUG] Calling aanswer() with:")
+        print(f"  - Query: {contextual_query[:100]}...")
+        print(f"  - Original query: {body.message}")
+        print(f"  - Conversation history items: {len(conversation_history)}")
+        
+        # Call the hybrid RAG + GPT-4o system
+        response, sources, metadata = await aanswer(
+            query=contextual_query,
+            conversation_history=conversation_history,
+            original_query=body.message,
+            user_context=user_context,
+            pending_classification=classify_task,
+        )
+    except Exception as e:
+        # Log the error and save the error reply
+        category = await _joined_category(classify_task)
+        await _save_error_turn(db, session, body, category, f"system_error: {str(e)}")
+        all_messages = await _session_messages(db, session.id, body.last_message_id)
         return {
-            "response": response,
-            "sources": sources,
+            "response": GENERATION_ERROR_MESSAGE,
+            "sources": [],
             "session_id": session.id,
-            "messages": [
-                MessageOut(
-                    id=msg.id,
-                    role=msg.role,
-                    content=msg.content,
-                    created_at=msg.created_at.isoformat(),
-                    category=msg.category,
-                    # sources=msg.sources,
-                    # response_metadata=msg.response_metadata
-                ) for msg in all_messages
-            ],
-            "metadata": metadata
+            "messages": [message_out(msg) for msg in all_messages],
+            "metadata": {"error": True}
         }
+    
+    # ---------- Success - save both messages together ---------------------
+    category = await _joined_category(classify_task)
+    await _save_turn(db, session, body, category, response, sources, metadata)
+    
+    # Get the new messages (or all of them without last_message_id) for the response
+    all_messages = await _session_messages(db, session.id, body.last_message_id)
+    
+    return {
+        "response": response,
+        "sources": sources,
+        "session_id": session.id,
+        "messages": [message_out(msg) for msg in all_messages],
+        "metadata": metadata
+    }
 
-@router.get("/chat/sessions", response_model=List[dict])
-async def get_chat_sessions(user=Depends(get_current_user)):
-    """Get all chat sessions for the current user"""
-    async with SessionLocal() as db:
-        result = await db.execute(
-            select(ChatSession)
-            .where(ChatSession.user_id == user.id)
-            .order_by(desc(ChatSession.created_at))
-        )
-        sessions = result.scalars().all()
-        
-        session_list = []
-        for session in sessions:
-            # Get the first message for preview
-            first_msg_result = await db.execute(
-                select(Message)
-                .where(Message.session_id == session.id, Message.role == "user")
-                .order_by(Message.created_at)
-                .limit(1)
-            )
-            first_message = first_msg_result.scalar_one_or_none()
+def _sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream(body: ChatIn, user=Depends(get_current_user)):
+    """
+    Streaming variant of /chat over Server-Sent Events.
+
+    Events, in order: ``session``, ``status`` (classification), ``sources``,
+    ``token`` (one per generation delta) and ``done``. The Message rows are
+    persisted when generation finishes; ``done`` carries the final formatted
+    response and the saved messages. Failures emit ``error`` instead. If the
+    client disconnects mid-stream, the question and the reply streamed so far
+    are saved as an "interrupted" turn.
+    """
+    user_context = build_user_context(user)
+
+    async def events():
+        async with SessionLocal() as db:
+            session = await _get_or_create_session(db, body, user)
+            yield _sse("session", {"session_id": session.id})
             
-            session_list.append({
-                "id": session.id,
-                "created_at": session.created_at.isoformat(),
-                "location": session.location,
-                "preview": first_message.content[:50] + "..." if first_message else "New conversation"
-            })
-        
-        return session_list
+            conversation_history = await _load_conversation_history(db, session.id)
+            # Started once the session is known, so a failed lookup leaves no task behind
+            classify_task = asyncio.create_task(_classify(body.message))
+            
+            final, streamed, saved = None, [], False
+            try:
+                try:
+                    async for event in astream_answer(
+                        query=build_contextual_query(body.message, conversation_history),
+                        conversation_history=conversation_history,
+                        original_query=body.message,
+                        user_context=user_context,
+                        pending_classification=classify_task,
+                    ):
+                        if event["event"] == "final":
+                            final = event["data"]
+                            continue
+                        if event["event"] == "token":
+                            streamed.append(event["data"]["text"])
+                        yield _sse(event["event"], event["data"])
+                    if final is None:
+                        raise RuntimeError("stream ended without a final response")
+                except Exception as e:
+                    print(f"[DEBUG] Streaming chat error: {e}")
+                    category = await _joined_category(classify_task)
+                    await _save_error_turn(db, session, body, category, f"system_error: {str(e)}")
+                    saved = True
+                    yield _sse("error", {"session_id": session.id, "response": GENERATION_ERROR_MESSAGE})
+                    return
+                
+                category = await _joined_category(classify_task)
+                user_message, assistant_message = await _save_turn(
+                    db, session, body, category, final["response"], final["sources"], final["metadata"]
+                )
+                saved = True
+                yield _sse("done", {
+                    "response": final["response"],
+                    "sources": final["sources"],
+                    "session_id": session.id,
+                    "messages": [message_out(user_message).model_dump(), message_out(assistant_message).model_dump()],
+                    "metadata": final["metadata"],
+                })
+            finally:
+                # Client disconnected (CancelledError / GeneratorExit) before the turn was saved
+                if not saved:
+                    print(f"[DEBUG] Stream interrupted for session {session.id}")
+                    classify_task.cancel()
+                    await _save_error_turn(
+                        db, session, body, None, "interrupted", "".join(streamed) or GENERATION_ERROR_MESSAGE
+                    )
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/chat/sessions", response_model=List[dict])
+async def get_chat_sessions(
+    response: Response,
+    before_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Get the current user's chat sessions, newest first, with previews.
+
+    Without ``limit`` every session is returned in one query. With ``limit``
+    one page is returned; when more sessions exist, the ``X-Next-Cursor``
+    header holds the ``before_id`` for the next page.
+    """
+    result = await db.execute(
+        # One extra row tells us whether another page exists
+        queries.user_sessions(user.id, limit=limit + 1 if limit else None, before_id=before_id)
+    )
+    rows = result.all()
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1][0].id)
+    
+    session_list = []
+    for session, preview in rows:
+        session_list.append({
+            "id": session.id,
+            "created_at": session.created_at.isoformat(),
+            "location": session.location,
+            "preview": preview[:50] + "..." if preview else "New conversation"
+        })
+    
+    return session_list
 
 @router.get("/chat/session/{session_id}", response_model=List[MessageOut])
-async def get_session_messages(session_id: int, user=Depends(get_current_user)):
-    """Get all messages for a specific session"""
-    async with SessionLocal() as db:
-        # Verify session belongs to user
-        session_result = await db.execute(
-            select(ChatSession).where(
-                ChatSession.id == session_id,
-                ChatSession.user_id == user.id
-            )
-        )
-        session = session_result.scalar_one_or_none()
-        
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-        
-        # Get messages
-        messages_result = await db.execute(
-            select(Message)
-            .where(Message.session_id == session_id)
-            .order_by(Message.created_at)
-        )
+async def get_session_messages(
+    session_id: int,
+    response: Response,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db=Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Get messages for a specific session, oldest first.
+
+    Without parameters the whole session is returned. With ``limit`` the
+    newest page is returned (or the page just before ``before_id``), and the
+    ``X-Next-Cursor`` header holds the id to pass as ``before_id`` for the
+    previous page. ``after_id`` returns only messages newer than that id;
+    with ``limit`` it pages forward, oldest first, and ``X-Next-Cursor``
+    holds the id to pass as ``after_id`` for the next page.
+    """
+    # Verify session belongs to user
+    session_result = await db.execute(
+        queries.owned_session(session_id, user.id)
+    )
+    session = session_result.scalar_one_or_none()
+    
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    # Get messages (keyset pagination on the message id)
+    query = select(Message).where(Message.session_id == session_id)
+    if before_id is not None:
+        query = query.where(Message.id < before_id)
+    if after_id is not None:
+        query = query.where(Message.id > after_id)
+    
+    if limit is None:
+        messages_result = await db.execute(query.order_by(Message.created_at))
         messages = messages_result.scalars().all()
-        
-        return [
-            MessageOut(
-                id=msg.id,
-                role=msg.role,
-                content=msg.content,
-                created_at=msg.created_at.isoformat(),
-                category=msg.category,
-                # sources=msg.sources,
-                # response_metadata=msg.response_metadata
-            ) for msg in messages
-        ]
+    elif after_id is not None:
+        # Forward paging: the page right after the cursor, so nothing is skipped
+        messages_result = await db.execute(query.order_by(Message.id).limit(limit + 1))
+        messages = messages_result.scalars().all()
+        if len(messages) > limit:
+            messages = messages[:limit]
+            response.headers["X-Next-Cursor"] = str(messages[-1].id)
+    else:
+        # Newest page first, then back to chronological order; one extra
+        # row tells us whether an older page exists
+        messages_result = await db.execute(query.order_by(desc(Message.id)).limit(limit + 1))
+        messages = messages_result.scalars().all()
+        if len(messages) > limit:
+            messages = messages[:limit]
+            response.headers["X-Next-Cursor"] = str(messages[-1].id)
+        messages = list(reversed(messages))
+    
+    return [message_out(msg) for msg in messages]
 
 @router.delete("/chat/session/{session_id}")
-async def delete_chat_session(session_id: int, user=Depends(get_current_user)):
+async def delete_chat_session(session_id: int, db=Depends(get_db), user=Depends(get_current_user)):
     """Delete a chat session and all its messages for the current user"""
-    async with SessionLocal() as db:
-        # Verify session belongs to user
-        session_result = await db.execute(
-            select(ChatSession).where(
-                ChatSession.id == session_id,
-                ChatSession.user_id == user.id
-            )
-        )
-        session = session_result.scalar_one_or_none()
-        if not session:
-            raise HTTPException(status_code=404, detail="Session not found")
-        # Delete all messages for this session
-        await db.execute(
-            Message.__table__.delete().where(Message.session_id == session_id)
-        )
-        # Delete the session itself
-        await db.execute(
-            ChatSession.__table__.delete().where(ChatSession.id == session_id)
-        )
-        await db.commit()
-        return {"success": True, "session_id": session_id}
+    # Verify session belongs to user
+    session_result = await db.execute(
+        queries.owned_session(session_id, user.id)
+    )
+    session = session_result.scalar_one_or_none()
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    # Delete all messages for this session
+    await db.execute(
+        Message.__table__.delete().where(Message.session_id == session_id)
+    )
+    # Delete the session itself
+    await db.execute(
+        ChatSession.__table__.delete().where(ChatSession.id == session_id)
+    )
+    await db.commit()
+    return {"success": True, "session_id": session_id}
 
 @router.get("/chat/categories")
 async def get_categories():
@@ -6,7 +6,17 @@ class Settings(BaseSettings):
     jwt_secret: str = "CHANGE_ME"
     jwt_alg: str = "HS256"
     openai_api_key: str
-    database_url: str = "sqlite+aiosqlite:///./dev.db"
+    database_url: str = "sqlite+aiosqlite:///./dev.db"  # or postgresql+asyncpg://user:pw@host/db
+
+    # Database engine (see db/models.create_db_engine)
+    db_echo: bool = False
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # seconds to wait for a pooled connection
+    db_pool_recycle: int = 1800  # seconds before a connection is replaced
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 30000  # Postgres statement_timeout / SQLite busy_timeout
+    sqlite_mmap_size: int = 256 * 1024 * 1024
 
     class Config:
         env_file = ".env"
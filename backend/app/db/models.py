@@ -1,14 +1,88 @@
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from sqlalchemy.ext.asyncio import AsyncAttrs, create_async_engine, async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncAttrs, AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, synonym
-from sqlalchemy import String, ForeignKey, JSON, func, Text, Column, Integer, Float, DateTime
-from ..core.config import get_settings
+from sqlalchemy import String, ForeignKey, JSON, func, Text, Column, Integer, Float, DateTime, Index, UniqueConstraint, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from ..core.config import Settings, get_settings
+
+
+def create_db_engine(settings: Settings) -> AsyncEngine:
+    """
+    Async engine for ``settings.database_url`` with pool and timeout settings.
+
+    - SQLite (aiosqlite): WAL journal, synchronous=NORMAL, mmap and a busy
+      timeout on every connection, so readers no longer block chat writes.
+    - Postgres: plain ``postgresql://`` URLs use asyncpg; the statement
+      timeout is set per connection through server_settings.
+    """
+    url = make_url(settings.database_url)
+    kwargs = {
+        "echo": settings.db_echo,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+
+    if url.get_backend_name() == "sqlite":
+        kwargs["connect_args"] = {"timeout": settings.db_statement_timeout_ms / 1000}
+        in_memory = url.database in (None, "", ":memory:")
+        if not in_memory:
+            # aiosqlite defaults to NullPool for files (a new connection, and
+            # the PRAGMAs, per checkout); keep a real pool instead
+            kwargs.update(
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=settings.db_pool_size,
+                max_overflow=settings.db_max_overflow,
+                pool_timeout=settings.db_pool_timeout,
+                pool_recycle=settings.db_pool_recycle,
+            )
+        db_engine = create_async_engine(url, **kwargs)
+
+        @event.listens_for(db_engine.sync_engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if not in_memory:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.db_statement_timeout_ms)}")
+            cursor.close()
+
+        return db_engine
+
+    if url.get_backend_name() == "postgresql":
+        if url.drivername == "postgresql":
+            url = url.set(drivername="postgresql+asyncpg")
+        if url.drivername == "postgresql+asyncpg":
+            kwargs["connect_args"] = {
+                "server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)},
+                "command_timeout": settings.db_statement_timeout_ms / 1000,
+            }
+
+    return create_async_engine(
+        url,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        **kwargs,
+    )
+
 
 settings = get_settings()
-engine = create_async_engine(settings.database_url, echo=False)
+engine = create_db_engine(settings)
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
+
+async def get_db():
+    """
+    Request-scoped session dependency. FastAPI resolves it once per request,
+    so the auth dependency and the handler share one session (and at most one
+    pooled connection, checked out only when a query actually runs).
+    """
+    async with SessionLocal() as db:
+        yield db
+
 class Base(AsyncAttrs, DeclarativeBase):
     pass
 
@@ -33,6 +107,9 @@ class User(Base):
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        Index("ix_chat_sessions_user_id_created_at", "user_id", "created_at"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -43,6 +120,14 @@ class ChatSession(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Newest-first history window reads (see services/history.py)
+        Index("ix_messages_session_id_created_at", "session_id", "created_at"),
+        # Session previews and the question preceding an answer
+        Index("ix_messages_session_id_role_created_at", "session_id", "role", "created_at"),
+        # Analytics over assistant/user messages
+        Index("ix_messages_role_created_at", "role", "created_at"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     session_id: Mapped[int] = mapped_column(ForeignKey("chat_sessions.id"))
@@ -66,4 +151,39 @@ class UnansweredQuery(Base):
     category = Column(String(50), nullable=True)  # Question category
     created_at = Column(DateTime, default=datetime.utcnow)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=True) 
-    sources = Column(JSON, nullable=True) 
\ No newline at end of file
+    sources = Column(JSON, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_unanswered_queries_created_at", "created_at"),
+        Index("ix_unanswered_queries_category_created_at", "category", "created_at"),
+        Index("ix_unanswered_queries_reason_created_at", "reason", "created_at"),
+        Index("ix_unanswered_queries_session_id", "session_id"),
+    ) 
+
+class AnalyticsRollup(Base):
+    """Pre-aggregated analytics counts, maintained by services/analytics.refresh_rollups."""
+    __tablename__ = "analytics_rollups"
+    __table_args__ = (
+        UniqueConstraint("kind", "day", "category", "country", "gender", "age_band", "reason", name="uq_analytics_rollups_key"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str] = mapped_column(String(10))  # "answered" / "unanswered"
+    day: Mapped[str] = mapped_column(String(10))  # YYYY-MM-DD
+    category: Mapped[str] = mapped_column(String(50))
+    country: Mapped[str] = mapped_column(String(100))
+    gender: Mapped[str] = mapped_column(String(50))
+    age_band: Mapped[str] = mapped_column(String(10))
+    reason: Mapped[str] = mapped_column(String(100))
+    count: Mapped[int] = mapped_column(default=0)
+    score_count: Mapped[int] = mapped_column(default=0)  # rows with a RAG score
+    score_sum: Mapped[float] = mapped_column(Float, default=0.0)
+    score_hist: Mapped[List[int]] = mapped_column(JSON)  # RAG-score histogram, 10 buckets over [0, 1]
+
+class AnalyticsWatermark(Base):
+    """Last source row folded into the rollups, per source table."""
+    __tablename__ = "analytics_watermarks"
+    
+    source: Mapped[str] = mapped_column(String(50), primary_key=True)
+    last_id: Mapped[int] = mapped_column(default=0)
+    updated_at: Mapped[datetime] = mapped_column(server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,131 @@
+"""
+Statement builders for the hot router queries.
+
+Kept in one place so tests/test_query_plans.py can check with EXPLAIN QUERY
+PLAN that each of them is served by an index (see the composite indexes on
+the models).
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Select, and_, desc, or_, select
+from sqlalchemy.orm import aliased
+
+from .models import ChatSession, Message, UnansweredQuery, User
+
+
+def user_sessions(
+    user_id: int,
+    limit: Optional[int] = None,
+    before_id: Optional[int] = None,
+) -> Select:
+    """
+    A user's chat sessions, newest first, as (ChatSession, preview) rows where
+    preview is the first user message (one correlated subquery on
+    ix_messages_session_id_role_created_at instead of a query per session).
+    ``before_id`` is the last session of the previous page; the keyset is
+    (created_at, id), compared against the stored row so the timestamp
+    format never matters (ix_chat_sessions_user_id_created_at).
+    """
+    preview = (
+        select(Message.content)
+        .where(Message.session_id == ChatSession.id, Message.role == "user")
+        .order_by(Message.created_at)
+        .limit(1)
+        .correlate(ChatSession)
+        .scalar_subquery()
+    )
+    query = (
+        select(ChatSession, preview.label("preview"))
+        .where(ChatSession.user_id == user_id)
+        .order_by(desc(ChatSession.created_at), desc(ChatSession.id))
+    )
+    if before_id is not None:
+        cursor = aliased(ChatSession)
+        cursor_created_at = select(cursor.created_at).where(cursor.id == before_id).scalar_subquery()
+        query = query.where(or_(
+            ChatSession.created_at < cursor_created_at,
+            and_(ChatSession.created_at == cursor_created_at, ChatSession.id < before_id),
+        ))
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def owned_session(session_id: int, user_id: int) -> Select:
+    """One session, only if it belongs to the user (primary key)."""
+    return select(ChatSession).where(
+        ChatSession.id == session_id,
+        ChatSession.user_id == user_id
+    )
+
+
+def preceding_user_message(session_id: int, before: datetime) -> Select:
+    """The user question just before an assistant reply (ix_messages_session_id_role_created_at)."""
+    return (
+        select(Message)
+        .where(
+            Message.session_id == session_id,
+            Message.role == "user",
+            Message.created_at < before
+        )
+        .order_by(Message.created_at.desc())
+        .limit(1)
+    )
+
+
+def session_messages(session_id: int) -> Select:
+    """Every message of a session in order (ix_messages_session_id_created_at)."""
+    return (
+        select(Message)
+        .where(Message.session_id == session_id)
+        .order_by(Message.created_at)
+    )
+
+
+def history_window(session_id: int, limit: int) -> Select:
+    """Most recent (role, content) rows, newest first (ix_messages_session_id_created_at)."""
+    return (
+        select(Message.role, Message.content)
+        .where(Message.session_id == session_id)
+        # id breaks ties between rows saved in the same second
+        .order_by(desc(Message.created_at), desc(Message.id))
+        .limit(limit)
+    )
+
+
+def assistant_messages() -> Select:
+    """Answered analytics rows: assistant messages with their session and user (ix_messages_role_created_at)."""
+    return (
+        select(Message, ChatSession, User)
+        .join(ChatSession, Message.session_id == ChatSession.id)
+        .join(User, ChatSession.user_id == User.id)
+        .where(Message.role == "assistant")
+    )
+
+
+def latest_unanswered(limit: int) -> Select:
+    """Most recent unanswered queries (ix_unanswered_queries_created_at)."""
+    return (
+        select(UnansweredQuery)
+        .order_by(UnansweredQuery.created_at.desc())
+        .limit(limit)
+    )
+
+
+def unanswered_with_users(category: Optional[str] = None, reason: Optional[str] = None) -> Select:
+    """
+    Unanswered analytics rows with their session and user. Category and reason
+    filters use ix_unanswered_queries_category_created_at /
+    ix_unanswered_queries_reason_created_at.
+    """
+    query = (
+        select(UnansweredQuery, ChatSession, User)
+        .outerjoin(ChatSession, UnansweredQuery.session_id == ChatSession.id)
+        .outerjoin(User, ChatSession.user_id == User.id)
+    )
+    if category:
+        query = query.where(UnansweredQuery.category == category)
+    if reason:
+        query = query.where(UnansweredQuery.reason == reason)
+    return query
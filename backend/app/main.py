@@ -1,3 +1,5 @@
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -5,6 +7,9 @@ from .api.v1.admin import router as admin_router
 from .api.v1.auth import router as auth_router
 from .api.v1.chat import router as chat_router
 from .api.v1.preview import router as preview_router
+from .db.models import SessionLocal
+from .services.local_classifier import load_labelled_messages
+from .services.rag import medical_classifier
 
 
 app = FastAPI(title="MedHelp Chatbot – Pre‑Beta")
@@ -16,6 +21,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # pagination cursor, readable by the frontend
 )
 
 app.include_router(auth_router, prefix="/api/v1/auth", tags=["auth"])
@@ -24,6 +30,19 @@ app.include_router(admin_router, prefix="/api/v1/admin", tags=["admin"])
 app.include_router(preview_router)
 
 
+@app.on_event("startup")
+async def train_local_classifier():
+    """Extend the local medical/general classifier with stored, categorized questions."""
+    limit = int(os.getenv("LOCAL_CLASSIFIER_TRAIN_LIMIT", "0"))
+    if not limit:
+        return
+    async with SessionLocal() as db:
+        examples = await load_labelled_messages(db, limit)
+    if examples:
+        texts, labels = zip(*examples)
+        medical_classifier.add_examples(list(texts), list(labels))
+        print(f"[DEBUG] Local classifier: added {len(examples)} labelled messages")
+
 
 @app.get("/healthz")
 async def health_check():
@@ -0,0 +1,555 @@
+"""SQL query layer for the admin analytics endpoint."""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, and_, func, literal, null, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import aliased
+
+from ..db.models import AnalyticsRollup, AnalyticsWatermark, ChatSession, Message, UnansweredQuery, User
+
+MAX_ANALYTICS_PAGE = 5000
+
+
+def user_filters(
+    ethnic_group: Optional[str] = None,
+    min_age: Optional[int] = None,
+    max_age: Optional[int] = None,
+    gender: Optional[str] = None,
+    country: Optional[str] = None,
+    long_term_conditions: Optional[str] = None,
+    medications: Optional[str] = None,
+    user_id: Optional[int] = None,
+) -> List[Any]:
+    """WHERE clauses on the joined User row."""
+    filters = []
+    if ethnic_group:
+        filters.append(User.ethnic_group == ethnic_group)
+    if gender:
+        filters.append(User.gender == gender)
+    if country:
+        filters.append(User.country == country)
+    if long_term_conditions:
+        filters.append(User.long_term_conditions.like(f"%{long_term_conditions}%"))
+    if medications:
+        filters.append(User.medications.like(f"%{medications}%"))
+    if min_age or max_age:
+        today = datetime.today()
+        if min_age:
+            max_birth = today.replace(year=today.year - min_age)
+            filters.append(User.date_of_birth <= max_birth.strftime("%Y-%m-%d"))
+        if max_age:
+            min_birth = today.replace(year=today.year - max_age)
+            filters.append(User.date_of_birth >= min_birth.strftime("%Y-%m-%d"))
+    if user_id:
+        filters.append(User.id == user_id)
+    return filters
+
+
+def _user_columns() -> List[Any]:
+    return [
+        User.id.label("user_id"),
+        User.ethnic_group,
+        User.gender,
+        User.date_of_birth,
+        User.country,
+        User.long_term_conditions,
+        User.medications,
+    ]
+
+
+def answered_query(
+    filters: List[Any],
+    category: Optional[str] = None,
+    rag_score_min: Optional[float] = None,
+    rag_score_max: Optional[float] = None,
+    session_id: Optional[int] = None,
+) -> Select:
+    """
+    One row per assistant message with its question, category and the user's
+    demographics. Older rows without ``user_question``/``category`` take them
+    from the preceding user message through correlated subqueries on
+    ix_messages_session_id_role_created_at, instead of a query per row.
+    """
+    def preceding_user(column):
+        candidate = aliased(Message)
+        return (
+            select(getattr(candidate, column))
+            .where(
+                candidate.session_id == Message.session_id,
+                candidate.role == "user",
+                candidate.id < Message.id,
+            )
+            .order_by(candidate.created_at.desc(), candidate.id.desc())
+            .limit(1)
+            .correlate(Message)
+            .scalar_subquery()
+        )
+
+    question_category = func.coalesce(Message.category, preceding_user("category"))
+
+    query = (
+        select(
+            Message.id.label("id"),
+            func.coalesce(Message.user_question, preceding_user("content"), literal("Unknown question")).label("question"),
+            Message.content.label("answer"),
+            ChatSession.id.label("session_id"),
+            *_user_columns(),
+            Message.created_at,
+            Message.confidence_score.label("rag_score"),
+            null().label("reason"),
+            Message.sources,
+            question_category.label("category"),
+        )
+        .join(ChatSession, Message.session_id == ChatSession.id)
+        .join(User, ChatSession.user_id == User.id)
+        .where(Message.role == "assistant", *filters)
+    )
+    if session_id:
+        query = query.where(ChatSession.id == session_id)
+    if rag_score_min is not None:
+        query = query.where(Message.confidence_score >= rag_score_min)
+    if rag_score_max is not None:
+        query = query.where(Message.confidence_score <= rag_score_max)
+    if category:
+        query = query.where(question_category == category)
+    return query
+
+
+def unanswered_query(
+    filters: List[Any],
+    category: Optional[str] = None,
+    reason: Optional[str] = None,
+    rag_score_min: Optional[float] = None,
+    rag_score_max: Optional[float] = None,
+    session_id: Optional[int] = None,
+) -> Select:
+    """One row per unanswered query with the (optional) session and user."""
+    query = (
+        select(
+            UnansweredQuery.id.label("id"),
+            UnansweredQuery.text.label("question"),
+            ChatSession.id.label("session_id"),
+            *_user_columns(),
+            UnansweredQuery.created_at,
+            UnansweredQuery.score.label("rag_score"),
+            UnansweredQuery.reason,
+            UnansweredQuery.sources,
+            UnansweredQuery.category,
+        )
+        .outerjoin(ChatSession, UnansweredQuery.session_id == ChatSession.id)
+        .outerjoin(User, ChatSession.user_id == User.id)
+        .where(*filters)
+    )
+    if session_id:
+        query = query.where(ChatSession.id == session_id)
+    if category:
+        query = query.where(UnansweredQuery.category == category)
+    if reason:
+        query = query.where(UnansweredQuery.reason == reason)
+    if rag_score_min is not None:
+        query = query.where(UnansweredQuery.score >= rag_score_min)
+    if rag_score_max is not None:
+        query = query.where(UnansweredQuery.score <= rag_score_max)
+    return query
+
+
+def paginate(
+    query: Select,
+    answered: bool,
+    sort: str = "created_at",
+    descending: bool = True,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = 1000,
+) -> Select:
+    """
+    Server-side sort plus keyset pagination on (sort key, id). ``after_id`` is
+    the id of the last row of the previous page; its sort key is read from
+    the stored row so timestamp formats never have to round-trip. Missing
+    RAG scores sort as -1. ``limit=None`` returns every row (exports).
+    """
+    model = Message if answered else UnansweredQuery
+
+    def sort_key(entity):
+        if sort == "rag_score":
+            column = entity.confidence_score if answered else entity.score
+            return func.coalesce(column, -1.0)
+        return entity.created_at
+
+    key = sort_key(model)
+    if after_id is not None:
+        cursor = aliased(model)
+        cursor_key = select(sort_key(cursor)).where(cursor.id == after_id).scalar_subquery()
+        if descending:
+            query = query.where(or_(key < cursor_key, and_(key == cursor_key, model.id < after_id)))
+        else:
+            query = query.where(or_(key > cursor_key, and_(key == cursor_key, model.id > after_id)))
+
+    if descending:
+        query = query.order_by(key.desc(), model.id.desc())
+    else:
+        query = query.order_by(key.asc(), model.id.asc())
+    return query.limit(limit) if limit is not None else query
+
+
+def rows_to_dicts(rows) -> List[Dict[str, Any]]:
+    """Result rows as the analytics response dicts (the cursor id is dropped)."""
+    results = []
+    for row in rows:
+        item = dict(row._mapping)
+        item.pop("id", None)
+        results.append(item)
+    return results
+
+
+# --------------------------------------------------------------------------- #
+# Streaming export
+# --------------------------------------------------------------------------- #
+EXPORT_CHUNK_ROWS = 2000  # rows fetched per server-side cursor partition
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _export_columns(query: Select) -> List[str]:
+    return [c.key for c in query.selected_columns if c.key != "id"]
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _normalise_sources(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+class _ChunkSink:
+    """Write-only file object for pyarrow that hands written bytes back in chunks."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(columns: List[str]):
+    import pyarrow as pa
+
+    types = {
+        "session_id": pa.int64(),
+        "user_id": pa.int64(),
+        "created_at": pa.timestamp("us"),
+        "rag_score": pa.float64(),
+        "sources": pa.list_(pa.string()),
+    }
+    return pa.schema([(name, types.get(name, pa.string())) for name in columns])
+
+
+def _arrow_batch(rows, columns: List[str], schema):
+    import pyarrow as pa
+
+    data = {name: [] for name in columns}
+    for row in rows:
+        mapping = row._mapping
+        for name in columns:
+            value = mapping[name]
+            if name == "sources":
+                value = _normalise_sources(value)
+            elif value is not None and schema.field(name).type == pa.string():
+                value = str(value)
+            data[name].append(value)
+    return pa.RecordBatch.from_pydict(data, schema=schema)
+
+
+async def stream_export(db, query: Select, fmt: str):
+    """
+    Yield the rows of an analytics statement as ``fmt`` bytes, one chunk per
+    server-side cursor partition, so memory stays flat however many rows are
+    exported. ``fmt`` is one of EXPORT_MEDIA_TYPES.
+    """
+    columns = _export_columns(query)
+    result = await db.stream(query.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+
+    if fmt == "ndjson":
+        async for rows in result.partitions():
+            yield "".join(
+                json.dumps({name: _export_value(row._mapping[name]) for name in columns}, default=str) + "\n"
+                for row in rows
+            ).encode()
+        return
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        async for rows in result.partitions():
+            for row in rows:
+                writer.writerow([
+                    json.dumps(row._mapping[name]) if name == "sources" else _export_value(row._mapping[name])
+                    for name in columns
+                ])
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+        return
+
+    # Arrow IPC stream and Parquet: one record batch / row group per partition
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(columns)
+    sink = _ChunkSink()
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+    else:
+        writer = pq.ParquetWriter(sink, schema)
+        write = lambda batch: writer.write_table(pa.Table.from_batches([batch]))
+    try:
+        async for rows in result.partitions():
+            write(_arrow_batch(rows, columns, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+# --------------------------------------------------------------------------- #
+# Rollups
+# --------------------------------------------------------------------------- #
+ROLLUP_DIMENSIONS = ("day", "category", "country", "gender", "age_band", "reason")
+ROLLUP_BATCH_ROWS = 5000  # source rows folded in per refresh transaction
+# Rows newer than this are left for the next refresh: ids are allocated
+# before commit, so a lower id may still become visible after a higher one
+ROLLUP_SETTLE_SECONDS = 60
+SCORE_BUCKETS = 10
+UNKNOWN = "Unknown"
+
+# (exclusive upper age, label)
+AGE_BANDS = ((18, "0-17"), (30, "18-29"), (45, "30-44"), (60, "45-59"), (75, "60-74"))
+
+
+def age_band(date_of_birth: Optional[str], at: Optional[datetime]) -> str:
+    """Age band of a user at the time of a message (date_of_birth is an ISO date string)."""
+    if not date_of_birth or at is None:
+        return UNKNOWN
+    try:
+        born = datetime.strptime(date_of_birth[:10], "%Y-%m-%d")
+    except ValueError:
+        return UNKNOWN
+    age = at.year - born.year - ((at.month, at.day) < (born.month, born.day))
+    for upper, label in AGE_BANDS:
+        if age < upper:
+            return label
+    return "75+"
+
+
+def score_bucket(score: float) -> int:
+    """Histogram bucket of a RAG score in [0, 1]."""
+    return min(SCORE_BUCKETS - 1, max(0, int(score * SCORE_BUCKETS)))
+
+
+def _reason_key(reason: Optional[str]) -> str:
+    # "system_error: <exception text>" would give one group per error message
+    return reason.split(":", 1)[0].strip()[:100] if reason else UNKNOWN
+
+
+def _rollup_key(row) -> Tuple[str, ...]:
+    created_at = row.created_at
+    return (
+        created_at.strftime("%Y-%m-%d") if created_at else UNKNOWN,
+        (row.category or UNKNOWN)[:50],
+        (row.country or UNKNOWN)[:100],
+        (row.gender or UNKNOWN)[:50],
+        age_band(row.date_of_birth, created_at),
+        _reason_key(row.reason),
+    )
+
+
+def _insert(db, model):
+    """INSERT with ON CONFLICT support for the session's dialect (PostgreSQL or SQLite)."""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+
+async def _lock_watermark(db, source: str) -> int:
+    """
+    Lock ``source``'s watermark row until commit and return its last id.
+    PostgreSQL holds the row lock (SELECT ... FOR UPDATE); on SQLite the
+    upsert is a write, so it takes the database write lock instead.
+    """
+    await db.execute(
+        _insert(db, AnalyticsWatermark).values(source=source, last_id=0)
+        .on_conflict_do_nothing(index_elements=["source"])
+    )
+    return (await db.execute(
+        select(AnalyticsWatermark.last_id).where(AnalyticsWatermark.source == source).with_for_update()
+    )).scalar_one()
+
+
+async def _fold_batch(db, kind: str, source: str, model, settled_before: datetime) -> int:
+    """Fold up to ROLLUP_BATCH_ROWS new source rows into the rollups in one transaction; returns the row count."""
+    last_id = await _lock_watermark(db, source)
+    base = answered_query([]) if kind == "answered" else unanswered_query([])
+    rows = (await db.execute(
+        base.where(model.id > last_id, model.created_at < settled_before).order_by(model.id).limit(ROLLUP_BATCH_ROWS)
+    )).all()
+    if not rows:
+        await db.commit()
+        return 0
+
+    deltas: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for row in rows:
+        delta = deltas.setdefault(_rollup_key(row), {
+            "count": 0, "score_count": 0, "score_sum": 0.0, "score_hist": [0] * SCORE_BUCKETS,
+        })
+        delta["count"] += 1
+        if row.rag_score is not None:
+            delta["score_count"] += 1
+            delta["score_sum"] += row.rag_score
+            delta["score_hist"][score_bucket(row.rag_score)] += 1
+
+    # Existing rollup rows for the days touched by this batch; the watermark
+    # lock keeps other refreshes from changing them until commit
+    days = {key[0] for key in deltas}
+    existing = {
+        tuple(r[:len(ROLLUP_DIMENSIONS)]): r
+        for r in (await db.execute(
+            select(*(getattr(AnalyticsRollup, name) for name in ROLLUP_DIMENSIONS),
+                   AnalyticsRollup.count, AnalyticsRollup.score_count,
+                   AnalyticsRollup.score_sum, AnalyticsRollup.score_hist)
+            .where(AnalyticsRollup.kind == kind, AnalyticsRollup.day.in_(days))
+        )).all()
+    }
+    values = []
+    for key, delta in deltas.items():
+        current = existing.get(key)
+        if current is not None:
+            delta["count"] += current.count
+            delta["score_count"] += current.score_count
+            delta["score_sum"] += current.score_sum
+            delta["score_hist"] = [a + b for a, b in zip(current.score_hist, delta["score_hist"])]
+        values.append({"kind": kind, **dict(zip(ROLLUP_DIMENSIONS, key)), **delta})
+
+    upsert = _insert(db, AnalyticsRollup)
+    await db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=["kind", *ROLLUP_DIMENSIONS],
+            set_={name: upsert.excluded[name] for name in ("count", "score_count", "score_sum", "score_hist")},
+        ),
+        values,
+    )
+    await db.execute(
+        update(AnalyticsWatermark).where(AnalyticsWatermark.source == source).values(last_id=rows[-1].id)
+    )
+    await db.commit()
+    return len(rows)
+
+
+async def refresh_rollups(db) -> Dict[str, int]:
+    """
+    Incrementally fold new messages / unanswered_queries rows into
+    analytics_rollups, batch by batch from each source's id watermark.
+    Each batch holds the watermark row lock, so concurrent refreshes (in
+    any process) serialise instead of double-counting. Rows younger than
+    ROLLUP_SETTLE_SECONDS wait for a later refresh. Returns the number of
+    rows folded per source.
+    """
+    # created_at is UTC (server now() / datetime.utcnow)
+    settled_before = datetime.utcnow() - timedelta(seconds=ROLLUP_SETTLE_SECONDS)
+    folded = {}
+    for kind, source, model in (
+        ("answered", "messages", Message),
+        ("unanswered", "unanswered_queries", UnansweredQuery),
+    ):
+        total = 0
+        while True:
+            count = await _fold_batch(db, kind, source, model, settled_before)
+            total += count
+            if count < ROLLUP_BATCH_ROWS:
+                break
+        folded[source] = total
+    if any(folded.values()):
+        print(f"[DEBUG] Analytics rollups refreshed: {folded}")
+    return folded
+
+
+async def rollup_summary(
+    db,
+    answered: bool,
+    group_by: Sequence[str],
+    start_day: Optional[str] = None,
+    end_day: Optional[str] = None,
+    **dimension_filters: Optional[str],
+) -> List[Dict[str, Any]]:
+    """
+    Rollup rows grouped by ``group_by`` (a subset of ROLLUP_DIMENSIONS) with
+    counts, average RAG score and the summed RAG-score histogram.
+    ``dimension_filters`` are exact matches on the other dimensions.
+    """
+    query = select(AnalyticsRollup).where(AnalyticsRollup.kind == ("answered" if answered else "unanswered"))
+    if start_day:
+        query = query.where(AnalyticsRollup.day >= start_day)
+    if end_day:
+        query = query.where(AnalyticsRollup.day <= end_day)
+    for name, value in dimension_filters.items():
+        if value:
+            query = query.where(getattr(AnalyticsRollup, name) == value)
+
+    groups: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for rollup in (await db.execute(query)).scalars():
+        key = tuple(getattr(rollup, name) for name in group_by)
+        group = groups.setdefault(key, {
+            **dict(zip(group_by, key)),
+            "count": 0, "score_count": 0, "score_sum": 0.0, "score_hist": [0] * SCORE_BUCKETS,
+        })
+        group["count"] += rollup.count
+        group["score_count"] += rollup.score_count
+        group["score_sum"] += rollup.score_sum
+        group["score_hist"] = [a + b for a, b in zip(group["score_hist"], rollup.score_hist)]
+
+    results = []
+    for key in sorted(groups):
+        group = groups[key]
+        score_count, score_sum = group.pop("score_count"), group.pop("score_sum")
+        group["avg_rag_score"] = score_sum / score_count if score_count else None
+        results.append(group)
+    return results
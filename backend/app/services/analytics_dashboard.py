@@ -2,6 +2,7 @@ import streamlit as st
 import requests
 import pandas as pd
 import datetime
+import json
 # import sys
 # import os
 # sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -12,6 +13,7 @@ st.set_page_config(page_title="Analytics Dashboard", layout="wide")
 st.title("Kyra Analytics Dashboard")
 
 API_URL = st.secrets["API_URL"] if "API_URL" in st.secrets else "http://localhost:8000/api/v1/admin/analytics"
+EXPORT_URL = f"{API_URL}/export"
 
 # --- Authentication ---
 def login_form():
@@ -59,115 +61,182 @@ if st.sidebar.button("Logout"):
 answered = st.sidebar.radio("Show", ["Answered", "Unanswered"]) == "Answered"
 
 # --- Filters ---
+# (exclusive upper age, label): same as AGE_BANDS in services/analytics.py
+AGE_BAND_LIMITS = ((18, "0-17"), (30, "18-29"), (45, "30-44"), (60, "45-59"), (75, "60-74"))
+# label -> (min_age, max_age) for the raw export, whose max_age is exclusive
+AGE_BANDS = {}
+lower_age = 0
+for upper_age, label in AGE_BAND_LIMITS:
+    AGE_BANDS[label] = (lower_age, upper_age)
+    lower_age = upper_age
+AGE_BANDS["75+"] = (lower_age, 0)
+
 st.sidebar.header("Filters")
-ethnic_group = st.sidebar.text_input("Ethnic Group")
 gender = st.sidebar.text_input("Gender")
 country = st.sidebar.text_input("Country")
-long_term_conditions = st.sidebar.text_input("Long Term Conditions")
-medications = st.sidebar.text_input("Medications")
-min_age = st.sidebar.number_input("Min Age", min_value=0, max_value=120, value=0)
-max_age = st.sidebar.number_input("Max Age", min_value=0, max_value=120, value=0)
-rag_score_min = st.sidebar.number_input("Min RAG Score", value=0.0)
-rag_score_max = st.sidebar.number_input("Max RAG Score", value=0.0)
+age_band = st.sidebar.selectbox("Age Band", ["All"] + list(AGE_BANDS))
 reason = st.sidebar.text_input("Reason (for unanswered)")
 category = st.sidebar.selectbox("Category", ["All"] + ["Symptoms & Diagnosis", "Treatment & Medication", "Prevention & Lifestyle"])
 
-params = {"answered": answered}
-if ethnic_group:
-    params["ethnic_group"] = ethnic_group
+# Filters the summary endpoint understands (the rollup dimensions)
+summary_filters = {}
 if gender:
-    params["gender"] = gender
+    summary_filters["gender"] = gender
 if country:
-    params["country"] = country
-if long_term_conditions:
-    params["long_term_conditions"] = long_term_conditions
-if medications:
-    params["medications"] = medications
-if min_age:
-    params["min_age"] = min_age
-if max_age:
-    params["max_age"] = max_age
-if rag_score_min:
-    params["rag_score_min"] = rag_score_min
-if rag_score_max:
-    params["rag_score_max"] = rag_score_max
+    summary_filters["country"] = country
+if age_band != "All":
+    summary_filters["age_band"] = age_band
 if not answered and reason:
-    params["reason"] = reason
+    summary_filters["reason"] = reason
 if category != "All":
-    params["category"] = category
+    summary_filters["category"] = category
+
+# The rollups have no ethnic group, conditions, medications or per-row
+# scores, so those filters are only offered for the raw rows
+load_raw = st.sidebar.checkbox("Load raw rows")
+params = {"answered": answered, **summary_filters}
+if age_band != "All":
+    min_age, max_age = AGE_BANDS[params.pop("age_band")]
+    if min_age:
+        params["min_age"] = min_age
+    if max_age:
+        params["max_age"] = max_age
+if load_raw:
+    st.sidebar.header("Raw Row Filters")
+    ethnic_group = st.sidebar.text_input("Ethnic Group")
+    long_term_conditions = st.sidebar.text_input("Long Term Conditions")
+    medications = st.sidebar.text_input("Medications")
+    rag_score_min = st.sidebar.number_input("Min RAG Score", value=0.0)
+    rag_score_max = st.sidebar.number_input("Max RAG Score", value=0.0)
+    if ethnic_group:
+        params["ethnic_group"] = ethnic_group
+    if long_term_conditions:
+        params["long_term_conditions"] = long_term_conditions
+    if medications:
+        params["medications"] = medications
+    if rag_score_min:
+        params["rag_score_min"] = rag_score_min
+    if rag_score_max:
+        params["rag_score_max"] = rag_score_max
 
 # --- Fetch Data ---
-with st.spinner("Fetching data..."):
-    resp = requests.get(API_URL, headers={"Authorization": f"Bearer {st.session_state['token']}"}, params=params)
-    if resp.status_code == 200:
-        data = resp.json()
-        if not data:
-            st.info("No data found for the selected filters.")
-            st.stop()
-        df = pd.DataFrame(data)
-    else:
-        st.error(f"Failed to fetch data: {resp.status_code} {resp.text}")
+EXPORT_CHUNK_ROWS = 5000  # rows per DataFrame chunk while streaming
+
+def fetch_export(params):
+    """Stream the NDJSON export and build the DataFrame chunk by chunk."""
+    frames, batch = [], []
+    progress = st.empty()
+    with requests.get(
+        EXPORT_URL,
+        headers={"Authorization": f"Bearer {st.session_state['token']}"},
+        params={**params, "format": "ndjson"},
+        stream=True,
+    ) as resp:
+        if resp.status_code != 200:
+            resp.content  # read the error body before the connection closes
+            return resp, None
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            batch.append(json.loads(line))
+            if len(batch) >= EXPORT_CHUNK_ROWS:
+                frames.append(pd.DataFrame(batch))
+                batch = []
+                progress.caption(f"Loaded {sum(len(f) for f in frames):,} rows...")
+    if batch:
+        frames.append(pd.DataFrame(batch))
+    progress.empty()
+    return resp, pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# --- Aggregated charts (rollup tables) ---
+SUMMARY_URL = f"{API_URL}/summary"
+
+def fetch_summary(group_by, refresh=False):
+    """Aggregate rows grouped by one rollup dimension."""
+    summary_params = {"answered": answered, "group_by": group_by, "refresh": refresh, **summary_filters}
+    resp = requests.get(SUMMARY_URL, headers={"Authorization": f"Bearer {st.session_state['token']}"}, params=summary_params)
+    if resp.status_code != 200:
+        st.error(f"Failed to fetch summary: {resp.status_code} {resp.text}")
         st.stop()
+    return pd.DataFrame(resp.json())
+
+with st.spinner("Fetching summary..."):
+    # The first call folds new rows into the rollups; the rest just read them
+    by_day = fetch_summary("day", refresh=True)
+    if by_day.empty:
+        st.info("No data found for the selected filters.")
+        st.stop()
+    summaries = {dim: fetch_summary(dim) for dim in ("category", "country", "gender", "age_band", "reason")}
+
+st.subheader("Overview")
+st.metric("Questions", int(by_day["count"].sum()))
+st.line_chart(by_day.set_index("day")["count"])
+st.caption("Charts use the pre-aggregated rollups (category, country, gender, age band and reason filters apply).")
 
-# --- Data Processing ---
-if "date_of_birth" in df.columns:
-    today = datetime.date.today()
-    def calc_age(dob):
-        try:
-            return today.year - int(dob[:4])
-        except:
-            return None
-    df["age"] = df["date_of_birth"].apply(calc_age)
-
-# --- Normalize sources column for Arrow compatibility ---
-if "sources" in df.columns:
-    def normalize_sources(val):
-        if val is None:
-            return []
-        if isinstance(val, list):
-            return val
-        if isinstance(val, str):
-            return [val]
-        return []
-    df["sources"] = df["sources"].apply(normalize_sources)
-
-# --- Display Table ---
-st.subheader("Results Table")
-st.dataframe(df)
-
-# --- Plots ---
 st.subheader("Demographic Plots")
 col1, col2 = st.columns(2)
 with col1:
-    if "ethnic_group" in df.columns:
-        st.bar_chart(df["ethnic_group"].value_counts())
-    if "gender" in df.columns:
-        st.bar_chart(df["gender"].value_counts())
-    if "country" in df.columns:
-        st.bar_chart(df["country"].value_counts())
+    st.bar_chart(summaries["gender"].set_index("gender")["count"])
+    st.bar_chart(summaries["country"].set_index("country")["count"])
 with col2:
-    if "age" in df.columns:
-        st.bar_chart(df["age"].dropna().astype(int).value_counts().sort_index())
-    if "rag_score" in df.columns:
-        st.bar_chart(df["rag_score"].dropna().astype(float))
+    st.bar_chart(summaries["age_band"].set_index("age_band")["count"])
+    # RAG-score histogram: sum of the per-group histograms
+    hist = [sum(bucket) for bucket in zip(*by_day["score_hist"])]
+    st.bar_chart(pd.Series(hist, index=[f"{i / len(hist):.1f}" for i in range(len(hist))], name="rag_score"))
 
-if not answered and "reason" in df.columns:
+if not answered:
     st.subheader("Unanswered Reasons Distribution")
-    st.bar_chart(df["reason"].value_counts())
+    st.bar_chart(summaries["reason"].set_index("reason")["count"])
 
 # --- Category Analytics ---
-if "category" in df.columns:
-    st.subheader("Question Categories")
-    col1, col2 = st.columns(2)
-    with col1:
-        category_counts = df["category"].value_counts()
-        st.bar_chart(category_counts)
-    with col2:
-        if len(category_counts) > 0:
-            st.write("Category Breakdown:")
-            for cat, count in category_counts.items():
-                if pd.notna(cat):  # Only show non-null categories
-                    percentage = (count / len(df)) * 100
-                    st.write(f"• {cat}: {count} ({percentage:.1f}%)")
-
-st.caption("Data is filtered by the selected criteria. Only admin users can access this dashboard.") 
\ No newline at end of file
+st.subheader("Question Categories")
+col1, col2 = st.columns(2)
+category_counts = summaries["category"].set_index("category")["count"].sort_values(ascending=False)
+with col1:
+    st.bar_chart(category_counts)
+with col2:
+    total = category_counts.sum()
+    st.write("Category Breakdown:")
+    for cat, count in category_counts.items():
+        percentage = (count / total) * 100 if total else 0
+        st.write(f"• {cat}: {count} ({percentage:.1f}%)")
+
+# --- Raw rows (streamed export, all filters apply) ---
+if load_raw:
+    with st.spinner("Fetching data..."):
+        resp, df = fetch_export(params)
+        if resp.status_code != 200:
+            st.error(f"Failed to fetch data: {resp.status_code} {resp.text}")
+            st.stop()
+    if df.empty:
+        st.info("No rows match the selected filters.")
+    else:
+        if "date_of_birth" in df.columns:
+            today = datetime.date.today()
+            def calc_age(dob):
+                try:
+                    return today.year - int(dob[:4])
+                except:
+                    return None
+            df["age"] = df["date_of_birth"].apply(calc_age)
+
+        # --- Normalize sources column for Arrow compatibility ---
+        if "sources" in df.columns:
+            def normalize_sources(val):
+                if val is None:
+                    return []
+                if isinstance(val, list):
+                    return val
+                if isinstance(val, str):
+                    return [val]
+                return []
+            df["sources"] = df["sources"].apply(normalize_sources)
+
+        st.subheader("Results Table")
+        if age_band != "All":
+            st.caption("Raw rows filter on the user's age today; the charts use their age when the question was asked.")
+        st.dataframe(df)
+        if "ethnic_group" in df.columns:
+            st.bar_chart(df["ethnic_group"].value_counts())
+
+st.caption("Data is filtered by the selected criteria. Only admin users can access this dashboard.")
@@ -0,0 +1,150 @@
+"""Semantic response cache for standalone questions answered by rag.answer()."""
+from __future__ import annotations
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def context_key(user_context: Optional[str]) -> str:
+    """Cache partition for the user context ("" when there is none)."""
+    if not user_context:
+        return ""
+    return hashlib.sha256(user_context.encode()).hexdigest()
+
+
+@dataclass
+class _Entry:
+    vector: np.ndarray
+    context_key: str
+    response: str
+    sources: List[str]
+    metadata: Dict[str, Any]
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    Stores formatted responses keyed by the question embedding.
+
+    A lookup returns the stored response when the cosine similarity to a
+    cached question in the same user-context partition is at least
+    ``threshold``. Entries expire after ``ttl_seconds``, and the whole cache is
+    dropped when the index version changes (i.e. the collections were
+    re-indexed).
+    """
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 86400, max_items: int = 1000) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+
+        self._entries: List[_Entry] = []
+        self._matrix: Optional[np.ndarray] = None  # rows = normalised vectors, rebuilt lazily
+        self._index_version: Optional[Any] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalise(vector: Sequence[float]) -> np.ndarray:
+        arr = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(arr)
+        return arr / norm if norm else arr
+
+    def _check_version(self, index_version: Any) -> None:
+        if index_version != self._index_version:
+            if self._entries:
+                print(f"[DEBUG] Answer cache: index changed ({self._index_version} -> {index_version}), invalidating")
+                self.invalidations += 1
+            self._entries = []
+            self._matrix = None
+            self._index_version = index_version
+
+    def _drop_expired(self, now: float) -> None:
+        fresh = [e for e in self._entries if now - e.created_at <= self.ttl_seconds]
+        if len(fresh) != len(self._entries):
+            self._entries = fresh
+            self._matrix = None
+
+    def lookup(
+        self,
+        vector: Sequence[float],
+        user_context_key: str,
+        index_version: Any = None,
+    ) -> Optional[Tuple[str, List[str], Dict[str, Any], float]]:
+        """Return (response, sources, metadata, similarity) for a near-duplicate, or None."""
+        with self._lock:
+            self._check_version(index_version)
+            self._drop_expired(time.time())
+            if not self._entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._matrix = np.stack([e.vector for e in self._entries])
+
+            scores = self._matrix @ self._normalise(vector)
+            best_idx, best_score = -1, -1.0
+            for idx in np.argsort(scores)[::-1]:
+                if scores[idx] < self.threshold:
+                    break
+                if self._entries[idx].context_key == user_context_key:
+                    best_idx, best_score = int(idx), float(scores[idx])
+                    break
+
+            if best_idx < 0:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = self._entries[best_idx]
+            return entry.response, list(entry.sources), dict(entry.metadata), best_score
+
+    def store(
+        self,
+        vector: Sequence[float],
+        user_context_key: str,
+        response: str,
+        sources: List[str],
+        metadata: Dict[str, Any],
+        index_version: Any = None,
+    ) -> None:
+        """Add a response; the oldest entries are dropped beyond ``max_items``."""
+        with self._lock:
+            self._check_version(index_version)
+            self._entries.append(_Entry(
+                vector=self._normalise(vector),
+                context_key=user_context_key,
+                response=response,
+                sources=list(sources),
+                metadata=dict(metadata),
+            ))
+            if len(self._entries) > self.max_items:
+                self._entries = self._entries[-self.max_items:]
+            self._matrix = None
+            self.stores += 1
+
+    def invalidate(self) -> None:
+        """Drop every cached response."""
+        with self._lock:
+            self._entries = []
+            self._matrix = None
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "items": len(self._entries),
+            "threshold": self.threshold,
+        }
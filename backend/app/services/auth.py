@@ -1,5 +1,11 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 
 import bcrypt
 from fastapi import Depends, HTTPException, status
@@ -8,7 +14,7 @@ from jose import jwt
 from sqlalchemy import select            # ← add this line
 
 from ..core.config import get_settings
-from ..db.models import SessionLocal, User
+from ..db.models import SessionLocal, User, get_db
 
 
 settings = get_settings()
@@ -23,14 +29,92 @@ async def get_user_by_email(email: str) -> User | None:
         return result.scalar_one_or_none()
 
 
-def _hash_pw(raw_pw: str) -> str:
-    return bcrypt.hashpw(raw_pw.encode(), bcrypt.gensalt()).decode()
+# --------------------------------------------------------------------------- #
+# Password hashing (off the event loop)
+# --------------------------------------------------------------------------- #
+MIN_BCRYPT_ROUNDS = 10  # logins rehash to BCRYPT_ROUNDS, so a low value would weaken stored hashes
+
+
+def _bcrypt_rounds() -> int:
+    rounds = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    if rounds < MIN_BCRYPT_ROUNDS:
+        raise ValueError(f"BCRYPT_ROUNDS={rounds} is below the minimum of {MIN_BCRYPT_ROUNDS}")
+    return rounds
+
+
+BCRYPT_ROUNDS: int = _bcrypt_rounds()  # work factor for new hashes
+PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+# bcrypt releases the GIL, so a small thread pool runs hashes in parallel while
+# the event loop keeps serving chat streams
+password_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+class PasswordStats:
+    """Login throughput counters (exposed on /admin/auth/stats)."""
+
+    def __init__(self) -> None:
+        self.logins = 0
+        self.failures = 0
+        self.rehashes = 0
+        self.hash_seconds = 0.0
+        self.hash_calls = 0
+        self.started = time.monotonic()
+
+    def record(self, seconds: float) -> None:
+        self.hash_calls += 1
+        self.hash_seconds += seconds
+
+    def stats(self) -> dict:
+        uptime = time.monotonic() - self.started
+        return {
+            "logins": self.logins,
+            "failures": self.failures,
+            "rehashes": self.rehashes,
+            "logins_per_second": self.logins / uptime if uptime else 0.0,
+            "avg_hash_ms": 1000 * self.hash_seconds / self.hash_calls if self.hash_calls else 0.0,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "workers": PASSWORD_HASH_WORKERS,
+        }
+
+
+password_stats = PasswordStats()
+
+
+def _hash_pw(raw_pw: str, rounds: Optional[int] = None) -> str:
+    return bcrypt.hashpw(raw_pw.encode(), bcrypt.gensalt(rounds or BCRYPT_ROUNDS)).decode()
 
 
 def _verify_pw(raw_pw: str, hashed: str) -> bool:
     return bcrypt.checkpw(raw_pw.encode(), hashed.encode())
 
 
+def _needs_rehash(hashed: str) -> bool:
+    """True when a stored hash uses a lower work factor than BCRYPT_ROUNDS (never downgrade)."""
+    try:
+        return int(hashed.split("$")[2]) < BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+async def _run_in_pool(func, *args):
+    start = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_pool, func, *args)
+    finally:
+        password_stats.record(time.perf_counter() - start)
+
+
+async def hash_password(raw_pw: str) -> str:
+    """bcrypt hash in the password pool."""
+    return await _run_in_pool(_hash_pw, raw_pw)
+
+
+async def verify_password(raw_pw: str, hashed: str) -> bool:
+    """bcrypt check in the password pool."""
+    return await _run_in_pool(_verify_pw, raw_pw, hashed)
+
+
 def _create_token(user_id: int) -> str:
     payload = {
         "sub": str(user_id),
@@ -41,24 +125,108 @@ def _create_token(user_id: int) -> str:
 
 async def authenticate(email: str, password: str) -> str:
     user = await get_user_by_email(email)
-    if not user or not _verify_pw(password, user.hashed_pw):
+    if not user or not await verify_password(password, user.hashed_pw):
+        password_stats.failures += 1
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    password_stats.logins += 1
+
+    # Transparent upgrade when BCRYPT_ROUNDS was raised since the hash was made
+    if _needs_rehash(user.hashed_pw):
+        try:
+            new_hash = await hash_password(password)
+            async with SessionLocal() as db:
+                db_user = await db.get(User, user.id)
+                if db_user is not None:
+                    db_user.hashed_pw = new_hash
+                    await db.commit()
+            user_cache.invalidate(user.id)
+            password_stats.rehashes += 1
+        except Exception as e:
+            print(f"[DEBUG] Password rehash failed for user {user.id}: {e}")
     return _create_token(user.id)
 
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
+# --------------------------------------------------------------------------- #
+# Authenticated-principal cache
+# --------------------------------------------------------------------------- #
+class UserCache:
+    """
+    Per-process TTL/LRU cache of User rows keyed by user id. Cached rows are
+    detached from any session (SessionLocal uses expire_on_commit=False), so
+    handlers must re-load the row in their own session before modifying it.
+    """
+
+    def __init__(self, max_items: int = 1024, ttl_seconds: float = 60.0) -> None:
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._users: "OrderedDict[int, tuple[User, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+                if entry is not None:
+                    del self._users[user_id]
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user: User) -> None:
+        with self._lock:
+            self._users[user.id] = (user, time.monotonic())
+            self._users.move_to_end(user.id)
+            while len(self._users) > self.max_items:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop one user (call after the row changes, e.g. profile update or admin promotion)."""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "items": len(self._users),
+        }
+
+
+# Changes made by other processes (e.g. scripts/make_user_admin.py) show up after the TTL
+user_cache = UserCache(
+    max_items=int(os.getenv("AUTH_USER_CACHE_ITEMS", "1024")),
+    ttl_seconds=float(os.getenv("AUTH_USER_CACHE_TTL", "60")),
+)
+
+
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db=Depends(get_db),
+) -> User:
     try:
         payload = jwt.decode(token, settings.jwt_secret, algorithms=[settings.jwt_alg])
         user_id = int(payload["sub"])
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
 
-    async with SessionLocal() as db:
-        user = await db.get(User, user_id)
-        if user is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    user = user_cache.get(user_id)
+    if user is not None:
         return user
 
+    # Miss: load through the request's shared session
+    user = await db.get(User, user_id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    db.expunge(user)
+    user_cache.put(user)
+    return user
+
 
 def get_current_admin(user=Depends(get_current_user)):
     if not user.is_admin:
@@ -1,5 +1,7 @@
-"""Question categorization service using LLM to classify questions into consistent categories."""
+"""Question classification service: one LLM call decides medical vs general, category and condition."""
+import json
 import os
+from dataclasses import dataclass
 from typing import List, Optional
 import openai
 from dotenv import load_dotenv
@@ -7,6 +9,7 @@ from dotenv import load_dotenv
 load_dotenv(override=True)
 
 openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+async_openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Define consistent categories for all questions
 ALL_CATEGORIES = [
@@ -24,95 +27,145 @@ BASE_CATEGORIES = [
     "General"
 ]
 
-CATEGORIZATION_PROMPT = """
-You are a medical question categorizer. For each question, determine if it's medical/health-related or general conversation.
+CLASSIFICATION_MODEL = "gpt-4o-mini"
 
-For MEDICAL questions, return:
-- The main category (choose one: Symptoms & Diagnosis, Treatment & Medication, Prevention & Lifestyle)
-- If the question is about a specific disease or condition, add it after a comma (e.g. Symptoms & Diagnosis, Diabetes)
-- If not about a specific disease/condition, just return the category
+CLASSIFICATION_PROMPT = """
+You are a medical question classifier. For each question, decide whether it is medical/health-related or general conversation, then categorize it.
 
-For NON-MEDICAL questions, return: General
-
-Available categories:
-1. Symptoms & Diagnosis
-2. Treatment & Medication
-3. Prevention & Lifestyle
-4. General
+Return a JSON object with exactly these keys:
+- "is_medical": true for medical/health questions, false for general conversation
+- "category": one of "Symptoms & Diagnosis", "Treatment & Medication", "Prevention & Lifestyle", "General"
+- "condition": the specific disease or condition the question is about, or null if there is none
 
 Rules:
 - Medical questions include: diseases, conditions, symptoms, treatments, medications, health, medical procedures, etc.
-- "What is [disease/condition]?" questions are MEDICAL and should be categorized as "Symptoms & Diagnosis"
-- Always return the category first
-- If a disease/condition is mentioned, add it after a comma
-- If not, just return the category
+- "What is [disease/condition]?" questions are medical and should be categorized as "Symptoms & Diagnosis"
+- Non-medical questions are always category "General" with condition null
 - Be consistent across similar questions
-- Return ONLY the category (and disease/condition if present), nothing else
 
 Examples:
-"What is diabetes?" → "Symptoms & Diagnosis, Diabetes"
-"What are the symptoms of diabetes?" → "Symptoms & Diagnosis, Diabetes"
-"How is diabetes treated?" → "Treatment & Medication, Diabetes"
-"How can I prevent diabetes?" → "Prevention & Lifestyle, Diabetes"
-"What medications are used for high blood pressure?" → "Treatment & Medication, High Blood Pressure"
-"What causes migraines?" → "Symptoms & Diagnosis, Migraines"
-"How can I lower my cholesterol naturally?" → "Prevention & Lifestyle, Cholesterol"
-"Tell me a joke" → "General"
-"What's the weather like?" → "General"
-"What is leptospirosis?" → "Symptoms & Diagnosis, Leptospirosis"
+"Hello" -> {{"is_medical": false, "category": "General", "condition": null}}
+"How are you?" -> {{"is_medical": false, "category": "General", "condition": null}}
+"Tell me a joke" -> {{"is_medical": false, "category": "General", "condition": null}}
+"What's the weather like?" -> {{"is_medical": false, "category": "General", "condition": null}}
+"What is diabetes?" -> {{"is_medical": true, "category": "Symptoms & Diagnosis", "condition": "Diabetes"}}
+"I have a headache, what should I do?" -> {{"is_medical": true, "category": "Treatment & Medication", "condition": "Headache"}}
+"How is diabetes treated?" -> {{"is_medical": true, "category": "Treatment & Medication", "condition": "Diabetes"}}
+"How can I prevent diabetes?" -> {{"is_medical": true, "category": "Prevention & Lifestyle", "condition": "Diabetes"}}
+"What medications are used for high blood pressure?" -> {{"is_medical": true, "category": "Treatment & Medication", "condition": "High Blood Pressure"}}
+"What causes migraines?" -> {{"is_medical": true, "category": "Symptoms & Diagnosis", "condition": "Migraines"}}
+"How can I lower my cholesterol naturally?" -> {{"is_medical": true, "category": "Prevention & Lifestyle", "condition": "Cholesterol"}}
+"My medication side effects" -> {{"is_medical": true, "category": "Treatment & Medication", "condition": null}}
+"Cancer treatment options" -> {{"is_medical": true, "category": "Treatment & Medication", "condition": "Cancer"}}
+"What is leptospirosis?" -> {{"is_medical": true, "category": "Symptoms & Diagnosis", "condition": "Leptospirosis"}}
 
 Question: "{question}"
-Category:"""
+"""
 
-def categorize_question(question: str) -> Optional[str]:
+@dataclass
+class Classification:
+    """Result of the unified classifier."""
+    is_medical: bool
+    category: str
+    condition: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        """Category as stored on messages, e.g. "Symptoms & Diagnosis, Diabetes"."""
+        if self.condition and self.category != "General":
+            return f"{self.category}, {self.condition}"
+        return self.category
+
+def parse_classification(raw: str) -> Classification:
+    """Validate the classifier's JSON output."""
+    data = json.loads(raw)
+    is_medical = bool(data.get("is_medical"))
+    category = data.get("category")
+    if category not in BASE_CATEGORIES:
+        # Unexpected category - keep the medical signal, default the category
+        category = "Symptoms & Diagnosis" if is_medical else "General"
+    if not is_medical:
+        category = "General"
+    condition = data.get("condition") or None
+    if condition is not None:
+        condition = str(condition).strip() or None
+    return Classification(is_medical=is_medical, category=category, condition=condition)
+
+def classify_question(question: str) -> Optional[Classification]:
     """
-    Categorize a question into one of the predefined categories.
+    Classify a question in one structured-output call: medical gate, category
+    and condition. Shared by the chat router (category) and rag.answer()
+    (whether to retrieve).
     
-    Args:
-        question: The question to categorize
-        
     Returns:
-        Category name (with disease/condition if applicable) or None if categorization fails
+        Classification, or None if classification fails
     """
-    print(f"[DEBUG] Starting categorization for question: '{question}'")
+    print(f"[DEBUG] Starting classification for question: '{question}'")
     
     try:
-        print(f"[DEBUG] Calling OpenAI API...")
         response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",  # Use mini for cost efficiency
+            model=CLASSIFICATION_MODEL,  # Use mini for cost efficiency
             messages=[
-                {"role": "user", "content": CATEGORIZATION_PROMPT.format(question=question)}
+                {"role": "user", "content": CLASSIFICATION_PROMPT.format(question=question)}
             ],
-            max_tokens=50,  # Increased to accommodate disease/condition names
-            temperature=0.1  # Low temperature for consistent categorization
+            response_format={"type": "json_object"},
+            max_tokens=60,
+            temperature=0  # Deterministic classification
         )
         
-        category = response.choices[0].message.content.strip()
-        print(f"[DEBUG] Raw OpenAI response: '{category}'")
-        
-        # Validate that the response starts with one of our expected base categories
-        for base_category in BASE_CATEGORIES:
-            if category.startswith(base_category):
-                print(f"[DEBUG] Question categorized as: '{category}' for question: '{question}'")
-                return category
-        
-        # If no base category matches, check if it's just a base category
-        if category in BASE_CATEGORIES:
-            print(f"[DEBUG] Question categorized as: '{category}' for question: '{question}'")
-            return category
+        raw = response.choices[0].message.content
+        print(f"[DEBUG] Raw OpenAI response: '{raw}'")
+        classification = parse_classification(raw)
+        print(f"[DEBUG] Question classified as: {classification} for question: '{question}'")
+        return classification
+    except Exception as e:
+        print(f"[DEBUG] Classification error for question '{question}': {e}")
+        return None
+
+async def aclassify_question(question: str) -> Optional[Classification]:
+    """Async variant of classify_question (AsyncOpenAI client)."""
+    print(f"[DEBUG] Starting classification for question: '{question}'")
+    
+    try:
+        response = await async_openai_client.chat.completions.create(
+            model=CLASSIFICATION_MODEL,
+            messages=[
+                {"role": "user", "content": CLASSIFICATION_PROMPT.format(question=question)}
+            ],
+            response_format={"type": "json_object"},
+            max_tokens=60,
+            temperature=0
+        )
         
-        print(f"[DEBUG] Unexpected category response: '{category}' for question: '{question}'")
-        # Default to General if response is unexpected
-        return "General"
-            
+        classification = parse_classification(response.choices[0].message.content)
+        print(f"[DEBUG] Question classified as: {classification} for question: '{question}'")
+        return classification
     except Exception as e:
-        print(f"[DEBUG] Categorization error for question '{question}': {e}")
+        print(f"[DEBUG] Classification error for question '{question}': {e}")
         return None
 
+def categorize_question(question: str) -> Optional[str]:
+    """
+    Categorize a question into one of the predefined categories.
+    
+    Args:
+        question: The question to categorize
+        
+    Returns:
+        Category name (with disease/condition if applicable) or None if categorization fails
+    """
+    classification = classify_question(question)
+    return classification.label if classification else None
+
+async def acategorize_question(question: str) -> Optional[str]:
+    """Async variant of categorize_question."""
+    classification = await aclassify_question(question)
+    return classification.label if classification else None
+
 def get_available_categories() -> List[str]:
     """Get the list of available categories for reference."""
     return ALL_CATEGORIES.copy()
 
 def get_base_categories() -> List[str]:
     """Get the list of base categories (without disease/condition) for validation."""
-    return BASE_CATEGORIES.copy() 
\ No newline at end of file
+    return BASE_CATEGORIES.copy() 
@@ -0,0 +1,223 @@
+"""Two-tier query-embedding cache: in-process LRU backed by a SQLite file."""
+from __future__ import annotations
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def normalize_query(text: str) -> str:
+    """Normalise query text for cache keys (case and whitespace insensitive)."""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """
+    Cache of query embeddings keyed by normalised text and embedding model.
+
+    Lookups hit the in-process LRU first, then the on-disk SQLite tier, so
+    frequent questions stay warm across worker restarts. Both tiers evict by
+    size (least recently used first); entries older than ``ttl_seconds`` are
+    treated as misses.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path],
+        model: str,
+        max_memory_items: int = 2048,
+        max_disk_items: int = 100_000,
+        ttl_seconds: Optional[float] = None,
+    ) -> None:
+        self.model = model
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_items = 0
+        if path is not None:
+            try:
+                self._db = self._open(Path(path))
+            except sqlite3.Error as exc:
+                # The memory tier still works without the disk tier
+                print(f"[DEBUG] Embedding cache: disk tier disabled ({exc})")
+                self._db = None
+
+    # ------------------------------------------------------------------ #
+    # Setup
+    # ------------------------------------------------------------------ #
+    def _open(self, path: Path) -> sqlite3.Connection:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS query_embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        db.execute(
+            "CREATE INDEX IF NOT EXISTS ix_query_embeddings_last_used ON query_embeddings (last_used)"
+        )
+        self._disk_items = db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+        return db
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{normalize_query(text)}".encode()).hexdigest()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    # ------------------------------------------------------------------ #
+    # Lookups
+    # ------------------------------------------------------------------ #
+    def get(self, text: str) -> Optional[List[float]]:
+        """Return the cached vector for ``text`` or None."""
+        return self.get_many([text]).get(text)
+
+    def get_many(self, texts: Iterable[str]) -> Dict[str, List[float]]:
+        """Return {text: vector} for every text found in either tier."""
+        found: Dict[str, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for text in texts:
+                if text in found:
+                    continue
+                key = self._key(text)
+                entry = self._memory.get(key)
+                if entry is not None and not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    found[text] = entry[0]
+                    continue
+                if entry is not None:
+                    del self._memory[key]
+
+                vector = self._disk_get(key, now)
+                if vector is not None:
+                    self.disk_hits += 1
+                    self._memory_put(key, vector, now)
+                    found[text] = vector
+                else:
+                    self.misses += 1
+        return found
+
+    def _disk_get(self, key: str, now: float) -> Optional[List[float]]:
+        if self._db is None:
+            return None
+        try:
+            row = self._db.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[1], now):
+                self._db.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+                self._disk_items = max(0, self._disk_items - 1)
+                return None
+            self._db.execute("UPDATE query_embeddings SET last_used = ? WHERE key = ?", (now, key))
+            return array("f", row[0]).tolist()
+        except sqlite3.Error as exc:
+            print(f"[DEBUG] Embedding cache: disk read failed: {exc}")
+            return None
+
+    # ------------------------------------------------------------------ #
+    # Inserts
+    # ------------------------------------------------------------------ #
+    def put(self, text: str, vector: List[float]) -> None:
+        """Store one vector in both tiers."""
+        self.put_many({text: vector})
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """Store {text: vector} in both tiers, evicting LRU entries when full."""
+        now = time.time()
+        with self._lock:
+            rows = []
+            for text, vector in vectors.items():
+                key = self._key(text)
+                self._memory_put(key, list(vector), now)
+                rows.append((key, self.model, array("f", vector).tobytes(), now, now))
+            self._disk_put(rows)
+
+    def _memory_put(self, key: str, vector: List[float], now: float) -> None:
+        self._memory[key] = (vector, now)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_put(self, rows: List[tuple]) -> None:
+        if self._db is None or not rows:
+            return
+        try:
+            self._db.execute("BEGIN")
+            for row in rows:
+                exists = self._db.execute(
+                    "SELECT 1 FROM query_embeddings WHERE key = ?", (row[0],)
+                ).fetchone()
+                self._db.execute("INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?)", row)
+                if exists is None:
+                    self._disk_items += 1
+            overflow = self._disk_items - self.max_disk_items
+            if overflow > 0:
+                self._db.execute(
+                    """
+                    DELETE FROM query_embeddings WHERE key IN (
+                        SELECT key FROM query_embeddings ORDER BY last_used LIMIT ?
+                    )
+                    """,
+                    (overflow,),
+                )
+                self._disk_items -= overflow
+                self.evictions += overflow
+            self._db.execute("COMMIT")
+        except sqlite3.Error as exc:
+            print(f"[DEBUG] Embedding cache: disk write failed: {exc}")
+            try:
+                self._db.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    # ------------------------------------------------------------------ #
+    # Maintenance / metrics
+    # ------------------------------------------------------------------ #
+    def clear(self) -> None:
+        """Drop every entry from both tiers (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings")
+                self._disk_items = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "memory_items": len(self._memory),
+            "disk_items": self._disk_items,
+        }
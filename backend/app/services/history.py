@@ -0,0 +1,70 @@
+"""Conversation history window for the chat endpoints."""
+from __future__ import annotations
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+
+HISTORY_MESSAGES: int = int(os.getenv("CHAT_HISTORY_MESSAGES", "10"))  # most recent messages sent as context
+HISTORY_TOKEN_BUDGET: Optional[int] = (
+    int(os.environ["CHAT_HISTORY_TOKEN_BUDGET"]) if os.getenv("CHAT_HISTORY_TOKEN_BUDGET") else None
+)
+HISTORY_MAX_MESSAGES: int = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "50"))  # row cap for token-budgeted windows
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")  # GPT-4o tokenizer
+except Exception:  # tiktoken missing or its BPE file unavailable
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count for GPT-4o (roughly 4 characters per token without tiktoken)."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def select_token_window(
+    newest_first: Sequence[Dict[str, str]],
+    token_budget: int,
+    count: Callable[[str], int] = count_tokens,
+) -> List[Dict[str, str]]:
+    """
+    Keep the most recent messages whose contents fit in ``token_budget``.
+    ``newest_first`` is ordered newest to oldest; the result is chronological.
+    The newest message is always kept so a turn never loses all context.
+    """
+    window: List[Dict[str, str]] = []
+    used = 0
+    for msg in newest_first:
+        cost = count(msg["content"])
+        if window and used + cost > token_budget:
+            break
+        window.append(msg)
+        used += cost
+    window.reverse()
+    return window
+
+
+async def load_history_window(
+    db,
+    session_id: int,
+    limit: int = HISTORY_MESSAGES,
+    token_budget: Optional[int] = HISTORY_TOKEN_BUDGET,
+) -> List[Dict[str, str]]:
+    """
+    The most recent messages of a session as [{"role", "content"}], oldest
+    first. Reads newest-first on the (session_id, created_at) index, so the
+    cost depends on the window size rather than the session length. With a
+    ``token_budget`` the window is cut by tokens instead of ``limit``
+    (at most HISTORY_MAX_MESSAGES rows are read).
+    """
+    from ..db import queries
+
+    rows = (await db.execute(
+        queries.history_window(session_id, HISTORY_MAX_MESSAGES if token_budget is not None else limit)
+    )).all()
+    newest_first = [{"role": role, "content": content} for role, content in rows]
+
+    if token_budget is not None:
+        return select_token_window(newest_first, token_budget)
+    return list(reversed(newest_first))
@@ -0,0 +1,240 @@
+"""Local MEDICAL/GENERAL classifier tier that answers without a network call when confident."""
+from __future__ import annotations
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Whole-message greetings / small talk -> GENERAL without embedding anything
+GREETING_PATTERN = re.compile(
+    r"^\s*(hi|hiya|hello|hey|yo|good (morning|afternoon|evening|night)|how are you( doing)?|"
+    r"what'?s up|thanks?( you)?|thank you( so much)?|cheers|bye|goodbye|see you|ok(ay)?|cool|great|nice)"
+    r"( there| kyra)?[\s!.?,]*$",
+    re.IGNORECASE,
+)
+
+# Unambiguous health vocabulary -> MEDICAL without embedding anything
+MEDICAL_PATTERN = re.compile(
+    r"\b(symptoms?|diagnos\w*|treatments?|medications?|medicines?|side effects?|"
+    r"diseases?|cancers?|tumou?rs?|diabet\w*|infections?|asthma|migraines?|blood pressure|"
+    r"cholesterol|dementia|depression|anxiety disorder|pregnan\w*|vaccin\w*|chemotherapy|"
+    r"screening|prescri\w*|dosage|antibiotics?)\b",
+    re.IGNORECASE,
+)
+
+# Labelled seed examples for the embedding centroids (extended by add_examples)
+SEED_EXAMPLES: Dict[bool, List[str]] = {
+    True: [
+        "What is diabetes?",
+        "I have a headache, what should I do?",
+        "How to treat high blood pressure?",
+        "What are the symptoms of flu?",
+        "My medication side effects",
+        "Cancer treatment options",
+        "Is this rash serious?",
+        "Why do I feel dizzy when I stand up?",
+        "How can I lower my cholesterol naturally?",
+        "What causes migraines?",
+        "Can I take ibuprofen with paracetamol?",
+        "I've had a cough for three weeks",
+        "How do I know if I have depression?",
+        "What does a lump in my breast mean?",
+    ],
+    False: [
+        "Hello",
+        "How are you?",
+        "What's the weather like?",
+        "Tell me a joke",
+        "Who won the football last night?",
+        "Can you help me write an email?",
+        "What's the capital of France?",
+        "Recommend a good film",
+        "What time is it?",
+        "Thanks for your help",
+        "What can you do?",
+        "Translate this sentence into Spanish",
+    ],
+}
+
+
+class LocalMedicalClassifier:
+    """
+    Three-tier MEDICAL/GENERAL decision:
+
+    1. lexical rules for greetings and unambiguous medical vocabulary
+    2. cosine similarity of the query embedding to labelled centroids
+    3. None when the centroid margin is too small - callers then fall back
+       to the LLM classifier
+
+    The thresholds are asymmetric: MEDICAL needs a lead of ``margin``, but
+    GENERAL needs ``general_margin``. A medical question routed to GENERAL
+    skips RAG entirely, while a general one routed to MEDICAL only costs a
+    retrieval. Tune both on real traffic with :meth:`evaluate`
+    (scripts/evaluate_local_classifier.py).
+
+    ``embed`` maps texts to vectors (the cached query-embedding layer), so the
+    centroid tier costs no network call once a question has been embedded.
+    """
+
+    def __init__(
+        self,
+        embed: Callable[[List[str]], Dict[str, List[float]]],
+        margin: float = 0.05,
+        examples: Optional[Dict[bool, List[str]]] = None,
+        general_margin: float = 0.15,
+    ) -> None:
+        self.embed = embed
+        self.margin = margin
+        self.general_margin = general_margin
+        self._examples: Dict[bool, List[str]] = {
+            label: list(texts) for label, texts in (examples or SEED_EXAMPLES).items()
+        }
+        self._centroids: Optional[Dict[bool, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+        self.rule_hits = 0
+        self.centroid_hits = 0
+        self.fallbacks = 0
+
+    @staticmethod
+    def _unit(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        arr = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(arr, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return arr / norms
+
+    def add_examples(self, texts: List[str], labels: List[bool]) -> None:
+        """Add labelled questions (True = medical); centroids are rebuilt on next use."""
+        with self._lock:
+            for text, label in zip(texts, labels):
+                self._examples.setdefault(bool(label), []).append(text)
+            self._centroids = None
+
+    def _ensure_centroids(self) -> Dict[bool, np.ndarray]:
+        with self._lock:
+            if self._centroids is None:
+                vectors = self.embed([t for texts in self._examples.values() for t in texts])
+                centroids = {}
+                for label, texts in self._examples.items():
+                    rows = [vectors[t] for t in texts if t in vectors]
+                    if rows:
+                        centroids[label] = self._unit([self._unit(rows).mean(axis=0)])[0]
+                self._centroids = centroids
+            return self._centroids
+
+    def classify_rules(self, question: str) -> Optional[bool]:
+        """Lexical tier only (microseconds, no embedding)."""
+        if GREETING_PATTERN.match(question):
+            return False
+        if MEDICAL_PATTERN.search(question):
+            return True
+        return None
+
+    def classify(self, question: str, embedding: Optional[Sequence[float]] = None) -> Optional[bool]:
+        """
+        Return True (MEDICAL) / False (GENERAL) when confident, or None when the
+        caller should ask the LLM.
+        """
+        decision = self.classify_rules(question)
+        if decision is not None:
+            self.rule_hits += 1
+            return decision
+
+        try:
+            centroids = self._ensure_centroids()
+            if True not in centroids or False not in centroids:
+                self.fallbacks += 1
+                return None
+            if embedding is None:
+                embedding = self.embed([question])[question]
+            margin = self._margin(embedding, centroids)
+        except Exception as exc:
+            print(f"[DEBUG] Local classifier error: {exc}")
+            self.fallbacks += 1
+            return None
+
+        decision = self._decide(margin, self.margin, self.general_margin)
+        if decision is not None:
+            self.centroid_hits += 1
+            return decision
+        print(f"[DEBUG] Local classifier: low margin ({margin:.3f}) - falling back to LLM")
+        self.fallbacks += 1
+        return None
+
+    def _margin(self, embedding: Sequence[float], centroids: Dict[bool, np.ndarray]) -> float:
+        """Cosine similarity to the MEDICAL centroid minus that to the GENERAL one."""
+        query = self._unit([embedding])[0]
+        return float(query @ centroids[True] - query @ centroids[False])
+
+    @staticmethod
+    def _decide(margin: float, medical_margin: float, general_margin: float) -> Optional[bool]:
+        if margin >= medical_margin:
+            return True
+        if margin <= -general_margin:
+            return False
+        return None
+
+    def evaluate(
+        self,
+        labelled: Iterable[Tuple[str, bool]],
+        general_margins: Sequence[float] = (0.05, 0.1, 0.15, 0.2, 0.25, 0.3),
+    ) -> List[Dict[str, Any]]:
+        """
+        Score the centroid tier on held-out ``(text, is_medical)`` pairs (not
+        among the examples) for each candidate ``general_margin``, with the
+        current ``margin`` for MEDICAL. Per candidate: ``coverage`` (share
+        decided locally), ``accuracy`` of those decisions, and
+        ``medical_as_general`` - medical questions that would skip RAG.
+        """
+        labelled = list(labelled)
+        centroids = self._ensure_centroids()
+        vectors = self.embed([text for text, _ in labelled])
+        margins = [(self._margin(vectors[text], centroids), label) for text, label in labelled]
+        results = []
+        for general_margin in general_margins:
+            decided = correct = medical_as_general = 0
+            for margin, label in margins:
+                decision = self._decide(margin, self.margin, general_margin)
+                if decision is None:
+                    continue
+                decided += 1
+                correct += decision == label
+                medical_as_general += label and not decision
+            results.append({
+                "general_margin": general_margin,
+                "coverage": decided / len(margins) if margins else 0.0,
+                "accuracy": correct / decided if decided else 0.0,
+                "medical_as_general": medical_as_general,
+            })
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Local-hit rate and tier counters."""
+        local = self.rule_hits + self.centroid_hits
+        total = local + self.fallbacks
+        return {
+            "rule_hits": self.rule_hits,
+            "centroid_hits": self.centroid_hits,
+            "llm_fallbacks": self.fallbacks,
+            "local_hit_rate": local / total if total else 0.0,
+            "examples": {("medical" if k else "general"): len(v) for k, v in self._examples.items()},
+        }
+
+
+async def load_labelled_messages(db, limit: int = 2000) -> List[tuple]:
+    """
+    Labelled training questions from the ``messages`` table: stored user
+    messages whose category is "General" are GENERAL, any other category is
+    MEDICAL. Returns [(text, is_medical)].
+    """
+    from sqlalchemy import select
+    from ..db.models import Message
+
+    rows = (await db.execute(
+        select(Message.content, Message.category)
+        .where(Message.role == "user", Message.category.is_not(None))
+        .order_by(Message.id.desc())
+        .limit(limit)
+    )).all()
+    return [(content, category != "General") for content, category in rows]
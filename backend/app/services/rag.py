@@ -1,28 +1,37 @@
 """RAG helper functions with hybrid GPT-4o conversation system."""
 from __future__ import annotations
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict, Any
+from typing import Any, AsyncIterator, Awaitable, Dict, List, Optional, Tuple
 import openai
 from chromadb import PersistentClient
-from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core import QueryBundle, Settings, VectorStoreIndex
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
 from llama_index.vector_stores.chroma import ChromaVectorStore
 from dotenv import load_dotenv
+from .answer_cache import SemanticAnswerCache, context_key
+from .categorization import Classification, aclassify_question, classify_question
+from .embedding_cache import EmbeddingCache
+from .local_classifier import LocalMedicalClassifier
 load_dotenv(override=True)
 # --------------------------------------------------------------------------- #
 # Configuration
 # --------------------------------------------------------------------------- #
 openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+async_openai_client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 SIM_THRESHOLD: float = 0.35  # minimum similarity to use RAG knowledge
+GENERATION_ERROR_MESSAGE = "I'm having trouble responding right now. Please try again in a moment."
 
-INDEX_DIR = (
+INDEX_DIR = Path(os.getenv("RAG_INDEX_DIR", str(
     Path(__file__)
     .resolve()
     .parent.parent  # → backend/app/
     / "../rag/chroma_db"  # backend/rag/chroma_db
-).resolve()
+))).resolve()
 
 # --------------------------------------------------------------------------- #
 # Initialise Chroma-powered query engine (loads once per worker)
@@ -37,198 +46,421 @@ cancer_collection = chroma_client.get_or_create_collection("cancer_research_docs
 nhs_store = ChromaVectorStore(chroma_collection=nhs_collection, stores_text=True)
 cancer_store = ChromaVectorStore(chroma_collection=cancer_collection, stores_text=True)
 
-Settings.embed_model = OpenAIEmbedding(model="text-embedding-3-small")
-Settings.llm = OpenAI(model="gpt-4o-mini", temperature=0.2)  # Keep for RAG retrieval
+EMBED_MODEL = "text-embedding-3-small"
+Settings.embed_model = OpenAIEmbedding(model=EMBED_MODEL)
+Settings.llm = OpenAI(model="gpt-4o-mini", temperature=0.2)  # Only used by the synthesis query engines
 
 # Create indices for both collections
 nhs_index = VectorStoreIndex.from_vector_store(nhs_store)
 cancer_index = VectorStoreIndex.from_vector_store(cancer_store)
 
-# Create query engines for both collections
+# Create query engines for both collections (legacy path: each query also runs LLM synthesis)
 nhs_query_engine = nhs_index.as_query_engine(similarity_top_k=3)
 cancer_query_engine = cancer_index.as_query_engine(similarity_top_k=3)
 
+# Retrievers return the same scored nodes without any LLM call
+nhs_retriever = nhs_index.as_retriever(similarity_top_k=3)
+cancer_retriever = cancer_index.as_retriever(similarity_top_k=3)
+
+# --------------------------------------------------------------------------- #
+# Query embeddings
+# --------------------------------------------------------------------------- #
+# Memory LRU + SQLite file next to the Chroma index, so workers restart warm
+embedding_cache = EmbeddingCache(
+    path=Path(os.getenv("EMBEDDING_CACHE_PATH", str(INDEX_DIR.parent / "embedding_cache.sqlite3"))),
+    model=EMBED_MODEL,
+    max_memory_items=int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "2048")),
+    max_disk_items=int(os.getenv("EMBEDDING_CACHE_DISK_ITEMS", "100000")),
+    ttl_seconds=float(os.environ["EMBEDDING_CACHE_TTL"]) if os.getenv("EMBEDDING_CACHE_TTL") else None,
+)
+
+def embed_queries(queries: List[str]) -> Dict[str, List[float]]:
+    """
+    Embed each distinct query string once, in a single batched request.
+
+    Cached vectors are reused; only cache misses go to the embedding API.
+    The vectors are handed straight to the retrievers of both collections,
+    so a message costs at most one embedding call instead of one per search.
+    """
+    unique_queries = list(dict.fromkeys(q for q in queries if q))
+    if not unique_queries:
+        return {}
+    vectors = embedding_cache.get_many(unique_queries)
+    missing = [q for q in unique_queries if q not in vectors]
+    if missing:
+        # text-embedding-3 models use the same engine for queries and documents
+        fresh = dict(zip(missing, Settings.embed_model.get_text_embedding_batch(missing)))
+        embedding_cache.put_many(fresh)
+        vectors.update(fresh)
+    print(f"[DEBUG] RAG: Embedded {len(missing)}/{len(unique_queries)} queries (rest cached) - cache stats: {embedding_cache.stats()}")
+    return {q: vectors[q] for q in unique_queries}
+
+async def aembed_queries(queries: List[str]) -> Dict[str, List[float]]:
+    """Async variant of embed_queries (non-blocking embedding request)."""
+    unique_queries = list(dict.fromkeys(q for q in queries if q))
+    if not unique_queries:
+        return {}
+    vectors = embedding_cache.get_many(unique_queries)
+    missing = [q for q in unique_queries if q not in vectors]
+    if missing:
+        fresh = dict(zip(missing, await Settings.embed_model.aget_text_embedding_batch(missing)))
+        embedding_cache.put_many(fresh)
+        vectors.update(fresh)
+    print(f"[DEBUG] RAG: Embedded {len(missing)}/{len(unique_queries)} queries (rest cached)")
+    return {q: vectors[q] for q in unique_queries}
+
 # --------------------------------------------------------------------------- #
 # Medical question classifier
 # --------------------------------------------------------------------------- #
-MEDICAL_CLASSIFIER_PROMPT = """
-You are a classifier that determines if a question is medical/health-related or general conversation.
-
-Return only "MEDICAL" or "GENERAL".
-
-Examples:
-"Hello" -> GENERAL
-"How are you?" -> GENERAL  
-"What's the weather like?" -> GENERAL
-"Tell me a joke" -> GENERAL
-"What is diabetes?" -> MEDICAL
-"I have a headache, what should I do?" -> MEDICAL
-"How to treat high blood pressure?" -> MEDICAL
-"What are the symptoms of flu?" -> MEDICAL
-"My medication side effects" -> MEDICAL
-"Cancer treatment options" -> MEDICAL
-
-Question: "{question}"
-Classification:"""
-
-def is_medical_question(question: str) -> bool:
-    """Classify if a question is medical/health-related using GPT-4o"""
+# Local tier (rules + embedding centroids); the LLM is only asked on low margin
+medical_classifier = LocalMedicalClassifier(
+    embed=embed_queries,
+    margin=float(os.getenv("LOCAL_CLASSIFIER_MARGIN", "0.05")),
+    # Wider: GENERAL skips RAG (see scripts/evaluate_local_classifier.py)
+    general_margin=float(os.getenv("LOCAL_CLASSIFIER_GENERAL_MARGIN", "0.15")),
+)
+
+def is_medical_question(
+    question: str,
+    classification: Optional[Classification] = None,
+    embedding: Optional[List[float]] = None,
+) -> bool:
+    """
+    Medical gate: an existing classification if given, else the local
+    classifier, else the unified LLM classifier (one gpt-4o-mini call).
+    """
+    if classification is not None:
+        return classification.is_medical
+    local = medical_classifier.classify(question, embedding)
+    if local is not None:
+        return local
+    classification = classify_question(question)
+    if classification is None:
+        # Default to medical if classifier fails - safer approach
+        return True
+    return classification.is_medical
+
+async def ais_medical_question(
+    question: str,
+    classification: Optional[Classification] = None,
+    embedding: Optional[List[float]] = None,
+    pending_classification: Optional[Awaitable[Optional[Classification]]] = None,
+) -> bool:
+    """
+    Async variant of is_medical_question. ``pending_classification`` is an
+    in-flight aclassify_question() task started by the caller; it is only
+    awaited when the local tier is not confident, instead of a second call.
+    """
+    if classification is not None:
+        return classification.is_medical
+    local = medical_classifier.classify_rules(question)
+    if local is None:
+        if embedding is None:
+            try:
+                embedding = (await aembed_queries([question]))[question]
+            except Exception as exc:
+                print(f"[DEBUG] Classification embedding error: {exc}")
+        if embedding is not None:
+            # Centroids may need a one-off (sync) embedding batch - keep it off the loop
+            local = await asyncio.to_thread(medical_classifier.classify, question, embedding)
+    if local is not None:
+        return local
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "user", "content": MEDICAL_CLASSIFIER_PROMPT.format(question=question)}
-            ],
-            max_tokens=10,
-            temperature=0
-        )
-        
-        classification = response.choices[0].message.content.strip().upper()
-        return classification == "MEDICAL"
-    except Exception as e:
-        print(f"[DEBUG] Classification error: {e}")
+        if pending_classification is not None:
+            classification = await pending_classification
+        else:
+            classification = await aclassify_question(question)
+    except Exception as exc:
+        print(f"[DEBUG] Classification error: {exc}")
+        classification = None
+    if classification is None:
         # Default to medical if classifier fails - safer approach
         return True
+    return classification.is_medical
+
+def classifier_stats() -> Dict[str, Any]:
+    """Local-hit rate of the medical/general classifier."""
+    return medical_classifier.stats()
 
 # --------------------------------------------------------------------------- #
-# RAG retrieval function
+# Concurrent retrieval across collections
 # --------------------------------------------------------------------------- #
+RETRIEVAL_TIMEOUT: float = float(os.getenv("RAG_RETRIEVAL_TIMEOUT", "8.0"))  # latency budget per collection (s)
+RETRIEVAL_WORKERS: int = int(os.getenv("RAG_RETRIEVAL_WORKERS", "8"))
+
+QUERY_ENGINES = {
+    "nhs": nhs_query_engine,
+    "cancer_research": cancer_query_engine,
+}
+RETRIEVERS = {
+    "nhs": nhs_retriever,
+    "cancer_research": cancer_retriever,
+}
+
+# Bounded pool shared by every request on this worker
+retrieval_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="rag-retrieval")
+
+def _search_collection(
+    collection: str,
+    query: str,
+    retrieve_only: bool = True,
+    embedding: Optional[List[float]] = None,
+) -> list:
+    """Run a single similarity search and return its scored source nodes."""
+    if retrieve_only:
+        # With a precomputed embedding the retriever skips its own embed call
+        return RETRIEVERS[collection].retrieve(QueryBundle(query_str=query, embedding=embedding))
+    # Legacy path: the query engine synthesises an answer we never read
+    return QUERY_ENGINES[collection].query(query).source_nodes
+
+def retrieve_concurrently(
+    queries: List[str],
+    timeout: float = RETRIEVAL_TIMEOUT,
+    retrieve_only: bool = True,
+    embeddings: Optional[Dict[str, List[float]]] = None,
+) -> Dict[Tuple[str, str], Optional[list]]:
+    """
+    Send every (collection, query) search at once and wait for them together.
+
+    Searches that fail or do not finish within ``timeout`` seconds map to None,
+    so callers can carry on with the partial results of the other collections.
+    With ``retrieve_only`` (the default) only the vector search runs; otherwise
+    the full LlamaIndex query engines are used, including response synthesis.
+    ``embeddings`` maps query strings to precomputed vectors for the retrievers.
+
+    Returns:
+        {(collection, query): source_nodes | None}
+    """
+    embeddings = embeddings or {}
+    futures = {}
+    for query in dict.fromkeys(queries):  # de-duplicate, keep order
+        for collection in RETRIEVERS:
+            futures[(collection, query)] = retrieval_pool.submit(
+                _search_collection, collection, query, retrieve_only, embeddings.get(query)
+            )
+
+    deadline = time.monotonic() + timeout
+    results: Dict[Tuple[str, str], Optional[list]] = {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeout:
+            print(f"[DEBUG] RAG: {key[0]} search exceeded {timeout:.1f}s budget - using partial results")
+            results[key] = None
+        except Exception as exc:
+            print(f"[DEBUG] RAG: {key[0]} search error: {exc}")
+            results[key] = None
+    return results
+
+async def aretrieve_concurrently(
+    queries: List[str],
+    timeout: float = RETRIEVAL_TIMEOUT,
+    retrieve_only: bool = True,
+    embeddings: Optional[Dict[str, List[float]]] = None,
+) -> Dict[Tuple[str, str], Optional[list]]:
+    """
+    Async variant of retrieve_concurrently. Chroma searches are blocking, so
+    they still run on the bounded retrieval pool; the event loop only awaits.
+    """
+    loop = asyncio.get_running_loop()
+    embeddings = embeddings or {}
+    keys = [(collection, query) for query in dict.fromkeys(queries) for collection in RETRIEVERS]
+
+    async def _search(collection: str, query: str) -> Optional[list]:
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(
+                    retrieval_pool, _search_collection, collection, query, retrieve_only, embeddings.get(query)
+                ),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            print(f"[DEBUG] RAG: {collection} search exceeded {timeout:.1f}s budget - using partial results")
+        except Exception as exc:
+            print(f"[DEBUG] RAG: {collection} search error: {exc}")
+        return None
+
+    results = await asyncio.gather(*(_search(collection, query) for collection, query in keys))
+    return dict(zip(keys, results))
+
+def build_contextual_query(
+    current_query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+) -> Optional[str]:
+    """Lightweight contextual query from the last 2 messages, or None without history."""
+    if not conversation_history:
+        return None
+    recent_context = []
+    for msg in conversation_history[-2:]:  # Only last 2 messages for context
+        recent_context.append(f"{msg['role']}: {msg['content']}")
+    return f"Context: {' | '.join(recent_context)} | Current: {current_query}"
+
+def turn_queries(
+    current_query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+) -> List[str]:
+    """Every query a turn may embed: the question and, with history, the contextual query."""
+    return [q for q in (current_query, build_contextual_query(current_query, conversation_history)) if q]
+
 # --------------------------------------------------------------------------- #
 # RAG retrieval function with exponential weighting
 # --------------------------------------------------------------------------- #
-def get_rag_context_weighted(
-    current_query: str, 
-    conversation_history: Optional[List[Dict[str, str]]] = None,
+def merge_search_results(
+    searches: Dict[Tuple[str, str], Optional[list]],
+    current_query: str,
+    contextual_query: Optional[str] = None,
     primary_weight: float = 0.8,
-    context_weight: float = 0.2
+    context_weight: float = 0.2,
 ) -> Tuple[Optional[str], float, List[str]]:
     """
-    Get RAG context using exponentially weighted queries from both NHS and Cancer Research UK collections.
-    Prioritizes the current question while considering recent context.
-    
-    Args:
-        current_query: The current user question
-        conversation_history: Recent conversation messages
-        primary_weight: Weight for current query (0.8 = 80% focus on current question)
-        context_weight: Weight for context query (0.2 = 20% focus on context)
-    
-    Returns:
-        (context_text | None, similarity_score, sources)
+    Merge per-collection search results into (context_text | None, similarity_score, sources).
     """
-    print(f"[DEBUG] RAG: Using weighted approach - primary: {primary_weight}, context: {context_weight}")
-    
-    # Search both collections with current query
+    # Collect results for the current query, NHS first then Cancer Research UK
     all_results = []
     best_score = 0.0
-    
-    # Search NHS collection
-    try:
-        nhs_res = nhs_query_engine.query(current_query)
-        if nhs_res.source_nodes:
-            for node in nhs_res.source_nodes:
-                if node.score:
-                    all_results.append({
-                        'text': node.node.text,
-                        'score': node.score,
-                        'source': node.node.metadata.get("source", ""),
-                        'collection': 'nhs'
-                    })
-                    best_score = max(best_score, node.score)
-        print(f"[DEBUG] RAG: NHS search found {len(nhs_res.source_nodes)} results")
-    except Exception as exc:
-        print(f"[DEBUG] RAG: NHS search error: {exc}")
-    
-    # Search Cancer Research UK collection
-    try:
-        cancer_res = cancer_query_engine.query(current_query)
-        if cancer_res.source_nodes:
-            for node in cancer_res.source_nodes:
-                if node.score:
-                    all_results.append({
-                        'text': node.node.text,
-                        'score': node.score,
-                        'source': node.node.metadata.get("source", ""),
-                        'collection': 'cancer_research'
-                    })
-                    best_score = max(best_score, node.score)
-        print(f"[DEBUG] RAG: Cancer Research search found {len(cancer_res.source_nodes)} results")
-    except Exception as exc:
-        print(f"[DEBUG] RAG: Cancer Research search error: {exc}")
-    
+    for collection, label in (("nhs", "NHS"), ("cancer_research", "Cancer Research")):
+        nodes = searches.get((collection, current_query))
+        if nodes is None:
+            continue
+        for node in nodes:
+            if node.score:
+                all_results.append({
+                    'text': node.node.text,
+                    'score': node.score,
+                    'source': node.node.metadata.get("source", ""),
+                    'collection': collection
+                })
+                best_score = max(best_score, node.score)
+        print(f"[DEBUG] RAG: {label} search found {len(nodes)} results")
+
     # If nothing retrieved from either collection
     if not all_results:
         print(f"[DEBUG] RAG: No results from either collection")
         return None, 0.0, []
-    
+
     # Sort results by score and take top results
     all_results.sort(key=lambda x: x['score'], reverse=True)
     top_results = all_results[:6]  # Take top 6 results total
-    
-    # Build contextual query if we have conversation history
+
+    # Contextual similarity from the contextual query searches
     contextual_score = 0.0
-    if conversation_history and len(conversation_history) > 0:
-        try:
-            # Build lightweight contextual query (last 2 messages max)
-            recent_context = []
-            for msg in conversation_history[-2:]:  # Only last 2 messages for context
-                recent_context.append(f"{msg['role']}: {msg['content']}")
-            
-            contextual_query = f"Context: {' | '.join(recent_context)} | Current: {current_query}"
-            print(f"[DEBUG] RAG: Contextual search with recent history")
-            
-            # Search both collections with contextual query
-            context_results = []
-            
-            try:
-                nhs_context_res = nhs_query_engine.query(contextual_query)
-                if nhs_context_res.source_nodes:
-                    context_results.extend([node.score or 0.0 for node in nhs_context_res.source_nodes])
-            except:
-                pass
-            
-            try:
-                cancer_context_res = cancer_query_engine.query(contextual_query)
-                if cancer_context_res.source_nodes:
-                    context_results.extend([node.score or 0.0 for node in cancer_context_res.source_nodes])
-            except:
-                pass
-            
-            if context_results:
-                contextual_score = max(context_results)
-                print(f"[DEBUG] RAG: Contextual similarity = {contextual_score:.3f}")
-        except Exception as exc:
-            print(f"[DEBUG] RAG: Contextual search failed: {exc}")
-            contextual_score = 0.0
-    
+    if contextual_query:
+        context_results = []
+        for collection in RETRIEVERS:
+            nodes = searches.get((collection, contextual_query))
+            if nodes:
+                context_results.extend([node.score or 0.0 for node in nodes])
+        if context_results:
+            contextual_score = max(context_results)
+            print(f"[DEBUG] RAG: Contextual similarity = {contextual_score:.3f}")
+
     # Calculate weighted similarity score
     final_score = (primary_weight * best_score) + (context_weight * contextual_score)
     print(f"[DEBUG] RAG: Weighted similarity = {final_score:.3f} (primary: {best_score:.3f}, context: {contextual_score:.3f})")
-    
+
     # Extract sources from top results
     links: List[str] = [
-        result['source'] for result in top_results 
+        result['source'] for result in top_results
         if result['source'] and (("nhs.uk" in result['source']) or ("cancerresearchuk.org" in result['source']))
     ]
-    
+
     # Domain filter: only NHS / Cancer Research pages
     if not any(("nhs.uk" in url) or ("cancerresearchuk.org" in url) for url in links):
         print(f"[DEBUG] RAG: No NHS/Cancer Research sources found")
         return None, 0.0, links
-    
+
     # Check if weighted similarity is high enough
     if final_score < SIM_THRESHOLD:
         print(f"[DEBUG] RAG: Weighted similarity {final_score:.3f} below threshold {SIM_THRESHOLD}")
         return None, final_score, links
-    
+
     # Extract context from top results
     context_parts = []
     for result in top_results:
         if result['score'] >= (SIM_THRESHOLD * 0.8):  # Slightly lower threshold for individual nodes
             context_parts.append(result['text'])
-    
+
     context_text = "\n\n".join(context_parts) if context_parts else None
     return context_text, final_score, links
 
+def get_rag_context_weighted(
+    current_query: str, 
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    primary_weight: float = 0.8,
+    context_weight: float = 0.2,
+    retrieve_only: bool = True,
+    query_embeddings: Optional[Dict[str, List[float]]] = None,
+) -> Tuple[Optional[str], float, List[str]]:
+    """
+    Get RAG context using exponentially weighted queries from both NHS and Cancer Research UK collections.
+    Prioritizes the current question while considering recent context.
+
+    All collection/query searches run concurrently, so retrieval latency is
+    roughly that of the slowest single search.
+    
+    Args:
+        current_query: The current user question
+        conversation_history: Recent conversation messages
+        primary_weight: Weight for current query (0.8 = 80% focus on current question)
+        context_weight: Weight for context query (0.2 = 20% focus on context)
+        retrieve_only: Use the retrievers directly (no LLM synthesis per search)
+        query_embeddings: Already computed {query: vector}; missing ones are
+            embedded together in one batched call
+    
+    Returns:
+        (context_text | None, similarity_score, sources)
+    """
+    print(f"[DEBUG] RAG: Using weighted approach - primary: {primary_weight}, context: {context_weight}")
+
+    contextual_query = build_contextual_query(current_query, conversation_history)
+    queries = [current_query]
+    if contextual_query:
+        print(f"[DEBUG] RAG: Contextual search with recent history")
+        queries.append(contextual_query)
+
+    embeddings = dict(query_embeddings or {})
+    if retrieve_only:
+        missing = [q for q in queries if q not in embeddings]
+        if missing:
+            try:
+                embeddings.update(embed_queries(missing))
+            except Exception as exc:
+                # Retrievers fall back to embedding each query themselves
+                print(f"[DEBUG] RAG: Batched query embedding failed: {exc}")
+
+    searches = retrieve_concurrently(queries, retrieve_only=retrieve_only, embeddings=embeddings)
+    return merge_search_results(searches, current_query, contextual_query, primary_weight, context_weight)
+
+async def aget_rag_context_weighted(
+    current_query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    primary_weight: float = 0.8,
+    context_weight: float = 0.2,
+    retrieve_only: bool = True,
+    query_embeddings: Optional[Dict[str, List[float]]] = None,
+) -> Tuple[Optional[str], float, List[str]]:
+    """Async variant of get_rag_context_weighted."""
+    print(f"[DEBUG] RAG: Using weighted approach - primary: {primary_weight}, context: {context_weight}")
+
+    contextual_query = build_contextual_query(current_query, conversation_history)
+    queries = [current_query]
+    if contextual_query:
+        print(f"[DEBUG] RAG: Contextual search with recent history")
+        queries.append(contextual_query)
+
+    embeddings = dict(query_embeddings or {})
+    if retrieve_only:
+        missing = [q for q in queries if q not in embeddings]
+        if missing:
+            try:
+                embeddings.update(await aembed_queries(missing))
+            except Exception as exc:
+                # Retrievers fall back to embedding each query themselves
+                print(f"[DEBUG] RAG: Batched query embedding failed: {exc}")
+
+    searches = await aretrieve_concurrently(queries, retrieve_only=retrieve_only, embeddings=embeddings)
+    return merge_search_results(searches, current_query, contextual_query, primary_weight, context_weight)
+
 def get_rag_context(query: str) -> Tuple[Optional[str], float, List[str]]:
     """
     Legacy function - now just calls the weighted version with current query only
@@ -249,16 +481,16 @@ def get_rag_context(query: str) -> Tuple[Optional[str], float, List[str]]:
 # --------------------------------------------------------------------------- #
 # GPT-4o conversation with optional RAG enhancement
 # --------------------------------------------------------------------------- #
-def generate_response_with_gpt4o(
-    messages: List[Dict[str, str]], 
+def build_gpt_messages(
+    messages: List[Dict[str, str]],
     current_message: str,
     rag_context: Optional[str] = None,
-    sources: Optional[List[str]] = None,
     is_medical: bool = False,
     user_context: Optional[str] = None,
-) -> str:
+) -> List[Dict[str, str]]:
     """
-    Generate response using GPT-4o, optionally enhanced with RAG context and user context
+    Build the GPT-4o message list: system prompt (with optional RAG and user
+    context), conversation history and the current message
     """
     
     # Build system prompt
@@ -331,7 +563,20 @@ Sources:
     print(f"[DEBUG] Full conversation context being sent:")
     for i, msg in enumerate(gpt_messages):
         print(f"  {i}. {msg['role']}: {msg['content'][:150]}...")
-    
+    return gpt_messages
+
+def generate_response_with_gpt4o(
+    messages: List[Dict[str, str]], 
+    current_message: str,
+    rag_context: Optional[str] = None,
+    sources: Optional[List[str]] = None,
+    is_medical: bool = False,
+    user_context: Optional[str] = None,
+) -> str:
+    """
+    Generate response using GPT-4o, optionally enhanced with RAG context and user context
+    """
+    gpt_messages = build_gpt_messages(messages, current_message, rag_context, is_medical, user_context)
     try:
         response = openai_client.chat.completions.create(
             model="gpt-4o",
@@ -343,7 +588,50 @@ Sources:
         return response.choices[0].message.content
     except Exception as e:
         print(f"[DEBUG] GPT-4o error: {e}")
-        return "I'm having trouble responding right now. Please try again in a moment."
+        return GENERATION_ERROR_MESSAGE
+
+async def astream_response_with_gpt4o(
+    messages: List[Dict[str, str]],
+    current_message: str,
+    rag_context: Optional[str] = None,
+    is_medical: bool = False,
+    user_context: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Stream GPT-4o text deltas as they arrive (same prompt as generate_response_with_gpt4o)."""
+    gpt_messages = build_gpt_messages(messages, current_message, rag_context, is_medical, user_context)
+    stream = await async_openai_client.chat.completions.create(
+        model="gpt-4o",
+        messages=gpt_messages,
+        temperature=0.7,
+        max_tokens=1200,
+        stream=True,
+    )
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+async def agenerate_response_with_gpt4o(
+    messages: List[Dict[str, str]],
+    current_message: str,
+    rag_context: Optional[str] = None,
+    sources: Optional[List[str]] = None,
+    is_medical: bool = False,
+    user_context: Optional[str] = None,
+) -> str:
+    """Async variant of generate_response_with_gpt4o (AsyncOpenAI client)."""
+    gpt_messages = build_gpt_messages(messages, current_message, rag_context, is_medical, user_context)
+    try:
+        response = await async_openai_client.chat.completions.create(
+            model="gpt-4o",
+            messages=gpt_messages,
+            temperature=0.7,  # Slightly more conversational
+            max_tokens=1200  # Increased for sources
+        )
+        
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"[DEBUG] GPT-4o error: {e}")
+        return GENERATION_ERROR_MESSAGE
 
 # --------------------------------------------------------------------------- #
 # Response formatting with sources
@@ -504,14 +792,153 @@ def convert_text_source_to_link(source_text: str) -> str:
     # If no pattern matches, return original text
     return source_text
 
+# --------------------------------------------------------------------------- #
+# Semantic answer cache (standalone questions only)
+# --------------------------------------------------------------------------- #
+ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+INDEX_VERSION_CHECK_INTERVAL: float = 30.0  # seconds between re-index checks
+
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+    max_items=int(os.getenv("ANSWER_CACHE_MAX_ITEMS", "1000")),
+)
+_index_version: Tuple[Any, ...] = ()
+_index_version_checked_at: float = 0.0
+
+def current_index_version() -> Tuple[Any, ...]:
+    """
+    Cheap fingerprint of both Chroma collections (chunk counts + store mtime).
+    It changes whenever the collections are re-indexed, which invalidates
+    the answer cache. Re-checked at most every INDEX_VERSION_CHECK_INTERVAL.
+    """
+    global _index_version, _index_version_checked_at
+    now = time.monotonic()
+    if _index_version and now - _index_version_checked_at < INDEX_VERSION_CHECK_INTERVAL:
+        return _index_version
+    try:
+        store_file = INDEX_DIR / "chroma.sqlite3"
+        mtime = store_file.stat().st_mtime if store_file.exists() else 0.0
+        _index_version = (nhs_collection.count(), cancer_collection.count(), mtime)
+    except Exception as exc:
+        print(f"[DEBUG] Answer cache: could not read index version: {exc}")
+    _index_version_checked_at = now
+    return _index_version
+
+def cache_stats() -> Dict[str, Any]:
+    """Metrics for the query-embedding and answer caches."""
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+    }
+
 # --------------------------------------------------------------------------- #
 # Main answer function
 # --------------------------------------------------------------------------- #
+def _log_answer_call(
+    query: str,
+    conversation_history: Optional[List[Dict[str, str]]],
+    original_query: Optional[str],
+) -> None:
+    print(f"[DEBUG] === ANSWER FUNCTION CALLED ===")
+    print(f"[DEBUG] Query: {query[:200]}...")
+    print(f"[DEBUG] Original query: {original_query}")
+    print(f"[DEBUG] Conversation history length: {len(conversation_history) if conversation_history else 0}")
+    
+    if conversation_history:
+        print(f"[DEBUG] Conversation history:")
+        for i, msg in enumerate(conversation_history):
+            print(f"  {i+1}. {msg['role']}: {msg['content'][:100]}...")
+
+def _lookup_cached_answer(
+    current_message: str,
+    user_context: Optional[str],
+    query_embeddings: Dict[str, List[float]],
+) -> Optional[Tuple[str, List[str], Dict[str, Any]]]:
+    """Semantic answer cache lookup for an already embedded standalone question."""
+    cached = answer_cache.lookup(
+        query_embeddings[current_message],
+        context_key(user_context),
+        current_index_version(),
+    )
+    if not cached:
+        return None
+    cached_response, cached_sources, cached_metadata, similarity = cached
+    print(f"[DEBUG] Answer cache hit (similarity {similarity:.3f})")
+    cached_metadata.update(answer_cache_hit=True, cache_similarity=similarity)
+    return cached_response, cached_sources, cached_metadata
+
+def _log_rag_result(rag_context: Optional[str], rag_score: float, sources: List[str]) -> None:
+    if rag_context:
+        print(f"[DEBUG] Using RAG context (weighted score: {rag_score:.3f})")
+        print(f"[DEBUG] RAG context preview: {rag_context[:200]}...")
+        print(f"[DEBUG] Sources: {sources}")
+    else:
+        print(f"[DEBUG] No suitable RAG context found (weighted score: {rag_score:.3f})")
+
+def _finalise_answer(
+    response: str,
+    sources: List[str],
+    rag_context: Optional[str],
+    rag_score: float,
+    is_medical: bool,
+    messages: List[Dict[str, str]],
+    current_message: str,
+    user_context: Optional[str],
+    query_embeddings: Dict[str, List[float]],
+    use_answer_cache: bool,
+    failed: bool = False,
+) -> Tuple[str, List[str], Dict[str, Any]]:
+    """
+    Format sources, build metadata and store cacheable answers. ``failed``
+    marks a generation that errored (possibly after some text was streamed):
+    the answer is flagged with metadata["error"] and never cached.
+    """
+    failed = failed or response == GENERATION_ERROR_MESSAGE
+    print(f"[DEBUG] GPT-4o response: {response[:200]}...")
+    
+    # Format response with appropriate sources
+    formatted_response, final_sources = format_response_with_sources(response, sources, {
+        "is_medical": is_medical,
+        "used_rag": rag_context is not None,
+        "rag_score": rag_score,
+        "model_used": "gpt-4o",
+        "conversation_length": len(messages)
+    })
+    
+    # Metadata for debugging/analytics
+    metadata = {
+        "is_medical": is_medical,
+        "used_rag": rag_context is not None,
+        "rag_score": rag_score,
+        "model_used": "gpt-4o",
+        "conversation_length": len(messages),
+        "sources_count": len(final_sources)
+    }
+    if failed:
+        metadata["error"] = True
+    
+    print(f"[DEBUG] Final metadata: {metadata}")
+    
+    # Only cache complete medical answers, never a failed or cut-off generation
+    if use_answer_cache and is_medical and current_message in query_embeddings and not failed:
+        answer_cache.store(
+            query_embeddings[current_message],
+            context_key(user_context),
+            formatted_response,
+            final_sources,
+            metadata,
+            current_index_version(),
+        )
+    
+    return formatted_response, final_sources, metadata
+
 def answer(
     query: str, 
     conversation_history: Optional[List[Dict[str, str]]] = None,
     original_query: Optional[str] = None,
     user_context: Optional[str] = None,
+    classification: Optional[Classification] = None,
 ) -> Tuple[str, List[str], Dict[str, Any]]:
     """
     Main answer function that handles both general and medical questions.
@@ -520,27 +947,42 @@ def answer(
         query: Current user question (may include context)
         conversation_history: List of {"role": "user/assistant", "content": "..."}
         original_query: Original query without conversation context
+        classification: Result of classify_question() if the caller already
+            has it, so the question is not classified twice
     
     Returns:
         (response_text, sources, metadata)
     """
-    
-    print(f"[DEBUG] === ANSWER FUNCTION CALLED ===")
-    print(f"[DEBUG] Query: {query[:200]}...")
-    print(f"[DEBUG] Original query: {original_query}")
-    print(f"[DEBUG] Conversation history length: {len(conversation_history) if conversation_history else 0}")
-    
-    if conversation_history:
-        print(f"[DEBUG] Conversation history:")
-        for i, msg in enumerate(conversation_history):
-            print(f"  {i+1}. {msg['role']}: {msg['content'][:100]}...")
+    _log_answer_call(query, conversation_history, original_query)
     
     # Use original query for classification if available, otherwise use full query
     classify_query = original_query if original_query else query
     current_message = original_query if original_query else query
     
+    # Standalone questions can be served from the semantic answer cache
+    use_answer_cache = ANSWER_CACHE_ENABLED and not conversation_history
+    query_embeddings: Dict[str, List[float]] = {}
+    if use_answer_cache:
+        try:
+            query_embeddings = embed_queries([current_message])
+            cached = _lookup_cached_answer(current_message, user_context, query_embeddings)
+            if cached:
+                return cached
+        except Exception as e:
+            print(f"[DEBUG] Answer cache lookup error: {e}")
+    
+    # The centroid tier needs the question's vector: embed it together with the
+    # contextual retrieval query, so the turn still makes one embedding call
+    if classification is None and medical_classifier.classify_rules(classify_query) is None:
+        missing = [q for q in turn_queries(current_message, conversation_history) if q not in query_embeddings]
+        if missing:
+            try:
+                query_embeddings.update(embed_queries(missing))
+            except Exception as e:
+                print(f"[DEBUG] Query embedding error: {e}")
+    
     # Determine if this is a medical question
-    is_medical = is_medical_question(classify_query)
+    is_medical = is_medical_question(classify_query, classification, query_embeddings.get(classify_query))
     print(f"[DEBUG] Question classified as: {'MEDICAL' if is_medical else 'GENERAL'}")
     print(f"[DEBUG] Classify query: {classify_query}")
     
@@ -559,14 +1001,10 @@ def answer(
             # Use weighted RAG search - prioritize current question over context
             rag_context, rag_score, sources = get_rag_context_weighted(
                 current_message, 
-                conversation_history
+                conversation_history,
+                query_embeddings=query_embeddings,
             )
-            if rag_context:
-                print(f"[DEBUG] Using RAG context (weighted score: {rag_score:.3f})")
-                print(f"[DEBUG] RAG context preview: {rag_context[:200]}...")
-                print(f"[DEBUG] Sources: {sources}")
-            else:
-                print(f"[DEBUG] No suitable RAG context found (weighted score: {rag_score:.3f})")
+            _log_rag_result(rag_context, rag_score, sources)
         except Exception as e:
             print(f"[DEBUG] RAG context error: {e}")
             # Continue without RAG context
@@ -578,30 +1016,183 @@ def answer(
     # Generate response with GPT-4o (with or without RAG enhancement)
     response = generate_response_with_gpt4o(messages, current_message, rag_context, sources, is_medical, user_context)
     
-    print(f"[DEBUG] GPT-4o response: {response[:200]}...")
-    
-    # Format response with appropriate sources
-    formatted_response, final_sources = format_response_with_sources(response, sources, {
-        "is_medical": is_medical,
-        "used_rag": rag_context is not None,
-        "rag_score": rag_score,
-        "model_used": "gpt-4o",
-        "conversation_length": len(messages)
-    })
+    return _finalise_answer(
+        response, sources, rag_context, rag_score, is_medical, messages,
+        current_message, user_context, query_embeddings, use_answer_cache,
+    )
+
+async def _aplan_answer(
+    query: str,
+    conversation_history: Optional[List[Dict[str, str]]],
+    original_query: Optional[str],
+    user_context: Optional[str],
+    classification: Optional[Classification],
+    pending_classification: Optional[Awaitable[Optional[Classification]]] = None,
+) -> Dict[str, Any]:
+    """
+    First half of the async pipeline: answer cache lookup and classification.
+    Returns the plan dict that _aretrieve_for_plan and _finalise_plan use;
+    plan["cached"] holds the full result on an answer cache hit.
+    """
+    _log_answer_call(query, conversation_history, original_query)
     
-    # Metadata for debugging/analytics
-    metadata = {
-        "is_medical": is_medical,
-        "used_rag": rag_context is not None,
-        "rag_score": rag_score,
-        "model_used": "gpt-4o",
-        "conversation_length": len(messages),
-        "sources_count": len(final_sources)
+    classify_query = original_query if original_query else query
+    current_message = original_query if original_query else query
+    plan: Dict[str, Any] = {
+        "current_message": current_message,
+        "user_context": user_context,
+        "conversation_history": conversation_history,
+        "messages": conversation_history or [],
+        # Standalone questions can be served from the semantic answer cache
+        "use_answer_cache": ANSWER_CACHE_ENABLED and not conversation_history,
+        "query_embeddings": {},
+        "cached": None,
+        "is_medical": False,
+        "rag_context": None,
+        "sources": [],
+        "rag_score": 0.0,
+        "failed": False,  # generation errored; set by astream_answer
     }
     
-    print(f"[DEBUG] Final metadata: {metadata}")
+    if plan["use_answer_cache"]:
+        try:
+            plan["query_embeddings"] = await aembed_queries([current_message])
+            plan["cached"] = _lookup_cached_answer(current_message, user_context, plan["query_embeddings"])
+            if plan["cached"]:
+                return plan
+        except Exception as e:
+            print(f"[DEBUG] Answer cache lookup error: {e}")
     
-    return formatted_response, final_sources, metadata
+    # The centroid tier needs the question's vector: embed it together with the
+    # contextual retrieval query, so the turn still makes one embedding call
+    if classification is None and medical_classifier.classify_rules(classify_query) is None:
+        missing = [
+            q for q in turn_queries(current_message, conversation_history)
+            if q not in plan["query_embeddings"]
+        ]
+        if missing:
+            try:
+                plan["query_embeddings"].update(await aembed_queries(missing))
+            except Exception as e:
+                print(f"[DEBUG] Query embedding error: {e}")
+    
+    # Determine if this is a medical question
+    plan["is_medical"] = await ais_medical_question(
+        classify_query, classification, plan["query_embeddings"].get(classify_query),
+        pending_classification,
+    )
+    print(f"[DEBUG] Question classified as: {'MEDICAL' if plan['is_medical'] else 'GENERAL'}")
+    return plan
+
+async def _aretrieve_for_plan(plan: Dict[str, Any]) -> None:
+    """Second half: RAG retrieval for medical questions (fills the plan in place)."""
+    if not plan["is_medical"]:
+        print(f"[DEBUG] Skipping RAG for general conversation")
+        return
+    try:
+        plan["rag_context"], plan["rag_score"], plan["sources"] = await aget_rag_context_weighted(
+            plan["current_message"],
+            plan["conversation_history"],
+            query_embeddings=plan["query_embeddings"],
+        )
+        _log_rag_result(plan["rag_context"], plan["rag_score"], plan["sources"])
+    except Exception as e:
+        print(f"[DEBUG] RAG context error: {e}")
+        # Continue without RAG context
+
+def _finalise_plan(plan: Dict[str, Any], response: str) -> Tuple[str, List[str], Dict[str, Any]]:
+    return _finalise_answer(
+        response, plan["sources"], plan["rag_context"], plan["rag_score"], plan["is_medical"],
+        plan["messages"], plan["current_message"], plan["user_context"],
+        plan["query_embeddings"], plan["use_answer_cache"], plan["failed"],
+    )
+
+async def aanswer(
+    query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    original_query: Optional[str] = None,
+    user_context: Optional[str] = None,
+    classification: Optional[Classification] = None,
+    pending_classification: Optional[Awaitable[Optional[Classification]]] = None,
+) -> Tuple[str, List[str], Dict[str, Any]]:
+    """
+    Async variant of answer(): embeddings, classification and generation use
+    the async OpenAI clients and retrieval runs off the event loop, so one
+    slow completion no longer blocks other requests on the worker.
+    
+    ``pending_classification`` lets the caller run categorization alongside
+    the pipeline; it is only awaited if the local medical gate is unsure.
+    """
+    plan = await _aplan_answer(
+        query, conversation_history, original_query, user_context, classification, pending_classification
+    )
+    if plan["cached"]:
+        return plan["cached"]
+    await _aretrieve_for_plan(plan)
+    
+    # Generate response with GPT-4o (with or without RAG enhancement)
+    response = await agenerate_response_with_gpt4o(
+        plan["messages"], plan["current_message"], plan["rag_context"],
+        plan["sources"], plan["is_medical"], user_context,
+    )
+    return _finalise_plan(plan, response)
+
+async def astream_answer(
+    query: str,
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    original_query: Optional[str] = None,
+    user_context: Optional[str] = None,
+    classification: Optional[Classification] = None,
+    pending_classification: Optional[Awaitable[Optional[Classification]]] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of aanswer(). Yields {"event": ..., "data": ...} dicts:
+    
+        status   {"stage": "classified", "is_medical": bool}
+        sources  {"sources": [...], "used_rag": bool, "rag_score": float}
+        token    {"text": "..."}  GPT-4o deltas as they arrive
+        final    {"response": ..., "sources": [...], "metadata": {...}}
+    
+    The final response carries the formatted sources section, so it may
+    differ from the concatenated tokens; clients should replace the streamed
+    text with it.
+    """
+    plan = await _aplan_answer(
+        query, conversation_history, original_query, user_context, classification, pending_classification
+    )
+    if plan["cached"]:
+        response, sources, metadata = plan["cached"]
+        yield {"event": "status", "data": {"stage": "cached", "is_medical": metadata.get("is_medical", True)}}
+        yield {"event": "sources", "data": {"sources": sources, "used_rag": metadata.get("used_rag", False), "rag_score": metadata.get("rag_score", 0.0)}}
+        yield {"event": "token", "data": {"text": response}}
+        yield {"event": "final", "data": {"response": response, "sources": sources, "metadata": metadata}}
+        return
+    
+    yield {"event": "status", "data": {"stage": "classified", "is_medical": plan["is_medical"]}}
+    await _aretrieve_for_plan(plan)
+    yield {"event": "sources", "data": {
+        "sources": plan["sources"],
+        "used_rag": plan["rag_context"] is not None,
+        "rag_score": plan["rag_score"],
+    }}
+    
+    parts: List[str] = []
+    try:
+        async for text in astream_response_with_gpt4o(
+            plan["messages"], plan["current_message"], plan["rag_context"], plan["is_medical"], user_context,
+        ):
+            parts.append(text)
+            yield {"event": "token", "data": {"text": text}}
+    except Exception as e:
+        print(f"[DEBUG] GPT-4o streaming error: {e}")
+        plan["failed"] = True
+        # Keep any text already streamed, but say it was cut off
+        error_text = f"\n\n{GENERATION_ERROR_MESSAGE}" if parts else GENERATION_ERROR_MESSAGE
+        parts.append(error_text)
+        yield {"event": "token", "data": {"text": error_text}}
+    
+    response, sources, metadata = _finalise_plan(plan, "".join(parts))
+    yield {"event": "final", "data": {"response": response, "sources": sources, "metadata": metadata}}
 
 # --------------------------------------------------------------------------- #
 # Backward compatibility function
@@ -0,0 +1,40 @@
+"""add_composite_query_indexes
+
+Revision ID: e7b2f0c4d583
+Revises: d41e7c2a9b10
+Create Date: 2026-10-17 10:03:48.117520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2f0c4d583'
+down_revision: Union[str, Sequence[str], None] = 'd41e7c2a9b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_chat_sessions_user_id_created_at', 'chat_sessions', ['user_id', 'created_at'], unique=False)
+    op.create_index('ix_messages_session_id_role_created_at', 'messages', ['session_id', 'role', 'created_at'], unique=False)
+    op.create_index('ix_messages_role_created_at', 'messages', ['role', 'created_at'], unique=False)
+    op.create_index('ix_unanswered_queries_created_at', 'unanswered_queries', ['created_at'], unique=False)
+    op.create_index('ix_unanswered_queries_category_created_at', 'unanswered_queries', ['category', 'created_at'], unique=False)
+    op.create_index('ix_unanswered_queries_reason_created_at', 'unanswered_queries', ['reason', 'created_at'], unique=False)
+    op.create_index('ix_unanswered_queries_session_id', 'unanswered_queries', ['session_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_unanswered_queries_session_id', table_name='unanswered_queries')
+    op.drop_index('ix_unanswered_queries_reason_created_at', table_name='unanswered_queries')
+    op.drop_index('ix_unanswered_queries_category_created_at', table_name='unanswered_queries')
+    op.drop_index('ix_unanswered_queries_created_at', table_name='unanswered_queries')
+    op.drop_index('ix_messages_role_created_at', table_name='messages')
+    op.drop_index('ix_messages_session_id_role_created_at', table_name='messages')
+    op.drop_index('ix_chat_sessions_user_id_created_at', table_name='chat_sessions')
@@ -0,0 +1,50 @@
+"""add_analytics_rollups
+
+Revision ID: f2a86c1d7e45
+Revises: e7b2f0c4d583
+Create Date: 2026-10-17 11:20:05.639812
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a86c1d7e45'
+down_revision: Union[str, Sequence[str], None] = 'e7b2f0c4d583'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('analytics_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('day', sa.String(length=10), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('country', sa.String(length=100), nullable=False),
+    sa.Column('gender', sa.String(length=50), nullable=False),
+    sa.Column('age_band', sa.String(length=10), nullable=False),
+    sa.Column('reason', sa.String(length=100), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('score_count', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Float(), nullable=False),
+    sa.Column('score_hist', sa.JSON(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('kind', 'day', 'category', 'country', 'gender', 'age_band', 'reason', name='uq_analytics_rollups_key')
+    )
+    op.create_table('analytics_watermarks',
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('last_id', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('analytics_watermarks')
+    op.drop_table('analytics_rollups')
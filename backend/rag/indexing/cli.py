@@ -0,0 +1,60 @@
+"""
+Command line entry point for the indexing pipeline.
+
+    python -m rag.indexing nhs_docs               # incremental refresh
+    python -m rag.indexing cancer_research_docs --full
+    python -m rag.indexing all
+    python -m rag.indexing path/to/collection.toml
+    python -m rag.indexing --list
+
+Run from ``backend/``. Collections are configured in ``rag/indexing/configs``.
+"""
+from __future__ import annotations
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+
+from .config import available_configs, load_config
+from .embedder import EMBED_BASE_URL
+from .pipeline import Pipeline
+
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+
+def _check_api_key(configs) -> None:
+    """The OpenAI key is only needed when a collection embeds against api.openai.com."""
+    if any((c.embed.base_url or EMBED_BASE_URL).rstrip("/") == OPENAI_BASE_URL for c in configs):
+        key = os.getenv("OPENAI_API_KEY")
+        if not key:
+            sys.exit("❌  OPENAI_API_KEY is NOT set – export it or put it in .env first.")
+        print("✅  Using OPENAI_API_KEY =", key[:10], "...")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m rag.indexing", description="Index web pages into Chroma")
+    parser.add_argument("collections", nargs="*", help="config names, TOML paths, or 'all'")
+    parser.add_argument("--full", action="store_true", help="drop the collection and re-embed every page")
+    parser.add_argument("--list", action="store_true", help="list the configured collections")
+    args = parser.parse_args(argv)
+
+    if args.list or not args.collections:
+        print("Configured collections:", ", ".join(available_configs()) or "(none)")
+        return 0
+
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+
+    names = available_configs() if args.collections == ["all"] else args.collections
+    try:
+        configs = [load_config(name) for name in names]
+    except (FileNotFoundError, ValueError) as e:
+        sys.exit(f"❌ {e}")
+    _check_api_key(configs)
+
+    for config in configs:
+        start = time.time()
+        Pipeline(config).run(full=args.full)
+        print(f"✅ {config.collection} indexed in {time.time() - start:.1f} seconds\n")
+    return 0
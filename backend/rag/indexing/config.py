@@ -0,0 +1,137 @@
+"""
+Collection configs for the indexing pipeline.
+
+One TOML file per Chroma collection lives in ``configs/``. Every section is
+optional and falls back to the defaults below. Unknown keys are rejected so
+a typo does not silently fall back to a default. Relative paths resolve
+against ``backend/rag``.
+"""
+from __future__ import annotations
+import pathlib
+import tomllib
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional, Union
+
+RAG_DIR = pathlib.Path(__file__).resolve().parents[1]  # backend/rag
+CONFIG_DIR = pathlib.Path(__file__).resolve().parent / "configs"
+
+
+@dataclass
+class SourceConfig:
+    type: str = "urls"  # "sitemap" | "urls" | "html_dir" (see sources.SOURCES)
+    urls: List[str] = field(default_factory=list)  # urls: pages to index; sitemap: sitemap URLs
+    allowed_domains: List[str] = field(default_factory=list)  # sitemap links outside these are dropped
+    path: str = "html"  # html_dir: directory of .html files
+    max_pages: Optional[int] = None
+
+
+@dataclass
+class FetchConfig:
+    """Unset values fall back to the CRAWL_* environment variables (see crawler.py)."""
+    rate: Optional[float] = None  # requests per second
+    burst: Optional[int] = None
+    per_host: Optional[int] = None
+    max_retries: Optional[int] = None
+    timeout: Optional[float] = None
+    revalidate: bool = True  # conditional GETs for cached pages; False trusts the cache
+
+    def crawl_kwargs(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if getattr(self, f.name) is not None}
+
+
+@dataclass
+class FilterConfig:
+    """Keep a page when its URL contains a category or keyword, or its title/opening text a keyword."""
+    categories: List[str] = field(default_factory=list)
+    keywords: List[str] = field(default_factory=list)
+    sample_chars: int = 1000
+
+
+@dataclass
+class ExtractConfig:
+    parser: str = "main_content"  # see extract.PARSERS
+    workers: int = 0  # 0: EXTRACT_WORKERS / CPU count
+    cache_path: Optional[pathlib.Path] = None  # default: EXTRACT_CACHE_PATH / rag/extract_cache.sqlite3
+
+
+@dataclass
+class ChunkConfig:
+    chunk_size: int = 1024  # LlamaIndex SentenceSplitter defaults
+    chunk_overlap: int = 200
+
+
+@dataclass
+class EmbedConfig:
+    model: str = "text-embedding-3-small"
+    base_url: Optional[str] = None  # default: EMBED_BASE_URL / OPENAI_BASE_URL / api.openai.com
+    batch_tokens: Optional[int] = None
+    batch_size: Optional[int] = None
+    concurrency: Optional[int] = None
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+
+    def embedder_kwargs(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name != "model" and getattr(self, f.name) is not None}
+
+
+@dataclass
+class IndexConfig:
+    collection: str
+    persist_dir: pathlib.Path = RAG_DIR / "chroma_db"
+    html_dir: pathlib.Path = RAG_DIR / "html"
+    stats_file: Optional[pathlib.Path] = None
+    url_title: bool = True  # add the last URL segment as "title" metadata
+    metadata: Dict[str, Any] = field(default_factory=dict)  # static metadata on every document
+    source: SourceConfig = field(default_factory=SourceConfig)
+    fetch: FetchConfig = field(default_factory=FetchConfig)
+    filter: FilterConfig = field(default_factory=FilterConfig)
+    extract: ExtractConfig = field(default_factory=ExtractConfig)
+    chunk: ChunkConfig = field(default_factory=ChunkConfig)
+    embed: EmbedConfig = field(default_factory=EmbedConfig)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndexConfig":
+        sections = {
+            "source": SourceConfig, "fetch": FetchConfig, "filter": FilterConfig,
+            "extract": ExtractConfig, "chunk": ChunkConfig, "embed": EmbedConfig,
+        }
+        data = dict(data)
+        for key, section in sections.items():
+            if key in data:
+                data[key] = _build(section, data[key], key)
+        for key in ("persist_dir", "html_dir", "stats_file"):
+            if data.get(key) is not None:
+                data[key] = _resolve(data[key])
+        if isinstance(data.get("extract"), ExtractConfig) and data["extract"].cache_path is not None:
+            data["extract"].cache_path = _resolve(data["extract"].cache_path)
+        if isinstance(data.get("source"), SourceConfig) and data["source"].type == "html_dir":
+            data["source"].path = str(_resolve(data["source"].path))
+        return _build(cls, data, "config")
+
+
+def _build(cls, data: Dict[str, Any], where: str):
+    known = {f.name for f in fields(cls)}
+    unknown = set(data) - known
+    if unknown:
+        raise ValueError(f"Unknown key(s) in [{where}]: {', '.join(sorted(unknown))}")
+    return cls(**data)
+
+
+def _resolve(path: Union[str, pathlib.Path]) -> pathlib.Path:
+    path = pathlib.Path(path).expanduser()
+    return path if path.is_absolute() else RAG_DIR / path
+
+
+def available_configs() -> List[str]:
+    return sorted(p.stem for p in CONFIG_DIR.glob("*.toml"))
+
+
+def load_config(name_or_path: Union[str, pathlib.Path]) -> IndexConfig:
+    """Load ``configs/<name>.toml`` or an explicit TOML path."""
+    path = pathlib.Path(name_or_path)
+    if path.suffix != ".toml":
+        path = CONFIG_DIR / f"{name_or_path}.toml"
+    if not path.exists():
+        raise FileNotFoundError(f"No indexing config {path} (available: {', '.join(available_configs())})")
+    with path.open("rb") as f:
+        return IndexConfig.from_dict(tomllib.load(f))
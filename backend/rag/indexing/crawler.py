@@ -0,0 +1,263 @@
+"""
+Fetch stage of the indexing pipeline: async crawler.
+
+Every request goes through one connection-pooled ``httpx.AsyncClient``.
+Concurrency is bounded per host, a token bucket caps the overall request
+rate, and failed requests back off exponentially with full jitter. Pages
+already in the HTML cache are revalidated with ETag / Last-Modified, so an
+unchanged page costs a 304 instead of a download. An optional relevance
+check runs on each page body as soon as it arrives (in a worker thread), so
+no page is ever requested twice.
+
+    results = asyncio.run(crawl(urls, html_dir, relevance=page_is_relevant))
+"""
+from __future__ import annotations
+import asyncio
+import email.utils
+import json
+import os
+import pathlib
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+CRAWL_RATE: float = float(os.getenv("CRAWL_RATE", "10"))  # requests per second, all hosts
+CRAWL_BURST: int = int(os.getenv("CRAWL_BURST", "10"))
+CRAWL_PER_HOST: int = int(os.getenv("CRAWL_PER_HOST", "8"))  # concurrent requests per host
+CRAWL_MAX_RETRIES: int = int(os.getenv("CRAWL_MAX_RETRIES", "4"))
+CRAWL_BACKOFF_BASE: float = float(os.getenv("CRAWL_BACKOFF_BASE", "0.5"))  # seconds
+CRAWL_BACKOFF_CAP: float = float(os.getenv("CRAWL_BACKOFF_CAP", "30"))
+CRAWL_TIMEOUT: float = float(os.getenv("CRAWL_TIMEOUT", "30"))
+
+USER_AGENT = "kyra-indexer/1.0"
+RETRY_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+STATE_FILE = ".crawl_state.json"  # ETag / Last-Modified per URL, kept next to the cached pages
+
+Relevance = Callable[[str, str], bool]  # (url, html) -> keep?
+
+
+def cache_path(cache_dir: pathlib.Path, url: str) -> pathlib.Path:
+    """Cache file for a URL in the ``html/`` page cache."""
+    return cache_dir / (re.sub(r"[^a-z0-9]+", "_", url.lower().split("//")[1]) + ".html")
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, at most ``burst`` banked."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:  # waiters are served in arrival order
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class CrawlResult:
+    url: str
+    status: str  # "fetched" | "not_modified" | "cached" | "failed"
+    path: Optional[pathlib.Path] = None
+    relevant: Optional[bool] = None  # None when no relevance check was given
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status != "failed"
+
+
+def backoff_delay(attempt: int, base: float = CRAWL_BACKOFF_BASE, cap: float = CRAWL_BACKOFF_CAP) -> float:
+    """Full-jitter exponential backoff before retry number ``attempt`` (1-based)."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    """Seconds requested by a Retry-After header (delta or HTTP date)."""
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Crawler:
+    """
+    Shared client, limits and validator state for one crawl. Use as an async
+    context manager; the validator state is saved on exit.
+    """
+
+    def __init__(
+        self,
+        cache_dir: pathlib.Path,
+        *,
+        relevance: Optional[Relevance] = None,
+        rate: float = CRAWL_RATE,
+        burst: int = CRAWL_BURST,
+        per_host: int = CRAWL_PER_HOST,
+        max_retries: int = CRAWL_MAX_RETRIES,
+        backoff_base: float = CRAWL_BACKOFF_BASE,
+        timeout: float = CRAWL_TIMEOUT,
+        revalidate: bool = True,
+        client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.relevance = relevance
+        self.per_host = per_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.revalidate = revalidate  # False: trust cached pages without asking the server
+        self.bucket = TokenBucket(rate, burst)
+        self.client = client
+        self._owns_client = client is None
+        self._host_slots: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+        self._state_file = self.cache_dir / STATE_FILE
+        self._state: Dict[str, Dict[str, str]] = {}
+
+    async def __aenter__(self) -> "Crawler":
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if self._state_file.exists():
+            try:
+                self._state = json.loads(self._state_file.read_text(encoding="utf-8"))
+            except ValueError:
+                print(f"⚠️  Ignoring unreadable crawl state: {self._state_file}")
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_connections=max(self.per_host * 4, 10), max_keepalive_connections=max(self.per_host * 4, 10)),
+            )
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.save_state()
+        if self._owns_client and self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def save_state(self) -> None:
+        tmp = self._state_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self._state, indent=0, sort_keys=True), encoding="utf-8")
+        tmp.replace(self._state_file)
+
+    # ----- single page ----- #
+
+    def _conditional_headers(self, url: str, path: pathlib.Path) -> Dict[str, str]:
+        validators = self._state.get(url, {})
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        # Pages cached before validators were recorded fall back to the file mtime
+        headers["If-Modified-Since"] = validators.get("last_modified") or email.utils.formatdate(
+            path.stat().st_mtime, usegmt=True
+        )
+        return headers
+
+    def _remember(self, url: str, resp: httpx.Response) -> None:
+        validators = {k: resp.headers[h] for k, h in (("etag", "etag"), ("last_modified", "last-modified")) if h in resp.headers}
+        if validators:
+            self._state.setdefault(url, {}).update(validators)
+
+    async def _finish(self, result: CrawlResult, html: Optional[str] = None) -> CrawlResult:
+        if self.relevance is not None and result.ok:
+            if html is None:
+                html = await asyncio.to_thread(result.path.read_text, encoding="utf-8", errors="replace")
+            try:
+                result.relevant = await asyncio.to_thread(self.relevance, result.url, html)
+            except Exception as e:
+                print(f"⚠️  Relevance check failed for {result.url}: {e}")
+                result.relevant = False
+        return result
+
+    async def fetch(self, url: str) -> CrawlResult:
+        """Download (or revalidate) one page into the cache, retrying transient failures."""
+        path = cache_path(self.cache_dir, url)
+        cached = path.exists()
+        if cached and not self.revalidate:
+            return await self._finish(CrawlResult(url, "cached", path))
+
+        headers = self._conditional_headers(url, path) if cached else {}
+        slots = self._host_slots[urlparse(url).netloc]
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            retry_after = None
+            async with slots:
+                await self.bucket.acquire()
+                try:
+                    resp = await self.client.get(url, headers=headers)
+                except httpx.HTTPError as e:  # connect errors, timeouts, protocol errors
+                    error = f"{type(e).__name__}: {e}"
+                else:
+                    if resp.status_code == 304 and cached:
+                        self._remember(url, resp)
+                        return await self._finish(CrawlResult(url, "not_modified", path, attempts=attempt))
+                    if resp.is_success:
+                        html = resp.text
+                        await asyncio.to_thread(path.write_text, html, encoding="utf-8")
+                        self._remember(url, resp)
+                        return await self._finish(CrawlResult(url, "fetched", path, attempts=attempt), html)
+                    error = f"HTTP {resp.status_code}"
+                    if resp.status_code not in RETRY_STATUSES:
+                        break
+                    retry_after = _retry_after(resp)
+            if attempt > self.max_retries:
+                break
+            # Sleep outside the host slot so backoff does not block other pages
+            delay = backoff_delay(attempt, self.backoff_base)
+            await asyncio.sleep(max(delay, retry_after or 0.0))
+
+        print(f"❌ Failed to fetch {url}: {error}")
+        if cached:  # keep serving the copy we already have
+            return await self._finish(CrawlResult(url, "cached", path, attempts=attempt, error=error))
+        return CrawlResult(url, "failed", attempts=attempt, error=error)
+
+    # ----- many pages ----- #
+
+    async def crawl(self, urls: Iterable[str], progress_every: int = 100) -> List[CrawlResult]:
+        """Fetch every URL concurrently; results are returned in completion order."""
+        urls = list(dict.fromkeys(urls))
+        started = time.perf_counter()
+        results: List[CrawlResult] = []
+        for done, next_result in enumerate(asyncio.as_completed([self.fetch(u) for u in urls]), 1):
+            results.append(await next_result)
+            if done % progress_every == 0 or done == len(urls):
+                elapsed = time.perf_counter() - started
+                print(f"⇢ Crawled {done}/{len(urls)} pages in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.1f}/s)")
+        self.save_state()
+        return results
+
+
+async def crawl(urls: Iterable[str], cache_dir: pathlib.Path, **kwargs) -> List[CrawlResult]:
+    """One-shot crawl with a fresh :class:`Crawler` (see its arguments)."""
+    async with Crawler(cache_dir, **kwargs) as crawler:
+        return await crawler.crawl(urls)
+
+
+def summarise(results: Iterable[CrawlResult]) -> Dict[str, int]:
+    """Result counts by status, plus relevant pages."""
+    results = list(results)
+    counts = Counter(r.status for r in results)
+    counts["relevant"] = sum(1 for r in results if r.relevant)
+    return dict(counts)
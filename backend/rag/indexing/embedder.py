@@ -0,0 +1,297 @@
+"""
+Embed stage of the indexing pipeline: batched, concurrent embeddings.
+
+Chunks are packed into token-bounded batches, and several batches go to the
+OpenAI-compatible ``/embeddings`` endpoint at once. The calls stay under
+requests- and tokens-per-minute limits. Transient failures (timeouts, 429,
+5xx) are retried with jittered exponential backoff. Every completed batch is
+checkpointed in SQLite, keyed by model and text hash, so a crashed run
+resumes without paying for the same chunks twice. Throughput (chunks/s and
+tokens/s) is reported at the end of each run.
+
+    embedder = Embedder("text-embedding-3-small")
+    embedder.embed_nodes(nodes)   # sets node.embedding for LlamaIndex nodes
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+import os
+import pathlib
+import random
+import sqlite3
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+EMBED_BASE_URL = os.getenv("EMBED_BASE_URL") or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1"
+EMBED_BATCH_TOKENS: int = int(os.getenv("EMBED_BATCH_TOKENS", "50000"))  # API limit is 300k per request
+EMBED_BATCH_SIZE: int = int(os.getenv("EMBED_BATCH_SIZE", "512"))  # inputs per request (API limit 2048)
+EMBED_CONCURRENCY: int = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_RPM: int = int(os.getenv("EMBED_RPM", "3000"))
+EMBED_TPM: int = int(os.getenv("EMBED_TPM", "1000000"))
+EMBED_MAX_RETRIES: int = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+EMBED_TIMEOUT: float = float(os.getenv("EMBED_TIMEOUT", "60"))
+RAG_DIR = pathlib.Path(__file__).resolve().parents[1]  # backend/rag
+EMBED_CHECKPOINT = pathlib.Path(os.getenv("EMBED_CHECKPOINT_PATH", str(RAG_DIR / "embed_checkpoint.sqlite3")))
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")  # text-embedding-3-* tokenizer
+except Exception:  # tiktoken missing or its BPE file unavailable
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count for the embedding models (roughly 4 characters per token without tiktoken)."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def pack_batches(tokens: Sequence[int], max_tokens: int = EMBED_BATCH_TOKENS, max_items: int = EMBED_BATCH_SIZE) -> List[List[int]]:
+    """Greedy packing of input positions into batches under both limits (an oversized input gets its own batch)."""
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, n in enumerate(tokens):
+        if current and (used + n > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += n
+    if current:
+        batches.append(current)
+    return batches
+
+
+class EmbeddingError(RuntimeError):
+    """A batch still failed after all retries; completed batches are checkpointed."""
+
+
+class _RateLimit:
+    """Per-minute budget refilled continuously (a token bucket sized to one minute)."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._level >= amount:
+                    self._level -= amount
+                    return
+                await asyncio.sleep((amount - self._level) / self.rate)
+
+
+@dataclass
+class EmbedStats:
+    chunks: int = 0
+    tokens: int = 0
+    requests: int = 0
+    retries: int = 0
+    checkpointed: int = 0  # chunks served from the checkpoint
+    seconds: float = 0.0
+
+    def report(self) -> str:
+        secs = max(self.seconds, 1e-9)
+        return (
+            f"{self.chunks} chunks ({self.tokens} tokens) in {self.seconds:.1f}s: "
+            f"{self.chunks / secs:.1f} chunks/s, {self.tokens / secs:.0f} tokens/s; "
+            f"{self.requests} requests, {self.retries} retries, {self.checkpointed} from checkpoint"
+        )
+
+
+class EmbeddingCheckpoint:
+    """Completed embeddings keyed by (model, sha256 of text), stored as float32 blobs."""
+
+    def __init__(self, path: pathlib.Path, model: str):
+        self.model = model
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+            chunk = unique[start:start + 500]
+            rows = self.db.execute(
+                f"SELECT text_hash, vector FROM chunk_embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(chunk))})",
+                (self.model, *chunk),
+            )
+            found.update((key, array("f", blob).tolist()) for key, blob in rows)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self.db:  # one transaction per completed batch
+            self.db.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings VALUES (?, ?, ?, ?)",
+                [(self.model, key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+            )
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class Embedder:
+    """Embeds texts through the ``/embeddings`` API in concurrent, rate-limited, checkpointed batches."""
+
+    def __init__(
+        self,
+        model: str,
+        *,
+        api_key: Optional[str] = None,
+        base_url: str = EMBED_BASE_URL,
+        batch_tokens: int = EMBED_BATCH_TOKENS,
+        batch_size: int = EMBED_BATCH_SIZE,
+        concurrency: int = EMBED_CONCURRENCY,
+        rpm: int = EMBED_RPM,
+        tpm: int = EMBED_TPM,
+        max_retries: int = EMBED_MAX_RETRIES,
+        backoff_base: float = 1.0,
+        timeout: float = EMBED_TIMEOUT,
+        checkpoint_path: Optional[pathlib.Path] = EMBED_CHECKPOINT,
+    ):
+        self.model = model
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        self.base_url = base_url.rstrip("/")
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self.checkpoint = EmbeddingCheckpoint(checkpoint_path, model) if checkpoint_path is not None else None
+        self.stats = EmbedStats()  # totals across calls
+
+    # ----- one request ----- #
+
+    async def _request(self, client: httpx.AsyncClient, texts: List[str], tokens: int, limits) -> List[List[float]]:
+        slots, requests_per_min, tokens_per_min = limits
+        error = None
+        for attempt in range(1, self.max_retries + 2):
+            retry_after = None
+            async with slots:
+                await requests_per_min.acquire()
+                await tokens_per_min.acquire(tokens)
+                self.stats.requests += 1
+                try:
+                    resp = await client.post(
+                        "/embeddings", json={"model": self.model, "input": texts, "encoding_format": "float"}
+                    )
+                except httpx.HTTPError as e:
+                    error = f"{type(e).__name__}: {e}"
+                else:
+                    if resp.is_success:
+                        data = sorted(resp.json()["data"], key=lambda item: item["index"])
+                        return [item["embedding"] for item in data]
+                    error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+                    if resp.status_code not in RETRY_STATUSES:
+                        break
+                    value = resp.headers.get("retry-after")
+                    retry_after = float(value) if value and value.replace(".", "", 1).isdigit() else None
+            if attempt > self.max_retries:
+                break
+            self.stats.retries += 1
+            delay = random.uniform(0, min(60.0, self.backoff_base * 2 ** (attempt - 1)))
+            print(f"⚠️  Embedding batch of {len(texts)} failed ({error}); retry {attempt} in {max(delay, retry_after or 0):.1f}s")
+            await asyncio.sleep(max(delay, retry_after or 0.0))
+        raise EmbeddingError(f"embedding batch of {len(texts)} inputs failed: {error}")
+
+    # ----- many texts ----- #
+
+    async def aembed(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embeddings for ``texts`` in input order."""
+        started = time.perf_counter()
+        keys = [EmbeddingCheckpoint.key(t) for t in texts]
+        done = self.checkpoint.get_many(keys) if self.checkpoint else {}
+        self.stats.checkpointed += sum(1 for k in keys if k in done)
+
+        # Each distinct text that is not checkpointed yet is sent once
+        first: Dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if key not in done:
+                first.setdefault(key, i)
+        todo = list(first.values())
+        if not todo:
+            return [done[k] for k in keys]
+        tokens = [count_tokens(texts[i]) for i in todo]
+        packed = pack_batches(tokens, self.batch_tokens, self.batch_size)
+        batches = [[todo[j] for j in batch] for batch in packed]
+        batch_tokens = [sum(tokens[j] for j in batch) for batch in packed]
+
+        limits = (asyncio.Semaphore(self.concurrency), _RateLimit(self.rpm), _RateLimit(self.tpm))
+        failures: List[BaseException] = []
+        embedded = 0
+        async with httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        ) as client:
+
+            async def run(batch: List[int], n_tokens: int) -> None:
+                nonlocal embedded
+                vectors = await self._request(client, [texts[i] for i in batch], n_tokens, limits)
+                result = {keys[i]: vector for i, vector in zip(batch, vectors)}
+                if self.checkpoint:
+                    await asyncio.to_thread(self.checkpoint.put_many, result)
+                done.update(result)
+                embedded += len(batch)
+                self.stats.chunks += len(batch)
+                self.stats.tokens += n_tokens
+
+            # Let every batch finish (and checkpoint) even if one of them fails
+            for outcome in await asyncio.gather(
+                *(run(batch, n) for batch, n in zip(batches, batch_tokens)), return_exceptions=True
+            ):
+                if isinstance(outcome, BaseException):
+                    failures.append(outcome)
+
+        elapsed = time.perf_counter() - started
+        self.stats.seconds += elapsed
+        print(f"⇢ Embedded {embedded}/{len(todo)} chunks in {len(batches)} batches, {elapsed:.1f}s "
+              f"({embedded / max(elapsed, 1e-9):.1f} chunks/s)")
+        if failures:
+            raise EmbeddingError(f"{len(failures)} of {len(batches)} batches failed; rerun to resume") from failures[0]
+        return [done[k] for k in keys]
+
+    def embed(self, texts: Sequence[str]) -> List[List[float]]:
+        return asyncio.run(self.aembed(texts))
+
+    def embed_nodes(self, nodes: Sequence[Any]) -> None:
+        """Set ``.embedding`` on LlamaIndex nodes, embedding the same text LlamaIndex would."""
+        from llama_index.core.schema import MetadataMode
+
+        vectors = self.embed([node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes])
+        for node, vector in zip(nodes, vectors):
+            node.embedding = vector
+
+    def close(self) -> None:
+        if self.checkpoint:
+            self.checkpoint.close()
@@ -0,0 +1,229 @@
+"""
+Extract stage of the indexing pipeline: parallel HTML-to-text.
+
+Cached pages are parsed with BeautifulSoup/lxml in a process pool and
+``ExtractedPage(url, text, metadata, cached)`` records are yielded as each
+page finishes, so chunking and embedding can start before the whole corpus
+is parsed. Extracted text is cached in SQLite, keyed by file path and
+parser. A page is served from the cache when its mtime and size are
+unchanged. When they differ, the worker re-hashes the file, and only a
+different SHA-256 triggers a re-parse.
+
+    for page in extract_pages(relevant_pages.items(), parser="main_content"):
+        ...
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import pathlib
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+RAG_DIR = pathlib.Path(__file__).resolve().parents[1]  # backend/rag
+EXTRACT_CACHE = pathlib.Path(os.getenv("EXTRACT_CACHE_PATH", str(RAG_DIR / "extract_cache.sqlite3")))
+EXTRACT_WORKERS: int = int(os.getenv("EXTRACT_WORKERS", "0")) or (os.cpu_count() or 1)
+EXTRACT_INLINE_BELOW = 8  # fewer pages to parse than this: skip the pool start-up cost
+EXTRACT_VERSION = 1  # bump when a parser's output changes to invalidate the cache
+
+
+class ExtractedPage(NamedTuple):
+    url: str
+    text: str
+    metadata: Dict[str, Any]
+    cached: bool = False
+
+
+# ----- parsers (run in worker processes) ----- #
+
+def main_content_text(soup: BeautifulSoup, title: str) -> str:
+    """Title plus the main content area (falls back to <body>)."""
+    for element in soup(["nav", "footer", "aside", "script", "style", "header", "form"]):
+        element.decompose()
+
+    main_content = ""
+    for selector in ['main', '[role="main"]', '.main-content', '#main-content', '.content']:
+        main_elem = soup.select_one(selector)
+        if main_elem:
+            main_content = main_elem.get_text(" ", strip=True)
+            break
+    if not main_content:
+        body = soup.find('body')
+        if body:
+            main_content = body.get_text(" ", strip=True)
+
+    text = re.sub(r'\s+', ' ', main_content).strip()
+    return f"Title: {title}\n\n{text}" if title else text
+
+
+def full_page_text(soup: BeautifulSoup, title: str) -> str:
+    """Title plus all page text without navigation chrome."""
+    for element in soup(["nav", "footer", "aside", "script", "style", "header"]):
+        element.decompose()
+    text = soup.get_text(" ", strip=True)
+    return f"Title: {title}\n\n{text}" if title else text
+
+
+def nhs_page_text(soup: BeautifulSoup, title: str) -> str:
+    """All page text without nav/footer/aside, no title line (the original nhs_docs build_index output)."""
+    for element in soup(["nav", "footer", "aside", "script", "style"]):
+        element.decompose()
+    return soup.get_text(" ", strip=True)
+
+
+PARSERS: Dict[str, Callable[[BeautifulSoup, str], str]] = {
+    "main_content": main_content_text,
+    "full_page": full_page_text,
+    "nhs": nhs_page_text,
+}
+
+
+def _extract_file(path: str, parser: str, known_hash: Optional[str]) -> Tuple[str, Optional[str], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Worker: hash and parse one file. Returns (sha256, text, metadata, error);
+    text and metadata are None when the hash equals ``known_hash``.
+    """
+    try:
+        raw = pathlib.Path(path).read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        if digest == known_hash:
+            return digest, None, None, None
+        soup = BeautifulSoup(raw.decode("utf-8", errors="replace"), "lxml")
+        title_tag = soup.find('title')
+        title = title_tag.get_text(strip=True) if title_tag else ""
+        canonical = soup.find("link", rel="canonical")
+        metadata = {"page_title": title}
+        if canonical and canonical.get("href"):
+            metadata["canonical_url"] = canonical["href"]
+        return digest, PARSERS[parser](soup, title), metadata, None
+    except Exception as e:
+        return "", "", {}, f"{type(e).__name__}: {e}"
+
+
+# ----- cache ----- #
+
+class ExtractCache:
+    """SQLite cache of extracted text: (path, parser) -> (mtime, size, sha256, text, metadata)."""
+
+    def __init__(self, path: pathlib.Path):
+        self.db = sqlite3.connect(str(path))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " path TEXT NOT NULL, parser TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL,"
+            " PRIMARY KEY (path, parser))"
+        )
+
+    def get(self, path: str, parser: str) -> Optional[Tuple[int, int, str, str, Dict[str, Any]]]:
+        row = self.db.execute(
+            "SELECT mtime_ns, size, sha256, text, metadata FROM pages WHERE path = ? AND parser = ?", (path, parser)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], row[2], row[3], json.loads(row[4])
+
+    def put(self, path: str, parser: str, stat: os.stat_result, digest: str, text: str, metadata: Dict[str, Any]) -> None:
+        self.db.execute(
+            "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, parser, stat.st_mtime_ns, stat.st_size, digest, text, json.dumps(metadata)),
+        )
+
+    def touch(self, path: str, parser: str, stat: os.stat_result) -> None:
+        self.db.execute(
+            "UPDATE pages SET mtime_ns = ?, size = ? WHERE path = ? AND parser = ?",
+            (stat.st_mtime_ns, stat.st_size, path, parser),
+        )
+
+    def commit(self) -> None:
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.commit()
+        self.db.close()
+
+
+# ----- stage ----- #
+
+def extract_pages(
+    pages: Iterable[Tuple[str, pathlib.Path]],
+    parser: str = "main_content",
+    workers: int = EXTRACT_WORKERS,
+    cache_path: Optional[pathlib.Path] = EXTRACT_CACHE,
+) -> Iterator[ExtractedPage]:
+    """
+    Yield an ExtractedPage for every ``(url, html file)`` in completion
+    order: cache hits first, then pages as the process pool finishes them.
+    Pages that fail to parse are yielded with empty text.
+    """
+    cache_key = f"{parser}:v{EXTRACT_VERSION}"
+    cache = ExtractCache(cache_path) if cache_path is not None else None
+    started = time.perf_counter()
+    hits = parsed = 0
+    fresh = []  # cache hits by mtime and size
+    todo = []  # (url, path, stat, cached row) to hash and maybe parse
+
+    def finish(job, result):
+        nonlocal hits, parsed
+        url, key, stat, row = job
+        digest, text, metadata, error = result
+        if error:
+            print(f"❌ Error processing {key}: {error}")
+            return ExtractedPage(url, "", {"path": key})
+        if text is None:  # touched but identical content
+            hits += 1
+            if cache:
+                cache.touch(key, cache_key, stat)
+            return ExtractedPage(url, row[3], {**row[4], "path": key}, cached=True)
+        parsed += 1
+        if cache:
+            cache.put(key, cache_key, stat, digest, text, metadata)
+            if parsed % 50 == 0:
+                cache.commit()
+        return ExtractedPage(url, text, {**metadata, "path": key})
+
+    pooled = False
+    try:
+        for url, path in pages:
+            key = str(pathlib.Path(path).resolve())
+            stat = os.stat(key)
+            row = cache.get(key, cache_key) if cache else None
+            if row and row[0] == stat.st_mtime_ns and row[1] == stat.st_size:
+                fresh.append(ExtractedPage(url, row[3], {**row[4], "path": key}, cached=True))
+            else:
+                todo.append((url, key, stat, row))
+        pooled = workers > 1 and len(todo) >= EXTRACT_INLINE_BELOW
+
+        if not pooled:
+            for page in fresh:
+                hits += 1
+                yield page
+            for job in todo:
+                yield finish(job, _extract_file(job[1], parser, job[3][2] if job[3] else None))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Submit first so the workers parse while the cache hits are consumed
+                futures = {
+                    pool.submit(_extract_file, job[1], parser, job[3][2] if job[3] else None): job for job in todo
+                }
+                try:
+                    for page in fresh:
+                        hits += 1
+                        yield page
+                    for future in as_completed(futures):
+                        yield finish(futures[future], future.result())
+                finally:
+                    # Consumer stopped early: drop the pages nobody will read
+                    for future in futures:
+                        future.cancel()
+    finally:
+        if cache:
+            cache.close()
+        elapsed = time.perf_counter() - started
+        print(f"📄 Extracted {hits + parsed} pages ({hits} cached, {parsed} parsed) in {elapsed:.1f}s "
+              f"with {workers if pooled else 1} worker(s)")
@@ -0,0 +1,255 @@
+"""
+Upsert stage of the indexing pipeline: incremental sync with Chroma.
+
+An :class:`IndexManifest` records, per collection, every indexed URL with
+the hash of its extracted content and the ids of its chunks in Chroma, plus
+the embedding model used. :func:`sync_documents` compares a fresh set of
+documents against it and only embeds new or changed pages. It replaces the
+chunks of changed pages and deletes the chunks of pages that disappeared
+from the source, so a nightly refresh pays for the delta only.
+
+    manifest = IndexManifest.load(PERSIST_DIR, "cancer_research_docs", EMBED_MODEL)
+    report = sync_documents(docs, collection, store, manifest, embedder, keep=sitemap_urls)
+"""
+from __future__ import annotations
+import hashlib
+import json
+import pathlib
+import time
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+
+MANIFEST_VERSION = 1
+SYNC_BATCH_DOCS = 100  # documents embedded (and checkpointed in the manifest) per insert
+
+
+def content_hash(text: str, metadata: Optional[Mapping[str, Any]] = None) -> str:
+    """Stable hash of a document's text and metadata."""
+    h = hashlib.sha256(text.encode("utf-8"))
+    if metadata:
+        h.update(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+@dataclass
+class SyncPlan:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    model_changed: bool = False
+
+
+@dataclass
+class SyncReport(SyncPlan):
+    chunks_added: int = 0
+    chunks_deleted: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        model = " (embedding model changed: full re-embed)" if self.model_changed else ""
+        return (
+            f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed, "
+            f"{len(self.unchanged)} unchanged; {self.chunks_added} chunks embedded, "
+            f"{self.chunks_deleted} deleted in {self.seconds:.1f}s{model}"
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class IndexManifest:
+    """URL -> {hash, chunk_ids, embed_model, indexed_at} for one collection, stored as JSON."""
+
+    def __init__(self, path: pathlib.Path, collection: str, embed_model: str, data: Optional[Dict[str, Any]] = None):
+        self.path = pathlib.Path(path)
+        self.collection = collection
+        self.embed_model = embed_model
+        data = data or {}
+        self.indexed_model: Optional[str] = data.get("embed_model")
+        self.documents: Dict[str, Dict[str, Any]] = data.get("documents", {})
+
+    @classmethod
+    def load(cls, persist_dir: pathlib.Path, collection: str, embed_model: str) -> "IndexManifest":
+        path = pathlib.Path(persist_dir) / f"{collection}.manifest.json"
+        data = json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
+        return cls(path, collection, embed_model, data)
+
+    @property
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def save(self) -> None:
+        self.indexed_model = self.embed_model
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "version": MANIFEST_VERSION,
+            "collection": self.collection,
+            "embed_model": self.embed_model,
+            "documents": self.documents,
+        }, indent=1, sort_keys=True), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def stale_model_urls(self) -> Set[str]:
+        """URLs embedded with another model (checked per document, so an interrupted switch still finishes)."""
+        return {
+            url for url, entry in self.documents.items()
+            if entry.get("embed_model", self.indexed_model) != self.embed_model
+        }
+
+    def classify(self, url: str, digest: str, stale_model: Set[str] = frozenset()) -> str:
+        """"added", "changed" or "unchanged" for a document's current hash."""
+        entry = self.documents.get(url)
+        if entry is None:
+            return "added"
+        if url in stale_model or entry["hash"] != digest:
+            return "changed"
+        return "unchanged"
+
+    def removed(self, seen: Iterable[str], keep: Iterable[str] = ()) -> List[str]:
+        """Indexed URLs that are neither in this run nor in ``keep``."""
+        gone = set(seen) | set(keep)
+        return [url for url in self.documents if url not in gone]
+
+    def plan(self, hashes: Mapping[str, str], keep: Iterable[str] = ()) -> SyncPlan:
+        """
+        Compare current ``{url: content hash}`` with the manifest. URLs in
+        ``keep`` (e.g. pages still in the sitemap that were skipped or failed
+        this run) are never removed.
+        """
+        stale_model = self.stale_model_urls()
+        plan = SyncPlan(model_changed=bool(stale_model))
+        for url, digest in hashes.items():
+            getattr(plan, self.classify(url, digest, stale_model)).append(url)
+        plan.removed = self.removed(hashes, keep)
+        return plan
+
+    def record(self, url: str, digest: str, chunk_ids: List[str]) -> None:
+        self.documents[url] = {
+            "hash": digest, "chunk_ids": chunk_ids, "embed_model": self.embed_model, "indexed_at": time.time(),
+        }
+
+    def forget(self, url: str) -> None:
+        self.documents.pop(url, None)
+
+
+def reset_collection(client, manifest: IndexManifest) -> None:
+    """Drop a collection and forget its manifest entries (full rebuild)."""
+    print(f"♻️  Full rebuild: dropping {manifest.collection}")
+    try:
+        client.delete_collection(manifest.collection)
+    except Exception:  # collection does not exist yet
+        pass
+    manifest.documents.clear()
+    manifest.save()
+
+
+def _stale_chunk_ids(collection, manifest: IndexManifest, url: str) -> List[str]:
+    """Chunk ids currently stored for a URL (by source metadata for pre-manifest indexes)."""
+    entry = manifest.documents.get(url)
+    if entry is not None:
+        return list(entry["chunk_ids"])
+    return collection.get(where={"source": url}, include=[])["ids"]
+
+
+def sync_documents(
+    docs: Iterable[Any],
+    collection,
+    store,
+    manifest: IndexManifest,
+    embedder,
+    keep: Iterable[str] = (),
+    node_parser=None,
+    batch_docs: int = SYNC_BATCH_DOCS,
+    timings=None,
+    prune: bool = True,
+) -> SyncReport:
+    """
+    Bring ``collection`` in line with ``docs`` (LlamaIndex Documents with a
+    ``source`` URL in their metadata, as a list or a stream). Only new or
+    changed documents are chunked with ``node_parser`` (default
+    ``Settings.node_parser``), embedded with ``embedder`` (an
+    :class:`~.embedder.Embedder`) and added to ``store``. New chunks are
+    written before the old ones are deleted, and the manifest is saved after
+    every batch, so an interrupted run leaves a consistent index and resumes
+    where it stopped. ``timings`` (a :class:`~.timing.StageTimings`)
+    collects chunk / embed / upsert times.
+
+    Indexed URLs missing from ``docs`` and ``keep`` are deleted, unless
+    ``prune`` is False: pass that when the source listing is incomplete
+    (e.g. a sitemap failed to load), so its pages are not wiped.
+    """
+    if node_parser is None:
+        from llama_index.core import Settings
+        node_parser = Settings.node_parser
+    stage = timings.stage if timings is not None else (lambda name, items=0: nullcontext())
+
+    started = time.perf_counter()
+    stale_model = manifest.stale_model_urls()
+    report = SyncReport(model_changed=bool(stale_model))
+    hashes: Dict[str, str] = {}
+    pending: List[Any] = []
+
+    # A collection built before the manifest existed: adopt chunks by source URL
+    if not manifest.exists and collection.count():
+        print("⚠️  No manifest yet - existing chunks are replaced as their pages are re-indexed")
+
+    def flush() -> None:
+        if not pending:
+            return
+        batch = [doc.metadata["source"] for doc in pending]
+        with stage("chunk", len(pending)):
+            nodes = node_parser.get_nodes_from_documents(pending)
+        with stage("embed", len(nodes)):
+            embedder.embed_nodes(nodes)
+        with stage("upsert", len(nodes)):
+            stale = {url: _stale_chunk_ids(collection, manifest, url) for url in batch}
+            store.add(nodes)
+            chunk_ids: Dict[str, List[str]] = {url: [] for url in batch}
+            for node in nodes:
+                chunk_ids[node.metadata["source"]].append(node.node_id)
+            old_ids = [cid for ids in stale.values() for cid in ids]
+            if old_ids:
+                collection.delete(ids=old_ids)
+            for url in batch:
+                manifest.record(url, hashes[url], chunk_ids[url])
+            manifest.save()
+
+        report.chunks_added += len(nodes)
+        report.chunks_deleted += len(old_ids)
+        pending.clear()
+        print(f"⇢ Indexed {len(report.added) + len(report.changed)} changed documents so far ({report.chunks_added} chunks)")
+
+    # Documents may arrive as a stream (e.g. from extract.extract_pages): embed as batches fill
+    for doc in docs:
+        url = doc.metadata["source"]
+        if url in hashes:
+            continue
+        hashes[url] = content_hash(doc.text, doc.metadata)
+        status = manifest.classify(url, hashes[url], stale_model)
+        getattr(report, status).append(url)
+        if status != "unchanged":
+            pending.append(doc)
+            if len(pending) >= batch_docs:
+                flush()
+    flush()
+
+    removed = manifest.removed(hashes, keep)
+    if prune:
+        report.removed = removed
+    elif removed:
+        print(f"⚠️  Source listing incomplete: kept {len(removed)} unlisted documents")
+    with stage("upsert"):
+        for url in report.removed:
+            stale_ids = _stale_chunk_ids(collection, manifest, url)
+            if stale_ids:
+                collection.delete(ids=stale_ids)
+            report.chunks_deleted += len(stale_ids)
+            manifest.forget(url)
+        manifest.save()
+
+    report.seconds = time.perf_counter() - started
+    print(f"✅ {manifest.collection}: {report.summary()}")
+    return report
@@ -0,0 +1,198 @@
+"""
+The indexing pipeline: sources -> fetch -> extract -> chunk -> embed -> upsert.
+
+Each stage is its own module and runs in parallel where it can:
+- fetch: async, rate-limited crawler (crawler.py)
+- extract: process pool (extract.py)
+- embed: concurrent batched requests (embedder.py)
+
+Extracted pages stream straight into chunking, embedding and the
+incremental Chroma upsert (manifest.py), and every stage is timed. A run
+is driven by one :class:`~.config.IndexConfig` per collection. Stages can
+be swapped by passing a different source, embedder, Chroma client or node
+parser to :class:`Pipeline`.
+"""
+from __future__ import annotations
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import IndexConfig
+from .crawler import crawl, summarise
+from .embedder import Embedder
+from .extract import EXTRACT_CACHE, EXTRACT_WORKERS, ExtractedPage, extract_pages
+from .manifest import IndexManifest, SyncReport, reset_collection, sync_documents
+from .sources import SOURCES, Listing, Source
+from .timing import StageTimings
+
+
+class KeywordFilter:
+    """Relevance filter: categories and keywords in the URL, or keywords in the title / opening text."""
+
+    def __init__(self, categories: List[str], keywords: List[str], sample_chars: int = 1000):
+        self.categories = [c.lower() for c in categories]
+        self.keywords = [k.lower() for k in keywords]
+        self.sample_chars = sample_chars
+
+    @property
+    def active(self) -> bool:
+        return bool(self.categories or self.keywords)
+
+    def matches(self, url: str, title: str = "", content: str = "") -> bool:
+        url, title, content = url.lower(), title.lower(), content.lower()
+        if any(c in url for c in self.categories):
+            return True
+        return any(k in url or k in title or k in content for k in self.keywords)
+
+    def __call__(self, page: ExtractedPage) -> bool:
+        if not self.active or self.matches(page.url):
+            return True
+        return self.matches(page.url, page.metadata.get("page_title", ""), page.text[:self.sample_chars])
+
+
+@dataclass
+class PipelineResult:
+    collection: str
+    listed: int = 0
+    documents: int = 0
+    filtered_out: int = 0
+    failed_urls: List[str] = field(default_factory=list)
+    crawl: Dict[str, int] = field(default_factory=dict)
+    report: Optional[SyncReport] = None
+    final_count: int = 0
+    timings: StageTimings = field(default_factory=StageTimings)
+
+    @property
+    def processed(self) -> int:
+        if self.report is None:
+            return 0
+        return len(self.report.added) + len(self.report.changed) + len(self.report.unchanged)
+
+    def stats(self, embed_report: str = "") -> Dict[str, Any]:
+        """processing_stats.json layout (keys kept from the original indexer)."""
+        return {
+            "total_urls_found": self.listed,
+            "relevant_urls_found": self.documents,
+            "successfully_processed": self.processed,
+            "failed_urls": self.failed_urls,
+            "final_embedded_count": self.final_count,
+            "crawl": self.crawl,
+            "index_changes": self.report.as_dict() if self.report else {},
+            "embedding_throughput": embed_report,
+            "stage_timings": self.timings.as_dict(),
+            "timestamp": time.time(),
+        }
+
+
+class Pipeline:
+    def __init__(
+        self,
+        config: IndexConfig,
+        *,
+        source: Optional[Source] = None,
+        embedder: Optional[Embedder] = None,
+        chroma_client=None,
+        node_parser=None,
+    ):
+        self.config = config
+        if source is None and config.source.type not in SOURCES:
+            raise ValueError(f"Unknown source type {config.source.type!r} (known: {', '.join(SOURCES)})")
+        self.source = source or SOURCES[config.source.type]
+        self.embedder = embedder
+        self.chroma_client = chroma_client
+        self.node_parser = node_parser
+        self.filter = KeywordFilter(config.filter.categories, config.filter.keywords, config.filter.sample_chars)
+
+    # ----- stages ----- #
+
+    def _fetch(self, listing: Listing, result: PipelineResult) -> List[tuple]:
+        cfg = self.config
+        urls = sorted(listing.urls)
+        pages = list(listing.pages)
+        if cfg.source.max_pages is not None and len(urls) + len(pages) > cfg.source.max_pages:
+            print(f"⚠️  Reached maximum page limit ({cfg.source.max_pages})")
+            pages = pages[:cfg.source.max_pages]
+            urls = urls[:max(0, cfg.source.max_pages - len(pages))]
+        if urls:
+            with result.timings.stage("fetch", len(urls)):
+                results = asyncio.run(crawl(urls, cfg.html_dir, **cfg.fetch.crawl_kwargs()))
+            result.crawl = summarise(results)
+            result.failed_urls = sorted(r.url for r in results if not r.ok)
+            pages += sorted((r.url, r.path) for r in results if r.ok)
+        return pages
+
+    def _documents(self, pages: List[tuple], result: PipelineResult) -> Iterator[Any]:
+        """Extract (timed, in parallel), filter and wrap pages as LlamaIndex Documents."""
+        from llama_index.core import Document
+
+        cfg = self.config
+        extracted = extract_pages(
+            pages, parser=cfg.extract.parser, workers=cfg.extract.workers or EXTRACT_WORKERS,
+            cache_path=cfg.extract.cache_path or EXTRACT_CACHE,
+        )
+        for page in result.timings.timed("extract", extracted):
+            url = page.url
+            if url.startswith("file:"):  # local corpus: index under the page's canonical URL
+                url = page.metadata.get("canonical_url", url)
+            if not page.text.strip():
+                result.failed_urls.append(url)
+                continue
+            if not self.filter(page._replace(url=url)):
+                result.filtered_out += 1
+                continue
+            metadata: Dict[str, Any] = {"source": url}
+            if cfg.url_title:
+                metadata["title"] = url.split('/')[-1] if url.split('/')[-1] else url
+            metadata.update(cfg.metadata)
+            result.documents += 1
+            yield Document(text=page.text, metadata=metadata)
+
+    # ----- run ----- #
+
+    def run(self, full: bool = False) -> PipelineResult:
+        from chromadb import PersistentClient
+        from llama_index.core.node_parser import SentenceSplitter
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        cfg = self.config
+        result = PipelineResult(cfg.collection)
+        print(f"🚀 Indexing {cfg.collection} from {cfg.source.type} source")
+
+        with result.timings.stage("sources"):
+            listing = self.source(cfg)
+        result.listed = len(listing.urls) + len(listing.pages)
+        result.timings.items["sources"] += result.listed
+        if not result.listed:
+            print("❌ No pages found")
+            return result
+        pages = self._fetch(listing, result)
+
+        client = self.chroma_client or PersistentClient(path=str(cfg.persist_dir))
+        manifest = IndexManifest.load(cfg.persist_dir, cfg.collection, cfg.embed.model)
+        if full:
+            reset_collection(client, manifest)
+        collection = client.get_or_create_collection(cfg.collection)
+        store = ChromaVectorStore(chroma_collection=collection, stores_text=True)
+        embedder = self.embedder or Embedder(cfg.embed.model, **cfg.embed.embedder_kwargs())
+        node_parser = self.node_parser or SentenceSplitter(
+            chunk_size=cfg.chunk.chunk_size, chunk_overlap=cfg.chunk.chunk_overlap
+        )
+
+        # Listed URLs keep their chunks even when skipped or failed this run;
+        # only pages gone from a complete listing are deleted
+        result.report = sync_documents(
+            self._documents(pages, result), collection, store, manifest, embedder,
+            keep=listing.urls, node_parser=node_parser, timings=result.timings, prune=listing.complete,
+        )
+        result.final_count = collection.count()
+
+        print(f"✅ {cfg.collection}: {result.documents} documents ({result.filtered_out} filtered out, "
+              f"{len(result.failed_urls)} failed), {result.final_count} chunks in the collection")
+        print(f"⇢ Embedding throughput: {embedder.stats.report()}")
+        print(f"⏱️  Stage timings:\n{result.timings.report()}")
+        if cfg.stats_file is not None:
+            cfg.stats_file.write_text(json.dumps(result.stats(embedder.stats.report()), indent=2))
+            print(f"📊 Statistics saved to: {cfg.stats_file}")
+        return result
@@ -0,0 +1,116 @@
+"""
+Source stage of the indexing pipeline: where pages come from.
+
+A source turns an :class:`~.config.IndexConfig` into a :class:`Listing` of
+URLs to fetch and/or pages already on disk. A listing that may be missing
+pages (e.g. one sitemap failed to load) is marked incomplete, and the
+upsert stage then deletes nothing. Register new source types with
+:func:`register_source`.
+"""
+from __future__ import annotations
+import pathlib
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, List, Set, Tuple
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+from .crawler import CRAWL_TIMEOUT
+
+if TYPE_CHECKING:
+    from .config import IndexConfig
+
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+@dataclass
+class Listing:
+    urls: List[str] = field(default_factory=list)  # to fetch
+    pages: List[Tuple[str, pathlib.Path]] = field(default_factory=list)  # (url, local html file)
+    complete: bool = True  # False: pages missing from the listing may still exist
+
+
+Source = Callable[["IndexConfig"], Listing]
+SOURCES: Dict[str, Source] = {}
+
+
+def register_source(name: str) -> Callable[[Source], Source]:
+    def decorator(fn: Source) -> Source:
+        SOURCES[name] = fn
+        return fn
+    return decorator
+
+
+def _allowed(url: str, domains: List[str]) -> bool:
+    host = urlparse(url).netloc.lower()
+    return not domains or any(host == d or host.endswith("." + d) for d in domains)
+
+
+def _html_sitemap_urls(sitemap_url: str, body: bytes) -> Set[str]:
+    from bs4 import BeautifulSoup
+
+    urls = set()
+    for link in BeautifulSoup(body, "html.parser").find_all("a", href=True):
+        href = link["href"]
+        if href.startswith("/") or href.startswith("http"):
+            urls.add(urljoin(sitemap_url, href))
+    return urls
+
+
+def _xml_sitemap_urls(client: httpx.Client, body: bytes, failed: List[str], depth: int = 0) -> Set[str]:
+    root = ET.fromstring(body)
+    urls = {loc.text.strip() for loc in root.iter() if loc.tag in (f"{SITEMAP_NS}loc", "loc") and loc.text}
+    # A sitemap index lists further sitemaps rather than pages
+    if root.tag in (f"{SITEMAP_NS}sitemapindex", "sitemapindex") and depth < 2:
+        nested = set()
+        for child in urls:
+            try:
+                resp = client.get(child)
+                resp.raise_for_status()
+                nested |= _xml_sitemap_urls(client, resp.content, failed, depth + 1)
+            except (httpx.HTTPError, ET.ParseError) as e:
+                print(f"❌ Error reading nested sitemap {child}: {e}")
+                failed.append(child)
+        return nested
+    return urls
+
+
+@register_source("sitemap")
+def sitemap_source(config) -> Listing:
+    """Pages linked from HTML sitemaps or listed in XML sitemaps (``source.urls``)."""
+    found: Set[str] = set()
+    failed: List[str] = []
+    with httpx.Client(timeout=config.fetch.timeout or CRAWL_TIMEOUT, follow_redirects=True) as client:
+        for sitemap_url in config.source.urls:
+            print(f"🔍 Extracting URLs from sitemap: {sitemap_url}")
+            try:
+                resp = client.get(sitemap_url)
+                resp.raise_for_status()
+                if sitemap_url.endswith(".xml") or "xml" in resp.headers.get("content-type", ""):
+                    urls = _xml_sitemap_urls(client, resp.content, failed)
+                else:
+                    urls = _html_sitemap_urls(sitemap_url, resp.content)
+            except (httpx.HTTPError, ET.ParseError) as e:
+                print(f"❌ Error extracting URLs from sitemap {sitemap_url}: {e}")
+                failed.append(sitemap_url)
+                continue
+            urls = {u for u in urls if _allowed(u, config.source.allowed_domains)}
+            print(f"📊 Found {len(urls)} URLs in {sitemap_url}")
+            found |= urls
+    if failed:
+        print(f"⚠️  {len(failed)} sitemap(s) could not be read - no pages will be removed from the index this run")
+    return Listing(urls=sorted(found), complete=not failed)
+
+
+@register_source("urls")
+def url_list_source(config) -> Listing:
+    """A fixed list of page URLs (``source.urls``)."""
+    return Listing(urls=list(dict.fromkeys(config.source.urls)))
+
+
+@register_source("html_dir")
+def html_dir_source(config) -> Listing:
+    """Every ``*.html`` file under ``source.path``; the page's canonical URL becomes its source."""
+    root = pathlib.Path(config.source.path)
+    return Listing(pages=[(p.resolve().as_uri(), p) for p in sorted(root.glob("*.html"))])
@@ -0,0 +1,55 @@
+"""Per-stage wall-clock timings for the indexing pipeline."""
+from __future__ import annotations
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+STAGE_ORDER = ("sources", "fetch", "extract", "chunk", "embed", "upsert")
+
+
+class StageTimings:
+    """
+    Seconds and item counts per stage. Streaming stages are timed with
+    :meth:`timed`, which only counts the time spent producing each item, so
+    the time a downstream stage spends on the item is not charged twice.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = defaultdict(float)
+        self.items: Counter = Counter()
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+            self.items[name] += items
+
+    def timed(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.seconds[name] += time.perf_counter() - start
+                return
+            self.seconds[name] += time.perf_counter() - start
+            self.items[name] += 1
+            yield item
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        names = [n for n in STAGE_ORDER if n in self.seconds] + [n for n in self.seconds if n not in STAGE_ORDER]
+        return {n: {"seconds": round(self.seconds[n], 3), "items": self.items[n]} for n in names}
+
+    def report(self) -> str:
+        lines = []
+        for name, entry in self.as_dict().items():
+            rate = f", {entry['items'] / entry['seconds']:.1f}/s" if entry["items"] and entry["seconds"] else ""
+            lines.append(f"   {name:<8} {entry['seconds']:8.2f}s  {entry['items']:>6} items{rate}")
+        return "\n".join(lines)
@@ -8,8 +8,8 @@ import sys
 import time
 from pathlib import Path
 
-# Add the current directory to Python path
-sys.path.append(str(Path(__file__).parent))
+# Add the backend directory to Python path so rag.indexing is importable
+sys.path.append(str(Path(__file__).parent.parent))
 
 def main():
     """Run the Cancer Research UK indexing process."""
@@ -17,11 +17,11 @@ def main():
     print("=" * 50)
     
     try:
-        # Import and run the advanced indexer
-        from advanced_cancer_indexer import main as run_indexing
+        # Import and run the indexing pipeline for the Cancer Research UK collection
+        from rag.indexing.cli import main as run_indexing
         
         start_time = time.time()
-        run_indexing()
+        run_indexing(["cancer_research_docs"])
         end_time = time.time()
         
         duration = end_time - start_time
@@ -9,8 +9,8 @@ import time
 from pathlib import Path
 from chromadb import PersistentClient
 
-# Add the current directory to Python path
-sys.path.append(str(Path(__file__).parent))
+# Add the backend directory to Python path so rag.indexing is importable
+sys.path.append(str(Path(__file__).parent.parent))
 
 def test_indexing():
     """Test the Cancer Research UK indexing process."""
@@ -18,12 +18,12 @@ def test_indexing():
     print("=" * 50)
     
     try:
-        # Import and run the advanced indexer
-        from advanced_cancer_indexer import main as run_indexing
+        # Import and run the indexing pipeline for the Cancer Research UK collection
+        from rag.indexing.cli import main as run_indexing
         
         print("🚀 Starting indexing process...")
         start_time = time.time()
-        run_indexing()
+        run_indexing(["cancer_research_docs"])
         end_time = time.time()
         
         duration = end_time - start_time
@@ -86,9 +86,8 @@ def test_rag_integration():
     print("\n🔍 Testing RAG integration...")
     
     try:
-        # Import the RAG service
-        sys.path.append(str(Path(__file__).parent.parent / "app" / "services"))
-        from rag import get_rag_context_weighted
+        # Import the RAG service (``rag`` is already the backend/rag package here)
+        from app.services.rag import get_rag_context_weighted
         
         # Test queries
         test_queries = [
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Tests for the streaming analytics export (NDJSON, CSV, Arrow, Parquet)."""
+
+import sys
+import os
+import asyncio
+import csv
+import io
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require an API key; the models only need a database URL
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import Settings
+from app.db.models import Base, ChatSession, Message, User, create_db_engine
+from app.services import analytics
+
+ANSWERS = 5
+
+async def _export(fmt):
+    """(chunks, columns) of the answered-questions export over a small database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(Settings(openai_api_key="test", database_url=f"sqlite+aiosqlite:///{tmp}/export.db"))
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(User.__table__.insert().values(id=1, email="qa@example.com", hashed_pw="x", country="UK"))
+                await conn.execute(ChatSession.__table__.insert().values(id=1, user_id=1))
+                await conn.execute(Message.__table__.insert(), [
+                    {"id": i, "session_id": 1, "role": "assistant", "content": f"answer {i}",
+                     "user_question": f"question {i}", "category": "Cancer", "confidence_score": i / 10,
+                     "sources": [f"https://example.org/{i}"] if i % 2 else None}
+                    for i in range(1, ANSWERS + 1)
+                ])
+            query = analytics.answered_query([]).order_by(Message.id)
+            async with AsyncSession(engine) as db:
+                chunks = [chunk async for chunk in analytics.stream_export(db, query, fmt)]
+            return chunks, analytics._export_columns(query)
+        finally:
+            await engine.dispose()
+
+def _run(fmt):
+    analytics.EXPORT_CHUNK_ROWS, saved = 2, analytics.EXPORT_CHUNK_ROWS
+    try:
+        return asyncio.run(_export(fmt))
+    finally:
+        analytics.EXPORT_CHUNK_ROWS = saved
+
+def test_ndjson_streams_one_chunk_per_partition():
+    chunks, columns = _run("ndjson")
+    assert len(chunks) == 3  # 5 rows, 2 per partition
+    rows = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+    assert [r["question"] for r in rows] == [f"question {i}" for i in range(1, ANSWERS + 1)]
+    assert set(rows[0]) == set(columns) and "id" not in rows[0]
+    assert rows[0]["sources"] == ["https://example.org/1"] and rows[1]["sources"] is None
+    assert rows[0]["country"] == "UK" and isinstance(rows[0]["created_at"], str)
+
+def test_csv_has_one_header():
+    chunks, columns = _run("csv")
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == ANSWERS and list(rows[0]) == columns
+    assert json.loads(rows[0]["sources"]) == ["https://example.org/1"]
+    assert float(rows[2]["rag_score"]) == 0.3
+
+def test_arrow_and_parquet_round_trip():
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    chunks, columns = _run("arrow")
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.num_rows == ANSWERS and table.column_names == columns
+    assert table.schema.field("sources").type == pa.list_(pa.string())
+    assert table.column("sources").to_pylist()[:2] == [["https://example.org/1"], []]
+    assert table.column("session_id").to_pylist() == [1] * ANSWERS
+
+    chunks, _ = _run("parquet")
+    table = pq.read_table(io.BytesIO(b"".join(chunks)))
+    assert table.num_rows == ANSWERS and table.column("rag_score").to_pylist()[-1] == 0.5
+
+if __name__ == "__main__":
+    test_ndjson_streams_one_chunk_per_partition()
+    test_csv_has_one_header()
+    test_arrow_and_parquet_round_trip()
+    print("✅ Analytics export tests passed")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Tests for the analytics rollup key helpers and the incremental refresh."""
+
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require an API key; the models only need a database URL
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import Settings
+from app.db.models import AnalyticsRollup, Base, ChatSession, Message, User, create_db_engine
+from app.services.analytics import age_band, refresh_rollups, score_bucket, _reason_key
+
+def test_age_band_at_message_time():
+    """Age is measured on the message date, birthdays included."""
+    assert age_band("2000-06-15", datetime(2030, 6, 14)) == "18-29"
+    assert age_band("2000-06-15", datetime(2030, 6, 15)) == "30-44"
+    assert age_band("1940-01-01", datetime(2025, 1, 1)) == "75+"
+    assert age_band(None, datetime(2025, 1, 1)) == "Unknown"
+    assert age_band("not a date", datetime(2025, 1, 1)) == "Unknown"
+
+def test_score_buckets_and_reasons():
+    assert score_bucket(0.0) == 0
+    assert score_bucket(0.35) == 3
+    assert score_bucket(1.0) == 9
+    assert _reason_key("system_error: timed out") == "system_error"
+    assert _reason_key(None) == "Unknown"
+
+def test_concurrent_refreshes_fold_each_row_once():
+    """Two refreshes racing on the same rows neither fail nor double-count."""
+    async def run(tmp):
+        engine = create_db_engine(Settings(openai_api_key="test", database_url=f"sqlite+aiosqlite:///{tmp}/rollups.db"))
+        old = datetime.utcnow() - timedelta(hours=1)
+
+        async def add_answers(first_id, count, created_at):
+            async with engine.begin() as conn:
+                await conn.execute(Message.__table__.insert(), [
+                    {"id": i, "session_id": 1, "role": "assistant", "content": "answer",
+                     "category": "Cancer", "confidence_score": 0.8, "created_at": created_at}
+                    for i in range(first_id, first_id + count)
+                ])
+
+        async def refresh():
+            async with AsyncSession(engine) as db:
+                return await refresh_rollups(db)
+
+        async def total():
+            async with AsyncSession(engine) as db:
+                rollups = (await db.execute(select(AnalyticsRollup).where(AnalyticsRollup.kind == "answered"))).scalars().all()
+                return sum(r.count for r in rollups), sum(sum(r.score_hist) for r in rollups)
+
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(User.__table__.insert().values(id=1, email="qa@example.com", hashed_pw="x"))
+                await conn.execute(ChatSession.__table__.insert().values(id=1, user_id=1))
+            await add_answers(1, 20, old)
+            # Not yet settled: a lower id could still be committing
+            await add_answers(21, 1, datetime.utcnow())
+
+            results = await asyncio.gather(refresh(), refresh())
+            assert sorted(r["messages"] for r in results) == [0, 20]
+            assert await total() == (20, 20)
+
+            # New rows land in the existing rollup row (the upsert's update path)
+            await add_answers(22, 5, old)
+            assert (await refresh())["messages"] == 5
+            assert await total() == (25, 25)
+        finally:
+            await engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+if __name__ == "__main__":
+    test_age_band_at_message_time()
+    test_score_buckets_and_reasons()
+    test_concurrent_refreshes_fold_each_row_once()
+    print("✅ Analytics rollup tests passed")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Tests for the semantic answer cache."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.answer_cache import SemanticAnswerCache, context_key
+
+def test_threshold_and_context_partition():
+    """Near-duplicates hit; less similar questions and other user contexts miss."""
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store([1.0, 0.0], "", "Migraine answer", ["nhs.uk/migraine"], {"is_medical": True})
+
+    response, sources, metadata, similarity = cache.lookup([0.99, 0.05], "")
+    assert response == "Migraine answer" and sources == ["nhs.uk/migraine"] and metadata["is_medical"]
+    assert similarity >= 0.95
+    assert cache.lookup([0.8, 0.6], "") is None  # cosine 0.8
+    assert cache.lookup([1.0, 0.0], context_key("I take metformin")) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["items"] == 1
+    assert context_key(None) == "" and context_key("a") != context_key("b")
+
+def test_entries_expire_after_ttl():
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    cache.store([1.0, 0.0], "", "old answer", [], {})
+    assert cache.lookup([1.0, 0.0], "") is not None
+
+    cache._entries[0].created_at -= 61
+    assert cache.lookup([1.0, 0.0], "") is None
+    assert cache.stats()["items"] == 0
+
+def test_new_index_version_drops_the_cache():
+    """Re-indexing the collections invalidates every stored answer."""
+    cache = SemanticAnswerCache()
+    cache.store([1.0, 0.0], "", "answer from v1", [], {}, index_version=1)
+    assert cache.lookup([1.0, 0.0], "", index_version=1) is not None
+
+    assert cache.lookup([1.0, 0.0], "", index_version=2) is None
+    stats = cache.stats()
+    assert stats["invalidations"] == 1 and stats["items"] == 0
+
+    cache.store([1.0, 0.0], "", "answer from v2", [], {}, index_version=2)
+    cache.invalidate()
+    assert cache.lookup([1.0, 0.0], "", index_version=2) is None
+
+if __name__ == "__main__":
+    test_threshold_and_context_partition()
+    test_entries_expire_after_ttl()
+    test_new_index_version_drops_the_cache()
+    print("✅ Answer cache tests passed")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Tests for the answer pipeline: retrieval time budget, embedding per turn and failed GPT-4o streams."""
+
+import sys
+import os
+import asyncio
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the module-level Chroma client and embedding cache out of backend/rag
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["RAG_INDEX_DIR"] = os.path.join(_tmp, "chroma_db")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmp, "embedding_cache.sqlite3")
+
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from app.services import rag
+from app.services.categorization import Classification
+from app.services.local_classifier import LocalMedicalClassifier
+
+QUESTION = "What are the symptoms of bowel cancer?"
+
+async def _fake_embed(queries):
+    return {q: [1.0, 0.0, 0.0] for q in queries if q}
+
+async def _no_retrieval(query, history=None, **kwargs):
+    return None, 0.0, []
+
+def _stream(*tokens, fail=False):
+    async def fake(*args, **kwargs):
+        for token in tokens:
+            yield token
+        if fail:
+            raise RuntimeError("connection reset")
+    return fake
+
+def _run(stream):
+    """Collect astream_answer events with GPT-4o, embeddings and retrieval replaced."""
+    patched = {"astream_response_with_gpt4o": stream, "aembed_queries": _fake_embed,
+               "aget_rag_context_weighted": _no_retrieval}
+    originals = {name: getattr(rag, name) for name in patched}
+
+    async def collect():
+        return [event async for event in rag.astream_answer(
+            QUESTION, classification=Classification(is_medical=True, category="Symptoms & Diagnosis"),
+        )]
+    try:
+        for name, fake in patched.items():
+            setattr(rag, name, fake)
+        return asyncio.run(collect())
+    finally:
+        for name, original in originals.items():
+            setattr(rag, name, original)
+
+def test_slow_collection_is_dropped_after_timeout():
+    """A collection past its budget maps to None; the others are still merged."""
+    timeout = 0.3
+    nhs_node = NodeWithScore(node=TextNode(text="Migraine is a headache.", metadata={"source": "https://www.nhs.uk/migraine"}), score=0.9)
+
+    def fake_search(collection, query, retrieve_only=True, embedding=None):
+        if collection == "cancer_research":
+            time.sleep(timeout * 4)
+            return []
+        return [nhs_node]
+
+    original = rag._search_collection
+    rag._search_collection = fake_search
+    try:
+        for retrieve in (
+            lambda: rag.retrieve_concurrently([QUESTION], timeout=timeout),
+            lambda: asyncio.run(rag.aretrieve_concurrently([QUESTION], timeout=timeout)),
+        ):
+            start = time.monotonic()
+            searches = retrieve()
+            assert time.monotonic() - start < timeout + 0.2
+            assert searches[("cancer_research", QUESTION)] is None
+            assert searches[("nhs", QUESTION)] == [nhs_node]
+
+            context, score, sources = rag.merge_search_results(searches, QUESTION)
+            assert "Migraine is a headache." in context
+            assert abs(score - 0.8 * 0.9) < 1e-9  # primary weight, no contextual query
+            assert sources == ["https://www.nhs.uk/migraine"]
+    finally:
+        rag._search_collection = original
+
+def test_stream_failure_after_first_token_is_not_cached():
+    rag.answer_cache.invalidate()
+    events = _run(_stream("Common symptoms include ", fail=True))
+    final = events[-1]["data"]
+    assert events[-1]["event"] == "final"
+    assert final["metadata"]["error"] is True
+    assert final["response"].startswith("Common symptoms include ")
+    assert rag.GENERATION_ERROR_MESSAGE in final["response"]
+    tokens = "".join(e["data"]["text"] for e in events if e["event"] == "token")
+    assert rag.GENERATION_ERROR_MESSAGE in tokens
+    assert rag.answer_cache.stats()["items"] == 0
+
+def test_complete_stream_is_cached():
+    rag.answer_cache.invalidate()
+    events = _run(_stream("Common symptoms include ", "bleeding."))
+    final = events[-1]["data"]
+    assert "error" not in final["metadata"]
+    assert rag.GENERATION_ERROR_MESSAGE not in final["response"]
+    assert rag.answer_cache.stats()["items"] == 1
+
+def test_turn_with_history_embeds_once():
+    """Question and contextual query share one embedding call, reused by retrieval."""
+    calls = []
+
+    async def counting_embed(queries):
+        calls.append(list(queries))
+        return await _fake_embed(queries)
+
+    history = [{"role": "user", "content": "I keep waking up at night"},
+               {"role": "assistant", "content": "That sounds tiring."}]
+    question = "Could that be related to my thyroid?"  # no rule matches: centroid tier
+    classifier = LocalMedicalClassifier(
+        embed=lambda texts: {t: [1.0, 0.0, 0.0] if t == "medical seed" else [0.0, 1.0, 0.0] for t in texts},
+        examples={True: ["medical seed"], False: ["general seed"]},
+    )
+    originals = (rag.aembed_queries, rag.medical_classifier)
+    rag.aembed_queries, rag.medical_classifier = counting_embed, classifier
+    try:
+        plan = asyncio.run(rag._aplan_answer(
+            rag.build_contextual_query(question, history), history, question, None, None,
+        ))
+    finally:
+        rag.aembed_queries, rag.medical_classifier = originals
+    assert plan["is_medical"] and classifier.centroid_hits == 1
+    assert calls == [rag.turn_queries(question, history)]
+    assert set(plan["query_embeddings"]) == set(rag.turn_queries(question, history))
+
+if __name__ == "__main__":
+    test_slow_collection_is_dropped_after_timeout()
+    test_turn_with_history_embeds_once()
+    test_stream_failure_after_first_token_is_not_cached()
+    test_complete_stream_is_cached()
+    print("✅ Answer pipeline tests passed")
@@ -5,7 +5,25 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app.services.categorization import categorize_question, get_available_categories, get_base_categories
+from app.services.categorization import (
+    categorize_question,
+    get_available_categories,
+    get_base_categories,
+    parse_classification,
+)
+
+def test_parse_classification():
+    """Test validation of the unified classifier's JSON output."""
+    medical = parse_classification('{"is_medical": true, "category": "Symptoms & Diagnosis", "condition": "Diabetes"}')
+    assert medical.is_medical
+    assert medical.label == "Symptoms & Diagnosis, Diabetes"
+
+    general = parse_classification('{"is_medical": false, "category": "Treatment & Medication", "condition": "x"}')
+    assert not general.is_medical
+    assert general.label == "General"
+
+    unexpected = parse_classification('{"is_medical": true, "category": "Other", "condition": null}')
+    assert unexpected.label == "Symptoms & Diagnosis"
 
 def test_categorization():
     """Test the categorization function with various questions."""
@@ -46,4 +64,5 @@ def test_categorization():
             print()
 
 if __name__ == "__main__":
+    test_parse_classification()
     test_categorization() 
\ No newline at end of file
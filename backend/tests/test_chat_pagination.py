@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Tests for keyset pagination of the chat session and message endpoints."""
+
+import sys
+import os
+import asyncio
+import tempfile
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the RAG service's module-level Chroma client and caches out of backend/rag
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["RAG_INDEX_DIR"] = os.path.join(_tmp, "chroma_db")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmp, "embedding_cache.sqlite3")
+
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1 import chat
+from app.core.config import Settings
+from app.db.models import Base, ChatSession, Message, User, create_db_engine
+
+USER = SimpleNamespace(id=1)
+
+async def _with_db(check):
+    engine = create_db_engine(Settings(openai_api_key="test", database_url=f"sqlite+aiosqlite:///{_tmp}/chat.db"))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(User.__table__.insert().values(id=1, email="qa@example.com", hashed_pw="x"))
+            await conn.execute(ChatSession.__table__.insert(), [{"id": i, "user_id": 1} for i in range(1, 6)])
+            await conn.execute(Message.__table__.insert(), [
+                {"id": i, "session_id": 1, "role": "user" if i % 2 else "assistant", "content": f"message {i}"}
+                for i in range(1, 11)
+            ])
+        async with AsyncSession(engine) as db:
+            await check(db)
+    finally:
+        await engine.dispose()
+
+def test_forward_paging_from_after_id_skips_nothing():
+    async def check(db):
+        seen, cursor = [], 3
+        while cursor is not None:
+            response = Response()
+            page = await chat.get_session_messages(1, response, after_id=cursor, limit=3, db=db, user=USER)
+            seen += [m.id for m in page]
+            cursor = response.headers.get("X-Next-Cursor")
+            cursor = int(cursor) if cursor else None
+        assert seen == [4, 5, 6, 7, 8, 9, 10]
+
+        # Backward paging from the newest page is unchanged
+        response = Response()
+        page = await chat.get_session_messages(1, response, limit=3, db=db, user=USER)
+        assert [m.id for m in page] == [8, 9, 10] and response.headers["X-Next-Cursor"] == "8"
+    asyncio.run(_with_db(check))
+
+def test_sessions_unbounded_without_limit():
+    async def check(db):
+        response = Response()
+        sessions = await chat.get_chat_sessions(response, limit=None, db=db, user=USER)
+        assert len(sessions) == 5 and "X-Next-Cursor" not in response.headers
+
+        response = Response()
+        sessions = await chat.get_chat_sessions(response, limit=2, db=db, user=USER)
+        assert len(sessions) == 2 and response.headers["X-Next-Cursor"] == str(sessions[-1]["id"])
+    asyncio.run(_with_db(check))
+
+if __name__ == "__main__":
+    test_forward_paging_from_after_id_skips_nothing()
+    test_sessions_unbounded_without_limit()
+    print("✅ Chat pagination tests passed")
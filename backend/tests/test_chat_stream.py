@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Tests for the /chat/stream SSE route: event order and the rows saved per turn."""
+
+import sys
+import os
+import asyncio
+import json
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the RAG service's module-level Chroma client and caches out of backend/rag
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["RAG_INDEX_DIR"] = os.path.join(_tmp, "chroma_db")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmp, "embedding_cache.sqlite3")
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.v1 import chat
+from app.core.config import Settings
+from app.db.models import Base, Message, UnansweredQuery, User, create_db_engine
+from app.services.auth import get_current_user
+
+USER = User(id=1, email="qa@example.com", hashed_pw="x", consent_to_data_storage=False)
+TOKENS = ["Migraines ", "are ", "headaches."]
+
+async def _fake_stream(*args, **kwargs):
+    yield {"event": "status", "data": {"stage": "classified", "is_medical": True}}
+    yield {"event": "sources", "data": {"sources": [], "used_rag": True, "rag_score": 0.9}}
+    for token in TOKENS:
+        yield {"event": "token", "data": {"text": token}}
+    yield {"event": "final", "data": {"response": "".join(TOKENS), "sources": [],
+                                      "metadata": {"is_medical": True, "used_rag": True, "rag_score": 0.9}}}
+
+async def _no_classification(message):
+    return None
+
+async def _with_db(check):
+    """Run ``check(sessionmaker)`` with the route's SessionLocal, RAG and classifier stubbed."""
+    engine = create_db_engine(Settings(openai_api_key="test", database_url=f"sqlite+aiosqlite:///{_tmp}/stream.db"))
+    patched = {"SessionLocal": async_sessionmaker(engine, expire_on_commit=False),
+               "astream_answer": _fake_stream, "aclassify_question": _no_classification}
+    originals = {name: getattr(chat, name) for name in patched}
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(User.__table__.insert().values(id=1, email="qa@example.com", hashed_pw="x"))
+        for name, fake in patched.items():
+            setattr(chat, name, fake)
+        await check(patched["SessionLocal"])
+    finally:
+        for name, original in originals.items():
+            setattr(chat, name, original)
+        await engine.dispose()
+
+def _events(raw: str):
+    events = []
+    for block in raw.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+def test_stream_route_event_order_and_saved_rows():
+    async def check(sessions):
+        app = FastAPI()
+        app.include_router(chat.router, prefix="/api/v1")
+        app.dependency_overrides[get_current_user] = lambda: USER
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/api/v1/chat/stream", json={"message": "What is a migraine?"})
+        assert response.status_code == 200
+        events = _events(response.text)
+        assert [name for name, _ in events] == ["session", "status", "sources", "token", "token", "token", "done"]
+        assert "".join(data["text"] for name, data in events if name == "token") == events[-1][1]["response"]
+
+        async with sessions() as db:
+            rows = (await db.execute(select(Message).order_by(Message.id))).scalars().all()
+        assert [(m.role, m.content) for m in rows] == [("user", "What is a migraine?"), ("assistant", "".join(TOKENS))]
+    asyncio.run(_with_db(check))
+
+def test_disconnect_mid_stream_saves_an_interrupted_turn():
+    """Closing the stream after the first token keeps the question and the partial reply."""
+    async def check(sessions):
+        response = await chat.chat_stream(chat.ChatIn(message="What is a migraine?"), user=USER)
+        stream = response.body_iterator
+        async for chunk in stream:
+            if chunk.startswith("event: token"):
+                break
+        await stream.aclose()
+
+        async with sessions() as db:
+            rows = (await db.execute(select(Message).order_by(Message.id))).scalars().all()
+            unanswered = (await db.execute(select(UnansweredQuery))).scalars().all()
+        assert [(m.role, m.content) for m in rows] == [("user", "What is a migraine?"), ("assistant", TOKENS[0])]
+        assert [q.reason for q in unanswered] == ["interrupted"]
+    asyncio.run(_with_db(check))
+
+if __name__ == "__main__":
+    test_stream_route_event_order_and_saved_rows()
+    test_disconnect_mid_stream_saves_an_interrupted_turn()
+    print("✅ Chat stream tests passed")
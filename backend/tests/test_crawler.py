@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the async crawl stage, against a local HTTP server that serves
+pages from the rag/html cache.
+"""
+
+import sys
+import os
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.indexing import crawler
+
+HTML_DIR = Path(__file__).resolve().parents[1] / "rag" / "html"
+SAMPLE_PAGES = 6
+
+class _Handler(SimpleHTTPRequestHandler):
+    """Static files plus a page that fails once, with request accounting."""
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+    hits = {}
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+            cls.hits[self.path] = cls.hits.get(self.path, 0) + 1
+            hits = cls.hits[self.path]
+        try:
+            time.sleep(0.05)  # let concurrent requests overlap
+            if self.path == "/flaky.html" and hits == 1:
+                self.send_response(503)
+                self.send_header("Retry-After", "0")
+                self.end_headers()
+                return
+            super().do_GET()
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+def _serve(site):
+    _Handler.active, _Handler.peak, _Handler.hits = 0, 0, {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_Handler, directory=str(site)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def _site(tmp):
+    """A few cached pages, one known-relevant page and the flaky page."""
+    site = Path(tmp) / "site"
+    site.mkdir()
+    pages = sorted(HTML_DIR.glob("*.html"))[:SAMPLE_PAGES]
+    for page in pages:
+        shutil.copy(page, site / page.name)
+    (site / "cancer.html").write_text("<html><title>Bowel cancer</title><body>Symptoms</body></html>")
+    (site / "flaky.html").write_text("<html><title>Shop</title><body>Gifts</body></html>")
+    return site, [p.name for p in pages] + ["cancer.html", "flaky.html", "missing.html"]
+
+def _relevant(url, html):
+    return "cancer" in html.lower()
+
+def test_token_bucket_limits_rate():
+    async def run():
+        bucket = crawler.TokenBucket(rate=20, burst=1)
+        start = time.perf_counter()
+        for _ in range(5):
+            await bucket.acquire()
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) >= 0.18  # 4 waits of 50 ms after the banked token
+
+def test_backoff_is_jittered_and_capped():
+    delays = [crawler.backoff_delay(attempt, base=0.5, cap=4) for attempt in range(1, 10) for _ in range(20)]
+    assert all(0 <= d <= 4 for d in delays)
+    assert len(set(delays)) > 1
+
+def test_crawl_against_local_server():
+    with tempfile.TemporaryDirectory() as tmp:
+        site, names = _site(tmp)
+        cache = Path(tmp) / "cache"
+        server = _serve(site)
+        base = f"http://127.0.0.1:{server.server_address[1]}/"
+        urls = [base + name for name in names]
+        try:
+            kwargs = dict(relevance=_relevant, rate=200, burst=20, per_host=3, backoff_base=0.01)
+
+            # Cold crawl: everything downloaded once, the flaky page retried
+            results = {r.url: r for r in asyncio.run(crawler.crawl(urls, cache, **kwargs))}
+            assert _Handler.peak <= 3, _Handler.peak
+            assert results[base + "flaky.html"].status == "fetched"
+            assert results[base + "flaky.html"].attempts == 2
+            assert results[base + "missing.html"].status == "failed"
+            assert results[base + "missing.html"].attempts == 1  # 404 is not retried
+            assert results[base + "cancer.html"].relevant is True
+            assert results[base + "flaky.html"].relevant is False
+            for name in names[:-1]:
+                result = results[base + name]
+                assert result.status == "fetched"
+                assert result.path.read_bytes() == (site / name).read_bytes()
+            assert (cache / crawler.STATE_FILE).exists()
+
+            # Warm crawl: unchanged pages come back as 304s, a changed page is re-downloaded
+            (site / "cancer.html").write_text("<html><title>Lung cancer</title><body>Updated</body></html>")
+            future = time.time() + 60
+            os.utime(site / "cancer.html", (future, future))
+            results = {r.url: r for r in asyncio.run(crawler.crawl(urls, cache, **kwargs))}
+            assert results[base + "cancer.html"].status == "fetched"
+            assert "Lung cancer" in results[base + "cancer.html"].path.read_text()
+            assert all(results[base + n].status == "not_modified" for n in names[:-2] if n != "cancer.html")
+            assert crawler.summarise(results.values())["failed"] == 1
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    test_token_bucket_limits_rate()
+    test_backoff_is_jittered_and_capped()
+    test_crawl_against_local_server()
+    print("✅ Crawler tests passed")
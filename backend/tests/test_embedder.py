@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Tests for the batched embedding stage, against a local fake /embeddings server."""
+
+import sys
+import os
+import hashlib
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.indexing.embedder import Embedder, EmbeddingError, pack_batches
+
+DIM = 8
+
+def _vector(text):
+    digest = hashlib.sha256(text.encode()).digest()
+    return [b / 255 for b in digest[:DIM]]
+
+class _FakeEmbeddings(BaseHTTPRequestHandler):
+    """OpenAI-style /v1/embeddings: 429 on the first call, optional poisoned inputs."""
+    lock = threading.Lock()
+    calls = 0
+    active = 0
+    peak = 0
+    batch_sizes = []
+    poison = None
+
+    def do_POST(self):
+        cls = type(self)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with cls.lock:
+            cls.calls += 1
+            calls = cls.calls
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            time.sleep(0.05)  # let concurrent requests overlap
+            if calls == 1:
+                return self._reply(429, {"error": {"message": "rate limited"}}, {"Retry-After": "0"})
+            if cls.poison and any(cls.poison in text for text in body["input"]):
+                return self._reply(500, {"error": {"message": "boom"}})
+            with cls.lock:
+                cls.batch_sizes.append(len(body["input"]))
+            data = [{"object": "embedding", "index": i, "embedding": _vector(t)} for i, t in enumerate(body["input"])]
+            data.reverse()  # the client must order by index
+            self._reply(200, {"object": "list", "data": data, "model": body["model"]})
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def _reply(self, status, payload, headers=None):
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+def _serve(poison=None):
+    _FakeEmbeddings.calls = _FakeEmbeddings.active = _FakeEmbeddings.peak = 0
+    _FakeEmbeddings.batch_sizes = []
+    _FakeEmbeddings.poison = poison
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeEmbeddings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+def _embedder(url, checkpoint):
+    return Embedder(
+        "text-embedding-3-small", api_key="test", base_url=url, batch_tokens=40, batch_size=4,
+        concurrency=3, max_retries=2, backoff_base=0.01, checkpoint_path=checkpoint,
+    )
+
+def test_pack_batches_respects_limits():
+    assert pack_batches([10, 10, 10, 10], max_tokens=25, max_items=10) == [[0, 1], [2, 3]]
+    assert pack_batches([1] * 5, max_tokens=100, max_items=2) == [[0, 1], [2, 3], [4]]
+    assert pack_batches([50, 1], max_tokens=10, max_items=10) == [[0], [1]]  # oversized input alone
+
+def test_concurrent_batches_with_retry_and_resume():
+    texts = [f"chunk {i} about bowel cancer screening" for i in range(30)]
+    texts.append(texts[0])  # duplicates are embedded once
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = Path(tmp) / "checkpoint.sqlite3"
+
+        # A poisoned batch fails after its retries; the others are checkpointed
+        server, url = _serve(poison="chunk 17 ")
+        try:
+            embedder = _embedder(url, checkpoint)
+            try:
+                embedder.embed(texts)
+                raise AssertionError("expected EmbeddingError")
+            except EmbeddingError:
+                pass
+            assert _FakeEmbeddings.peak <= 3
+            assert max(_FakeEmbeddings.batch_sizes) <= 4
+            embedder.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        # Resume: only the failed batch is sent again
+        server, url = _serve()
+        try:
+            embedder = _embedder(url, checkpoint)
+            vectors = embedder.embed(texts)
+            assert len(vectors) == len(texts)
+            for text, vector in zip(texts, vectors):
+                assert all(abs(a - b) < 1e-6 for a, b in zip(vector, _vector(text)))
+            assert sum(_FakeEmbeddings.batch_sizes) <= 4
+            assert embedder.stats.checkpointed >= len(texts) - 4
+            assert embedder.stats.retries == 1  # the 429
+            assert "chunks/s" in embedder.stats.report()
+            embedder.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == "__main__":
+    test_pack_batches_respects_limits()
+    test_concurrent_batches_with_retry_and_resume()
+    print("✅ Embedder tests passed")
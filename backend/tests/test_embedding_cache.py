@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Tests for the two-tier query-embedding cache."""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.embedding_cache import EmbeddingCache, normalize_query
+
+def test_normalized_keys_and_counters():
+    """Lookups ignore case/whitespace and update hit/miss counters."""
+    cache = EmbeddingCache(path=None, model="test-model")
+    assert cache.get("What is diabetes?") is None
+    cache.put("What is diabetes?", [0.5, 0.25])
+
+    assert cache.get("  what IS   diabetes? ") == [0.5, 0.25]
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+    assert normalize_query(" A  b ") == "a b"
+
+def test_disk_tier_survives_restart():
+    """A new cache instance on the same file starts warm."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.sqlite3"
+        EmbeddingCache(path=path, model="test-model").put_many({"symptoms of migraine": [1.0, 2.0]})
+
+        warm = EmbeddingCache(path=path, model="test-model")
+        assert warm.get("symptoms of migraine") == [1.0, 2.0]
+        assert warm.stats()["disk_hits"] == 1
+
+        # Keys include the model name
+        other = EmbeddingCache(path=path, model="other-model")
+        assert other.get("symptoms of migraine") is None
+
+def test_size_based_eviction():
+    """Both tiers evict least recently used entries when full."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(path=Path(tmp) / "cache.sqlite3", model="m", max_memory_items=2, max_disk_items=2)
+        cache.put("a", [1.0])
+        cache.put("b", [2.0])
+        cache.put("c", [3.0])
+
+        stats = cache.stats()
+        assert stats["memory_items"] == 2
+        assert stats["disk_items"] == 2
+        assert cache.get("a") is None
+        assert cache.get("c") == [3.0]
+
+def test_ttl_expiry():
+    """Entries older than the TTL count as misses."""
+    cache = EmbeddingCache(path=None, model="m", ttl_seconds=-1)
+    cache.put("hello", [1.0])
+    assert cache.get("hello") is None
+
+if __name__ == "__main__":
+    test_normalized_keys_and_counters()
+    test_disk_tier_survives_restart()
+    test_size_based_eviction()
+    test_ttl_expiry()
+    print("✅ Embedding cache tests passed")
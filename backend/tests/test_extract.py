@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Tests for the parallel HTML-to-text stage, on pages from the rag/html cache."""
+
+import sys
+import os
+import shutil
+import tempfile
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.indexing.extract import extract_pages
+
+HTML_DIR = Path(__file__).resolve().parents[1] / "rag" / "html"
+SAMPLE_PAGES = 12
+
+def _corpus(tmp):
+    site = Path(tmp) / "html"
+    site.mkdir()
+    for page in sorted(HTML_DIR.glob("*.html"))[:SAMPLE_PAGES]:
+        shutil.copy(page, site / page.name)
+    (site / "cancer.html").write_text(
+        "<html><head><title>Bowel cancer</title></head>"
+        "<body><nav>Menu</nav><main>Symptoms of  bowel cancer</main><footer>Footer</footer></body></html>"
+    )
+    return [(f"https://example.org/{p.stem}", p) for p in sorted(site.glob("*.html"))]
+
+def test_extract_in_parallel_with_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        pages = _corpus(tmp)
+        cache = Path(tmp) / "extract.sqlite3"
+
+        first = {page.url: page for page in extract_pages(pages, workers=2, cache_path=cache)}
+        assert set(first) == {url for url, _ in pages}
+        assert not any(page.cached for page in first.values())
+        cancer = first["https://example.org/cancer"]
+        assert cancer.text == "Title: Bowel cancer\n\nSymptoms of bowel cancer"
+        assert cancer.metadata["page_title"] == "Bowel cancer"
+
+        # Serial extraction gives the same text
+        serial = {page.url: page.text for page in extract_pages(pages, workers=1, cache_path=None)}
+        assert serial == {url: page.text for url, page in first.items()}
+
+        # Unchanged files are served from the cache, even when only touched
+        os.utime(pages[0][1], None)
+        second = {page.url: page for page in extract_pages(pages, workers=2, cache_path=cache)}
+        assert all(page.cached for page in second.values())
+        assert {url: page.text for url, page in second.items()} == serial
+
+        # Edited files are parsed again
+        path = dict(pages)["https://example.org/cancer"]
+        path.write_text("<html><title>Lung cancer</title><body><main>Updated</main></body></html>")
+        third = {page.url: page for page in extract_pages(pages, workers=2, cache_path=cache)}
+        assert not third["https://example.org/cancer"].cached
+        assert third["https://example.org/cancer"].text == "Title: Lung cancer\n\nUpdated"
+        assert sum(not page.cached for page in third.values()) == 1
+
+if __name__ == "__main__":
+    test_extract_in_parallel_with_cache()
+    print("✅ Extract tests passed")
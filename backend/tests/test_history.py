@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Tests for the token-budgeted history window."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.history import select_token_window
+
+def _msgs(*contents):
+    return [{"role": "user", "content": c} for c in contents]
+
+def test_window_keeps_most_recent_in_order():
+    """Newest messages that fit the budget are kept, returned oldest first."""
+    newest_first = _msgs("ccc", "bb", "aaaa")
+    window = select_token_window(newest_first, token_budget=5, count=len)
+    assert [m["content"] for m in window] == ["bb", "ccc"]
+
+def test_window_always_keeps_newest():
+    """An oversized newest message is still sent."""
+    window = select_token_window(_msgs("x" * 50, "y"), token_budget=10, count=len)
+    assert [m["content"] for m in window] == ["x" * 50]
+
+if __name__ == "__main__":
+    test_window_keeps_most_recent_in_order()
+    test_window_always_keeps_newest()
+    print("✅ History window tests passed")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Tests for the indexing pipeline: collection configs and an end-to-end html_dir run."""
+
+import sys
+import os
+import hashlib
+import json
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.indexing.config import IndexConfig, available_configs, load_config
+from rag.indexing.sources import Listing, html_dir_source, sitemap_source
+
+PAGE = """<html><head><title>{title}</title><link rel="canonical" href="{url}"></head>
+<body><nav>menu</nav><main><h1>{title}</h1><p>{body}</p></main></body></html>"""
+
+class _FakeEmbeddings(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        data = [{"index": i, "embedding": [b / 255 for b in hashlib.sha256(t.encode()).digest()[:8]]}
+                for i, t in enumerate(body["input"])]
+        raw = json.dumps({"data": data, "model": body["model"]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+class _Sitemaps(BaseHTTPRequestHandler):
+    """/sitemap.xml lists one page; the HTML /sitemap is down."""
+    def do_GET(self):
+        if self.path != "/sitemap.xml":
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        raw = (b'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+               b'<url><loc>http://127.0.0.1/about-cancer/a</loc></url></urlset>')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+def test_collection_configs_load():
+    assert {"nhs_docs", "cancer_research_docs"} <= set(available_configs())
+    cancer = load_config("cancer_research_docs")
+    assert cancer.source.type == "sitemap" and cancer.source.max_pages == 2000
+    assert "cancer" in cancer.filter.keywords and cancer.metadata["domain"] == "cancerresearchuk.org"
+    nhs = load_config("nhs_docs")
+    assert nhs.source.type == "urls" and nhs.url_title is False and nhs.extract.parser == "nhs"
+    try:
+        IndexConfig.from_dict({"collection": "x", "fetch": {"rtae": 5}})
+        raise AssertionError("expected ValueError for a typo'd key")
+    except ValueError as e:
+        assert "rtae" in str(e)
+
+def test_nhs_parser_matches_original_build_index():
+    """nhs_docs keeps the old build_index.html_to_text output, so nothing is re-embedded."""
+    from bs4 import BeautifulSoup
+    from rag.indexing.extract import PARSERS
+
+    html = PAGE.format(title="Migraine", url="https://www.nhs.uk/conditions/migraine/", body="Headaches.")
+    text = PARSERS["nhs"](BeautifulSoup(html, "lxml"), "Migraine")
+    assert text == "Migraine Migraine Headaches."
+
+def test_failed_sitemap_marks_listing_incomplete():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Sitemaps)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        config = IndexConfig.from_dict({
+            "collection": "x",
+            "source": {"type": "sitemap", "urls": [f"{base}/sitemap.xml"], "allowed_domains": ["127.0.0.1"]},
+            "fetch": {"timeout": 5},
+        })
+        listing = sitemap_source(config)
+        assert listing.urls == ["http://127.0.0.1/about-cancer/a"] and listing.complete
+
+        config.source.urls.append(f"{base}/sitemap")
+        listing = sitemap_source(config)
+        assert listing.urls == ["http://127.0.0.1/about-cancer/a"] and not listing.complete
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_html_dir_pipeline_is_incremental():
+    import chromadb
+    from rag.indexing.embedder import Embedder
+    from rag.indexing.pipeline import Pipeline
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeEmbeddings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            pages = tmp / "pages"
+            pages.mkdir()
+            for slug, title, body in [
+                ("bowel-cancer", "Bowel cancer", "Symptoms of bowel cancer include blood in your poo."),
+                ("lung-cancer", "Lung cancer", "Lung cancer screening is offered to some smokers."),
+                ("shop", "Our shops", "Buy second-hand books and clothes."),
+            ]:
+                url = f"https://example.org/about-cancer/{slug}" if slug != "shop" else "https://example.org/shop"
+                (pages / f"{slug}.html").write_text(PAGE.format(title=title, url=url, body=body))
+            config = IndexConfig.from_dict({
+                "collection": "test_docs",
+                "persist_dir": str(tmp / "chroma"),
+                "stats_file": str(tmp / "stats.json"),
+                "metadata": {"domain": "example.org"},
+                "source": {"type": "html_dir", "path": str(pages)},
+                "filter": {"categories": ["about-cancer"], "keywords": ["cancer"]},
+                "extract": {"workers": 1, "cache_path": str(tmp / "extract.sqlite3")},
+            })
+            client = chromadb.EphemeralClient()
+            url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+            def run(source=None):
+                embedder = Embedder("text-embedding-3-small", api_key="test", base_url=url,
+                                    checkpoint_path=tmp / "checkpoint.sqlite3")
+                try:
+                    return Pipeline(config, source=source, embedder=embedder, chroma_client=client).run()
+                finally:
+                    embedder.close()
+
+            first = run()
+            assert first.documents == 2 and first.filtered_out == 1
+            assert len(first.report.added) == 2
+            collection = client.get_collection("test_docs")
+            sources = {m["source"] for m in collection.get(include=["metadatas"])["metadatas"]}
+            assert sources == {"https://example.org/about-cancer/bowel-cancer",
+                               "https://example.org/about-cancer/lung-cancer"}
+            stats = json.loads((tmp / "stats.json").read_text())
+            assert set(stats["stage_timings"]) >= {"sources", "extract", "chunk", "embed", "upsert"}
+
+            # Nothing changed: nothing is re-embedded
+            second = run()
+            assert len(second.report.unchanged) == 2 and second.report.chunks_added == 0
+            assert second.final_count == first.final_count
+
+            # A partial listing (e.g. a sitemap was down) must not delete unlisted pages
+            def partial(cfg):
+                listing = html_dir_source(cfg)
+                return Listing(pages=listing.pages[:1], complete=False)
+            third = run(partial)
+            assert third.report.removed == [] and third.final_count == first.final_count
+    finally:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    test_collection_configs_load()
+    test_nhs_parser_matches_original_build_index()
+    test_failed_sitemap_marks_listing_incomplete()
+    test_html_dir_pipeline_is_incremental()
+    print("✅ Indexing pipeline tests passed")
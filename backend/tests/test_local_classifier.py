@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Tests for the local medical/general classifier tier."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.local_classifier import LocalMedicalClassifier
+
+# Two-dimensional fake embeddings: x = "medical", y = "general"
+FAKE_VECTORS = {
+    "medical seed": [1.0, 0.0],
+    "general seed": [0.0, 1.0],
+    "clearly medical": [0.9, 0.1],
+    "clearly general": [0.1, 0.9],
+    "ambiguous": [0.5, 0.5],
+    "leaning general": [0.45, 0.55],
+}
+
+def fake_embed(texts):
+    return {t: FAKE_VECTORS[t] for t in texts}
+
+def make_classifier():
+    return LocalMedicalClassifier(
+        embed=fake_embed,
+        margin=0.1,
+        examples={True: ["medical seed"], False: ["general seed"]},
+    )
+
+def test_rules_tier():
+    """Greetings and obvious medical questions never need an embedding."""
+    classifier = LocalMedicalClassifier(embed=lambda texts: {}, examples={True: [], False: []})
+    assert classifier.classify("Hello there!") is False
+    assert classifier.classify("thanks") is False
+    assert classifier.classify("What are the symptoms of flu?") is True
+    assert classifier.stats()["rule_hits"] == 3
+
+def test_centroid_tier_and_fallback():
+    """Confident centroid margins decide locally; low margins fall back."""
+    classifier = make_classifier()
+    assert classifier.classify("clearly medical") is True
+    assert classifier.classify("clearly general") is False
+    assert classifier.classify("ambiguous") is None
+
+    stats = classifier.stats()
+    assert stats["centroid_hits"] == 2
+    assert stats["llm_fallbacks"] == 1
+    assert abs(stats["local_hit_rate"] - 2 / 3) < 1e-9
+
+def test_precomputed_embedding_is_used():
+    """A caller-supplied embedding skips the embed call for the question."""
+    classifier = make_classifier()
+    assert classifier.classify("not in fake table", embedding=[0.95, 0.05]) is True
+
+def test_general_needs_wider_margin():
+    """A small lead for GENERAL falls back: GENERAL would skip RAG entirely."""
+    classifier = make_classifier()
+    assert classifier.classify("leaning general") is None
+    classifier.general_margin = 0.1
+    assert classifier.classify("leaning general") is False
+
+def test_evaluate_reports_medical_misroutes():
+    classifier = make_classifier()
+    labelled = [("clearly medical", True), ("leaning general", True),
+                ("clearly general", False), ("ambiguous", False)]
+    loose, strict = classifier.evaluate(labelled, general_margins=(0.1, 0.15))
+    assert loose["coverage"] == 0.75 and loose["medical_as_general"] == 1
+    assert abs(loose["accuracy"] - 2 / 3) < 1e-9
+    assert strict == {"general_margin": 0.15, "coverage": 0.5, "accuracy": 1.0, "medical_as_general": 0}
+
+if __name__ == "__main__":
+    test_rules_tier()
+    test_centroid_tier_and_fallback()
+    test_precomputed_embedding_is_used()
+    test_general_needs_wider_margin()
+    test_evaluate_reports_medical_misroutes()
+    print("✅ Local classifier tests passed")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Tests for the incremental indexing manifest."""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag.indexing.manifest import IndexManifest, content_hash
+
+MODEL = "text-embedding-3-small"
+
+def _indexed(tmp, pages, model=MODEL):
+    manifest = IndexManifest.load(tmp, "cancer_research_docs", model)
+    for url, text in pages.items():
+        manifest.record(url, content_hash(text, {"source": url}), [f"{url}#0", f"{url}#1"])
+    manifest.save()
+    return manifest
+
+def test_content_hash_covers_text_and_metadata():
+    assert content_hash("a", {"source": "x"}) == content_hash("a", {"source": "x"})
+    assert content_hash("a", {"source": "x"}) != content_hash("b", {"source": "x"})
+    assert content_hash("a", {"source": "x"}) != content_hash("a", {"source": "y"})
+
+def test_plan_reports_delta():
+    with tempfile.TemporaryDirectory() as tmp:
+        _indexed(tmp, {"https://a": "alpha", "https://b": "beta", "https://c": "gamma", "https://d": "delta"})
+
+        manifest = IndexManifest.load(tmp, "cancer_research_docs", MODEL)
+        assert manifest.exists
+        assert manifest.documents["https://a"]["chunk_ids"] == ["https://a#0", "https://a#1"]
+        current = {
+            "https://a": content_hash("alpha", {"source": "https://a"}),    # unchanged
+            "https://b": content_hash("beta v2", {"source": "https://b"}),  # changed
+            "https://e": content_hash("epsilon", {"source": "https://e"}),  # new
+        }
+        plan = manifest.plan(current, keep=["https://d"])  # d failed this run: keep it
+        assert plan.unchanged == ["https://a"]
+        assert plan.changed == ["https://b"]
+        assert plan.added == ["https://e"]
+        assert plan.removed == ["https://c"]
+        assert not plan.model_changed
+
+def test_model_switch_reembeds_until_finished():
+    with tempfile.TemporaryDirectory() as tmp:
+        _indexed(tmp, {"https://a": "alpha", "https://b": "beta"}, model="text-embedding-ada-002")
+        current = {url: content_hash(text, {"source": url}) for url, text in (("https://a", "alpha"), ("https://b", "beta"))}
+
+        manifest = IndexManifest.load(tmp, "cancer_research_docs", MODEL)
+        plan = manifest.plan(current)
+        assert plan.model_changed and sorted(plan.changed) == ["https://a", "https://b"]
+
+        # Interrupted after the first document: the other one is still pending
+        manifest.record("https://a", current["https://a"], ["new#0"])
+        manifest.save()
+        plan = IndexManifest.load(tmp, "cancer_research_docs", MODEL).plan(current)
+        assert plan.unchanged == ["https://a"] and plan.changed == ["https://b"]
+
+if __name__ == "__main__":
+    test_content_hash_covers_text_and_metadata()
+    test_plan_reports_delta()
+    test_model_switch_reembeds_until_finished()
+    print("✅ Manifest tests passed")
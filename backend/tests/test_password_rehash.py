@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Tests for the transparent bcrypt work-factor upgrade on login."""
+
+import sys
+import os
+import asyncio
+import tempfile
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require an API key; the models only need a database URL
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import Settings
+from app.db.models import Base, User, create_db_engine
+from app.services import auth
+
+def test_rehash_only_upgrades():
+    saved = auth.BCRYPT_ROUNDS
+    auth.BCRYPT_ROUNDS = 10
+    try:
+        assert auth._needs_rehash("$2b$04$" + "x" * 53)
+        assert not auth._needs_rehash("$2b$10$" + "x" * 53)
+        assert not auth._needs_rehash("$2b$12$" + "x" * 53)  # never weaken a stronger hash
+    finally:
+        auth.BCRYPT_ROUNDS = saved
+
+    os.environ["BCRYPT_ROUNDS"] = "4"
+    try:
+        auth._bcrypt_rounds()
+        raise AssertionError("expected ValueError for BCRYPT_ROUNDS below the minimum")
+    except ValueError as e:
+        assert "minimum" in str(e)
+    finally:
+        del os.environ["BCRYPT_ROUNDS"]
+
+def test_login_upgrades_a_weak_hash():
+    """A rounds=4 hash is replaced at BCRYPT_ROUNDS and the cached user dropped."""
+    async def run(tmp):
+        engine = create_db_engine(Settings(openai_api_key="test", database_url=f"sqlite+aiosqlite:///{tmp}/auth.db"))
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        saved = auth.SessionLocal, auth.BCRYPT_ROUNDS
+        auth.SessionLocal, auth.BCRYPT_ROUNDS = sessions, 10
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(User.__table__.insert().values(
+                    id=1, email="qa@example.com", hashed_pw=auth._hash_pw("secret", 4),
+                ))
+            auth.user_cache.put(SimpleNamespace(id=1))
+            rehashes = auth.password_stats.rehashes
+
+            assert await auth.authenticate("qa@example.com", "secret")
+
+            async with sessions() as db:
+                hashed = (await db.get(User, 1)).hashed_pw
+            assert hashed.split("$")[2] == "10" and auth._verify_pw("secret", hashed)
+            assert auth.password_stats.rehashes == rehashes + 1
+            assert auth.user_cache.get(1) is None
+        finally:
+            auth.SessionLocal, auth.BCRYPT_ROUNDS = saved
+            auth.user_cache.invalidate(1)
+            await engine.dispose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        asyncio.run(run(tmp))
+
+if __name__ == "__main__":
+    test_rehash_only_upgrades()
+    test_login_upgrades_a_weak_hash()
+    print("✅ Password rehash tests passed")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Check with EXPLAIN QUERY PLAN that the router queries are served by indexes."""
+
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings require an API key; the models only need a database URL
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from sqlalchemy import create_engine
+
+from app.db import queries
+from app.db.models import Base
+from app.services import analytics
+
+def _plan(engine, statement):
+    """EXPLAIN QUERY PLAN detail lines for a SQLAlchemy statement."""
+    compiled = statement.compile(engine)
+    params = tuple(str(compiled.params[name]) for name in compiled.positiontup)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+def _assert_uses(engine, statement, index):
+    plan = _plan(engine, statement)
+    assert any(index in line for line in plan), f"{index} not used: {plan}"
+    assert not any("USE TEMP B-TREE FOR ORDER BY" in line for line in plan), f"sort not indexed: {plan}"
+
+def test_router_queries_use_indexes():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+
+    _assert_uses(engine, queries.user_sessions(1, limit=51), "ix_chat_sessions_user_id_created_at")
+    _assert_uses(engine, queries.user_sessions(1, limit=51, before_id=5), "ix_chat_sessions_user_id_created_at")
+    # Session preview subquery
+    _assert_uses(engine, queries.user_sessions(1), "ix_messages_session_id_role_created_at")
+    _assert_uses(engine, queries.preceding_user_message(1, datetime(2025, 1, 1)), "ix_messages_session_id_role_created_at")
+    _assert_uses(engine, queries.session_messages(1), "ix_messages_session_id_created_at")
+    _assert_uses(engine, queries.history_window(1, 10), "ix_messages_session_id_created_at")
+    _assert_uses(engine, queries.assistant_messages(), "ix_messages_role_created_at")
+    _assert_uses(engine, queries.latest_unanswered(20), "ix_unanswered_queries_created_at")
+    _assert_uses(engine, queries.unanswered_with_users(category="Cancer"), "ix_unanswered_queries_category_created_at")
+    _assert_uses(engine, queries.unanswered_with_users(reason="medical_question_no_rag"), "ix_unanswered_queries_reason_created_at")
+
+    # Admin analytics: one statement per page, sorted on the index
+    answered = analytics.paginate(analytics.answered_query([]), answered=True, limit=101)
+    _assert_uses(engine, answered, "ix_messages_role_created_at")
+    _assert_uses(engine, answered, "ix_messages_session_id_role_created_at")
+    unanswered = analytics.paginate(analytics.unanswered_query([]), answered=False, after_id=7, limit=101)
+    _assert_uses(engine, unanswered, "ix_unanswered_queries_created_at")
+
+if __name__ == "__main__":
+    test_router_queries_use_indexes()
+    print("✅ Query plan tests passed")
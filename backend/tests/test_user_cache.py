@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Tests for the authenticated-user cache and its invalidation on writes."""
+
+import sys
+import os
+import asyncio
+import tempfile
+import time
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The admin router imports the RAG service; keep its Chroma client and caches out of backend/rag
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ["RAG_INDEX_DIR"] = os.path.join(_tmp, "chroma_db")
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_tmp, "embedding_cache.sqlite3")
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1 import admin, auth as auth_api
+from app.core.config import Settings
+from app.db.models import Base, User, create_db_engine
+from app.services import auth
+from app.services.auth import UserCache, get_current_user, user_cache
+
+def test_ttl_and_lru_eviction():
+    cache = UserCache(max_items=2, ttl_seconds=60)
+    for user_id in (1, 2):
+        cache.put(SimpleNamespace(id=user_id))
+    assert cache.get(1).id == 1  # 2 is now least recently used
+    cache.put(SimpleNamespace(id=3))
+    assert cache.get(2) is None and cache.get(3).id == 3
+
+    cache._users[1] = (cache._users[1][0], time.monotonic() - 61)
+    assert cache.get(1) is None
+    assert cache.stats() == {"hits": 2, "misses": 2, "hit_rate": 0.5, "items": 1}
+
+def test_writes_invalidate_the_cached_principal():
+    """Promotion and PUT /auth/me are visible on the next request, not after the TTL."""
+    async def run():
+        engine = create_db_engine(Settings(openai_api_key="test", database_url=f"sqlite+aiosqlite:///{_tmp}/users.db"))
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(User.__table__.insert(), [
+                    {"id": 1, "email": "admin@example.com", "hashed_pw": "x", "is_admin": True, "country": None},
+                    {"id": 2, "email": "qa@example.com", "hashed_pw": "x", "is_admin": False, "country": "UK"},
+                ])
+            token = auth._create_token(2)
+
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                before = await get_current_user(token, db)
+                assert before.is_admin is False and await get_current_user(token, db) is before
+
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                admin_user = await db.get(User, 1)
+                await admin.promote_user(2, db=db, user=admin_user)
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                promoted = await get_current_user(token, db)
+                assert promoted.is_admin is True
+
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                await auth_api.update_me(auth_api.UserUpdateIn(country="France"), db=db, user=promoted)
+            async with AsyncSession(engine, expire_on_commit=False) as db:
+                assert (await get_current_user(token, db)).country == "France"
+        finally:
+            user_cache.invalidate(2)
+            await engine.dispose()
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    test_ttl_and_lru_eviction()
+    test_writes_invalidate_the_cached_principal()
+    print("✅ User cache tests passed")
@@ -42,21 +42,23 @@ export const authApi = {
 
 // Chat API calls - token handled by axios interceptor
 export const chatApi = {
-  sendMessage: (message: string, location?: string, sessionId?: string) =>
+  // With lastMessageId only the messages after it are returned
+  sendMessage: (message: string, location?: string, sessionId?: string, lastMessageId?: number) =>
     apiRequest("/chat", {
       method: "POST",
       data: { 
         message, 
         location,
-        session_id: sessionId
+        session_id: sessionId,
+        last_message_id: lastMessageId
       }
     }),
 
   getSessions: () =>
     apiRequest("/chat/sessions"),
 
-  getSessionMessages: (sessionId: string) =>
-    apiRequest(`/chat/session/${sessionId}`),
+  getSessionMessages: (sessionId: string, params?: { before_id?: number; after_id?: number; limit?: number }) =>
+    apiRequest(`/chat/session/${sessionId}`, { params }),
 
   deleteSession: (sessionId: string) =>
     apiRequest(`/chat/session/${sessionId}`, {
@@ -64,5 +66,52 @@ export const chatApi = {
     }),
 
   getCategories: () =>
-    apiRequest("/chat/categories")
+    apiRequest("/chat/categories"),
+
+  // Streams /chat/stream (Server-Sent Events); resolves with the "done" payload
+  streamMessage: async (
+    message: string,
+    onEvent: (event: string, data: any) => void,
+    location?: string,
+    sessionId?: string
+  ) => {
+    const token = localStorage.getItem("jwt")
+    const res = await fetch(`${axios.defaults.baseURL ?? ""}/chat/stream`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        ...(token ? { Authorization: `Bearer ${token}` } : {})
+      },
+      body: JSON.stringify({ message, location, session_id: sessionId })
+    })
+    if (!res.ok || !res.body) {
+      throw { response: { data: await res.json().catch(() => undefined) } }
+    }
+
+    const reader = res.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ""
+    let done: any = null
+    while (true) {
+      const { value, done: finished } = await reader.read()
+      if (finished) break
+      buffer += decoder.decode(value, { stream: true })
+      let boundary
+      while ((boundary = buffer.indexOf("\n\n")) >= 0) {
+        const raw = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+        let event = "message"
+        let data = ""
+        for (const line of raw.split("\n")) {
+          if (line.startsWith("event: ")) event = line.slice(7)
+          else if (line.startsWith("data: ")) data += line.slice(6)
+        }
+        const payload = data ? JSON.parse(data) : null
+        onEvent(event, payload)
+        if (event === "done") done = payload
+        if (event === "error") throw { response: { data: { message: payload?.response } } }
+      }
+    }
+    return done
+  }
 }
\ No newline at end of file
@@ -108,22 +108,25 @@ function Chat({ onLogout, token }: ChatProps) {
     console.log(`[DEBUG] Sending message with session_id: ${currentSessionId}`)
     
     try {
-      const data = await chatApi.sendMessage(userMessage, location, currentSessionId || undefined)
+      // Placeholder reply that fills in as tokens stream
+      setMessages((prev) => [...prev, {text: '', type: 'kyra'}])
+      const updateReply = (update: (m: Message) => Message) =>
+        setMessages((prev) => [...prev.slice(0, -1), update(prev[prev.length - 1])])
       
-      console.log(`[DEBUG] Response session_id: ${data.session_id}`)
-      
-      // Update current session ID if it was a new conversation
-      if (!currentSessionId) {
-        console.log(`[DEBUG] Setting new session_id: ${data.session_id}`)
-        setCurrentSessionId(data.session_id)
-      }
+      const data = await chatApi.streamMessage(userMessage, (event, payload) => {
+        if (event === 'session' && !currentSessionId) {
+          console.log(`[DEBUG] Setting new session_id: ${payload.session_id}`)
+          setCurrentSessionId(payload.session_id)
+        } else if (event === 'token') {
+          setLoading(false)
+          updateReply((m) => ({...m, text: m.text + payload.text}))
+        }
+      }, location, currentSessionId || undefined)
       
-      // Reload sessions to update previews
-      const sessionsData = await chatApi.getSessions()
-      setSessions(sessionsData)
+      console.log(`[DEBUG] Response session_id: ${data.session_id}`)
       
-      // Replace the entire message list with the conversation history from the API
-      const convertedMessages: Message[] = data.messages.map((msg: any) => ({
+      // Replace the streamed text with the saved, formatted messages
+      const [savedUser, savedReply] = data.messages.map((msg: any) => ({
         text: msg.content,
         type: msg.role === 'user' ? 'user' : 'kyra',
         id: msg.id,
@@ -131,11 +134,14 @@ function Chat({ onLogout, token }: ChatProps) {
         sources: msg.sources,
         metadata: msg.response_metadata
       }))
+      setMessages((prev) => [...prev.slice(0, -2), savedUser, savedReply])
       
-      setMessages(convertedMessages)
+      // Reload sessions to update previews
+      const sessionsData = await chatApi.getSessions()
+      setSessions(sessionsData)
       
     } catch (error: any) {
-      setMessages((prev) => [...prev, {
+      setMessages((prev) => [...prev.filter((m) => m.type !== 'kyra' || m.text || m.id), {
         text: error.response?.data?.message || "Failed to send message", 
         type: 'error'
       }])
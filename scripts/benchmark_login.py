@@ -0,0 +1,84 @@
+"""
+Login throughput benchmark.
+
+Local mode (default) compares bcrypt run inline on the event loop with the
+password pool from services/auth.py: throughput and the worst event-loop
+stall while N verifications run concurrently.
+
+    python scripts/benchmark_login.py --concurrency 32 --rounds 12
+
+HTTP mode fires concurrent POST /login requests at a running server:
+
+    python scripts/benchmark_login.py --url http://localhost:8000/api/v1/auth \
+        --email qa@example.com --password secret --concurrency 32
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+import time
+
+
+async def _loop_stall(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Worst delay (s) of a 10 ms ticker while the benchmark runs."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def _measure(label: str, n: int, run_all) -> None:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_loop_stall(stop))
+    start = time.perf_counter()
+    await run_all()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    stall = await ticker
+    print(f"{label:>8}: {n} logins in {elapsed:.2f}s  ({n / elapsed:.1f}/s)  worst loop stall {stall * 1000:.0f} ms")
+
+
+async def local_benchmark(concurrency: int, rounds: int) -> None:
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    from backend.app.services import auth
+
+    hashed = auth._hash_pw("secret", rounds)
+
+    async def inline_verify():
+        assert auth._verify_pw("secret", hashed)
+
+    async def pooled_verify():
+        assert await auth.verify_password("secret", hashed)
+
+    print(f"bcrypt rounds={rounds}, concurrency={concurrency}, pool workers={auth.PASSWORD_HASH_WORKERS}")
+    await _measure("inline", concurrency, lambda: asyncio.gather(*(inline_verify() for _ in range(concurrency))))
+    await _measure("pool", concurrency, lambda: asyncio.gather(*(pooled_verify() for _ in range(concurrency))))
+
+
+async def http_benchmark(url: str, email: str, password: str, concurrency: int) -> None:
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        async def login():
+            resp = await client.post("/login", json={"email": email, "password": password})
+            resp.raise_for_status()
+
+        await _measure("http", concurrency, lambda: asyncio.gather(*(login() for _ in range(concurrency))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark login throughput under concurrency")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor (local mode)")
+    parser.add_argument("--url", help="auth router base URL, e.g. http://localhost:8000/api/v1/auth; enables HTTP mode")
+    parser.add_argument("--email", default="qa@example.com")
+    parser.add_argument("--password", default="secret")
+    args = parser.parse_args()
+
+    if args.url:
+        asyncio.run(http_benchmark(args.url, args.email, args.password, args.concurrency))
+    else:
+        asyncio.run(local_benchmark(args.concurrency, args.rounds))
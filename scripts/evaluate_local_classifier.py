@@ -0,0 +1,55 @@
+"""
+Evaluate the local medical/general classifier on real traffic.
+
+User messages already labelled by the LLM classifier are split into a
+training half (added to the seed examples) and a held-out half. For each
+candidate GENERAL margin the script prints how many held-out questions the
+centroid tier would decide locally, how accurate those decisions are, and
+how many medical questions it would route to GENERAL (and so skip RAG):
+
+    python scripts/evaluate_local_classifier.py --limit 2000
+
+Pick the smallest margin with no medical->general errors and set it as
+LOCAL_CLASSIFIER_GENERAL_MARGIN.
+"""
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import argparse
+import asyncio
+import random
+
+from backend.app.db.models import SessionLocal
+from backend.app.services.local_classifier import LocalMedicalClassifier, load_labelled_messages
+from backend.app.services.rag import embed_queries, medical_classifier
+
+
+async def main(limit: int, holdout: float, seed: int, margins) -> None:
+    async with SessionLocal() as db:
+        labelled = await load_labelled_messages(db, limit=limit)
+    # Rule hits never reach the centroids; evaluate only what they would see
+    labelled = [(text, label) for text, label in labelled if medical_classifier.classify_rules(text) is None]
+    if len(labelled) < 10:
+        print(f"Only {len(labelled)} labelled messages without a rule match; nothing to evaluate.")
+        return
+    random.Random(seed).shuffle(labelled)
+    split = int(len(labelled) * (1 - holdout))
+    train, test = labelled[:split], labelled[split:]
+
+    classifier = LocalMedicalClassifier(embed=embed_queries, margin=medical_classifier.margin)
+    classifier.add_examples([text for text, _ in train], [label for _, label in train])
+    print(f"{len(train)} training / {len(test)} held-out messages, medical margin {classifier.margin}")
+    print(f"{'general margin':>15} {'coverage':>9} {'accuracy':>9} {'medical->general':>17}")
+    for row in classifier.evaluate(test, margins):
+        print(f"{row['general_margin']:>15.2f} {row['coverage']:>9.1%} {row['accuracy']:>9.1%} "
+              f"{row['medical_as_general']:>17}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=2000, help="labelled messages to load")
+    parser.add_argument("--holdout", type=float, default=0.5, help="share of messages held out for scoring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.05, 0.1, 0.15, 0.2, 0.25, 0.3])
+    args = parser.parse_args()
+    asyncio.run(main(args.limit, args.holdout, args.seed, args.margins))